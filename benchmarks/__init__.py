@@ -0,0 +1 @@
+"""Performance benchmarks for crema, run with airspeed velocity (asv)."""
@@ -0,0 +1,106 @@
+"""Benchmarks for competition, protein grouping and writing results"""
+import shutil
+import tempfile
+
+import numpy as np
+
+import crema
+from crema.confidence import _compete, _group_proteins
+
+from .synthetic import make_psms
+
+
+class Compete:
+    """Competition between the PSMs of each spectrum"""
+
+    params = ([100000, 1000000], [1, 10])
+    param_names = ["n_psms", "psms_per_spectrum"]
+
+    def setup(self, n_psms, psms_per_spectrum):
+        self.psms = make_psms(
+            n_psms // psms_per_spectrum, psms_per_spectrum=psms_per_spectrum
+        )
+
+    def time_compete(self, n_psms, psms_per_spectrum):
+        _compete(self.psms, ["file", "scan"], "xcorr score", True)
+
+    def peakmem_compete(self, n_psms, psms_per_spectrum):
+        _compete(self.psms, ["file", "scan"], "xcorr score", True)
+
+
+class GroupProteins:
+    """Grouping proteins by their peptides"""
+
+    params = ([10000, 100000], [1.0, 3.0])
+    param_names = ["n_peptides", "proteins_per_peptide"]
+
+    def setup(self, n_peptides, proteins_per_peptide):
+        psms = make_psms(
+            n_peptides,
+            psms_per_spectrum=1,
+            proteins_per_peptide=proteins_per_peptide,
+        ).drop_duplicates("sequence")
+        is_target = psms["target/decoy"] == "target"
+        self.targets = psms.loc[is_target]
+        self.decoys = psms.loc[~is_target]
+
+    def time_group_proteins(self, n_peptides, proteins_per_peptide):
+        _group_proteins(
+            self.targets, self.decoys, ",", "protein id", "sequence"
+        )
+
+
+class FindBestScore:
+    """Choosing the score that accepts the most PSMs"""
+
+    params = [100000, 1000000]
+    param_names = ["n_psms"]
+
+    def setup(self, n_psms):
+        self.dataset = crema.read_tide(make_psms(n_psms, psms_per_spectrum=1))
+
+    def time_find_best_score(self, n_psms):
+        self.dataset.find_best_score()
+
+
+class AssignConfidence:
+    """The full confidence estimation pipeline"""
+
+    params = ([100000], ["tdc", "mixmax"])
+    param_names = ["n_psms", "method"]
+    timeout = 300
+
+    def setup(self, n_psms, method):
+        self.dataset = crema.read_tide(make_psms(n_psms // 2))
+
+    def time_assign_confidence(self, n_psms, method):
+        np.random.seed(0)
+        self.dataset.assign_confidence(
+            score_column="combined p-value", desc=False, method=method
+        )
+
+    def peakmem_assign_confidence(self, n_psms, method):
+        np.random.seed(0)
+        self.dataset.assign_confidence(
+            score_column="combined p-value", desc=False, method=method
+        )
+
+
+class ToTxt:
+    """Writing the confidence estimates"""
+
+    params = [100000]
+    param_names = ["n_psms"]
+
+    def setup(self, n_psms):
+        self.out_dir = tempfile.mkdtemp()
+        dataset = crema.read_tide(make_psms(n_psms // 2))
+        self.conf = dataset.assign_confidence(
+            score_column="combined p-value", desc=False
+        )
+
+    def teardown(self, n_psms):
+        shutil.rmtree(self.out_dir)
+
+    def time_to_txt(self, n_psms):
+        crema.to_txt(self.conf, output_dir=self.out_dir, decoys=True)
@@ -0,0 +1,67 @@
+"""Benchmarks for the parsers"""
+import shutil
+import tempfile
+from pathlib import Path
+
+from crema.parsers import get_reader
+from crema.parsers.auto import detect_format
+
+from .synthetic import DECOY_PREFIXES, make_psms, write_psms
+
+
+class Parsers:
+    """Reading each supported format"""
+
+    params = (
+        ["tide", "comet", "msgf", "msamanda", "mztab", "pepxml", "msfragger"],
+        [10000, 100000],
+    )
+    param_names = ["format", "n_psms"]
+    timeout = 300
+
+    def setup(self, fmt, n_psms):
+        self.tmp_dir = tempfile.mkdtemp()
+        psms = make_psms(n_psms // 2, proteins_per_peptide=1.5)
+        self.path = write_psms(psms, fmt, Path(self.tmp_dir, "psms"))
+        self.reader = get_reader(fmt)
+        self.kwargs = {}
+        if fmt == "pepxml":
+            self.kwargs["decoy_prefix"] = DECOY_PREFIXES[fmt]
+
+    def teardown(self, fmt, n_psms):
+        shutil.rmtree(self.tmp_dir)
+
+    def time_read(self, fmt, n_psms):
+        self.reader(self.path, **self.kwargs)
+
+    def peakmem_read(self, fmt, n_psms):
+        self.reader(self.path, **self.kwargs)
+
+    def time_detect_format(self, fmt, n_psms):
+        detect_format(self.path)
+
+
+class TextEngines:
+    """Reading the tab-delimited formats with each CSV engine"""
+
+    params = (["tide", "comet", "msgf", "msamanda"], ["c", "pyarrow"])
+    param_names = ["format", "engine"]
+    timeout = 300
+
+    def setup(self, fmt, engine):
+        if engine == "pyarrow":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise NotImplementedError("pyarrow is not installed")
+
+        self.tmp_dir = tempfile.mkdtemp()
+        psms = make_psms(250000, proteins_per_peptide=1.5)
+        self.path = write_psms(psms, fmt, Path(self.tmp_dir, "psms"))
+        self.reader = get_reader(fmt)
+
+    def teardown(self, fmt, engine):
+        shutil.rmtree(self.tmp_dir)
+
+    def time_read(self, fmt, engine):
+        self.reader(self.path, engine=engine)
@@ -0,0 +1,60 @@
+"""Benchmarks for the q-value calculations"""
+import numpy as np
+
+from crema import qvalues
+
+from .synthetic import make_psms
+
+
+class Tdc:
+    """Target-decoy competition q-values"""
+
+    params = ([10000, 1000000], [0.0, 0.5])
+    param_names = ["n_psms", "tie_rate"]
+
+    def setup(self, n_psms, tie_rate):
+        psms = make_psms(n_psms, psms_per_spectrum=1, tie_rate=tie_rate)
+        self.scores = psms["xcorr score"].to_numpy()
+        self.target = (psms["target/decoy"] == "target").to_numpy()
+        self.out = np.empty(n_psms)
+        qvalues.tdc(self.scores[:10], self.target[:10])
+
+    def time_tdc(self, n_psms, tie_rate):
+        qvalues.tdc(self.scores, self.target, desc=True, out=self.out)
+
+    def peakmem_tdc(self, n_psms, tie_rate):
+        qvalues.tdc(self.scores, self.target, desc=True)
+
+
+class Mixmax:
+    """Mix-max q-values"""
+
+    params = [10000, 1000000]
+    param_names = ["n_psms"]
+
+    def setup(self, n_psms):
+        psms = make_psms(n_psms, psms_per_spectrum=1, decoy_ratio=0.5)
+        scores = psms["xcorr score"].to_numpy()
+        target = (psms["target/decoy"] == "target").to_numpy()
+        order = np.argsort(-scores)
+        self.combined_score = scores[order]
+        self.combined_target = target[order]
+        self.target_scores = np.sort(scores[target])
+        self.decoy_scores = np.sort(scores[~target])
+        self.time_mixmax(n_psms)
+
+    def time_mixmax(self, n_psms):
+        qvalues.mixmax(
+            self.target_scores,
+            self.decoy_scores,
+            self.combined_score,
+            self.combined_target,
+        )
+
+    def peakmem_mixmax(self, n_psms):
+        qvalues.mixmax(
+            self.target_scores,
+            self.decoy_scores,
+            self.combined_score,
+            self.combined_target,
+        )
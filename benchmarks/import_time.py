@@ -0,0 +1,73 @@
+"""Measure the import time of crema and its command line interface.
+
+Each module is imported in a fresh Python process with ``-X importtime``,
+and the cumulative import time of the module and the slowest of its
+dependencies are reported.
+
+Usage::
+
+    python benchmarks/import_time.py [--top 10]
+"""
+import sys
+import json
+import argparse
+import subprocess
+
+MODULES = ["crema", "crema.crema"]
+
+
+def import_times(module):
+    """Get the cumulative import time of each module imported by `module`.
+
+    Parameters
+    ----------
+    module : str
+        The module to import.
+
+    Returns
+    -------
+    dict of str, float
+        The cumulative import time of each module, in seconds.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+
+    return times
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="The number of slowest dependencies to report.",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for module in MODULES:
+        times = import_times(module)
+        slowest = sorted(times.items(), key=lambda x: -x[1])
+        results[module] = {
+            "seconds": times[module],
+            "slowest": dict(slowest[1 : args.top + 1]),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Measure the time to the first q-value with a cold and a warm numba cache.
+
+Each measurement runs in a fresh Python process that imports crema and
+computes TDC q-values for a small set of PSMs, so that it includes both the
+import time and any compilation of the numba kernels. The first run uses an
+empty ``NUMBA_CACHE_DIR``; the following runs reuse the cache it wrote.
+
+Usage::
+
+    python benchmarks/startup.py [--repeats 3]
+
+If the ahead-of-time module has been built with ``python -m crema.aot``, it is
+used instead of the JIT kernels and both timings should be similar.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+FIRST_QVALUE = """
+import time
+start = time.perf_counter()
+import numpy as np
+from crema import qvalues
+scores = np.random.default_rng(0).normal(size=1000)
+target = np.arange(1000) % 2 == 0
+qvalues.tdc(scores, target, desc=True)
+print(time.perf_counter() - start)
+print(qvalues._qvalues_aot is not None)
+"""
+
+
+def measure_first_qvalue(cache_dir):
+    """Time the first q-value in a fresh process.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The numba cache directory to use.
+
+    Returns
+    -------
+    elapsed : float
+        The time to the first q-value, in seconds.
+    aot : bool
+        Whether the ahead-of-time compiled kernels were used.
+    """
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+    proc = subprocess.run(
+        [sys.executable, "-c", FIRST_QVALUE],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    elapsed, aot = proc.stdout.split()
+    return float(elapsed), aot == "True"
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="The number of warm cache runs.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold, aot = measure_first_qvalue(cache_dir)
+        warm = [
+            measure_first_qvalue(cache_dir)[0] for _ in range(args.repeats)
+        ]
+
+    results = {
+        "aot": aot,
+        "cold_seconds": cold,
+        "warm_seconds": min(warm),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""Generate synthetic peptide-spectrum matches (PSMs) for benchmarking.
+
+:py:func:`make_psms` creates a Tide-shaped :py:class:`pandas.DataFrame` of
+PSMs with a configurable size, decoy ratio, fraction of tied scores and
+protein sharing. The ``write_*`` functions write those PSMs in the formats
+that crema can parse.
+"""
+import numpy as np
+import pandas as pd
+
+AMINO_ACIDS = np.array(list("ACDEFGHIKLMNPQRSTVWY"))
+
+# The decoy protein prefixes that each parser expects by default.
+DECOY_PREFIXES = {
+    "tide": "decoy_",
+    "comet": "DECOY_",
+    "msgf": "XXX_",
+    "msamanda": "REV_",
+    "pepxml": "decoy_",
+    "msfragger": "rev_",
+    "mztab": "decoy_",
+}
+
+
+def make_psms(
+    n_spectra=10000,
+    psms_per_spectrum=2,
+    decoy_ratio=1.0,
+    tie_rate=0.0,
+    proteins_per_peptide=1.0,
+    n_files=1,
+    seed=0,
+):
+    """Create a synthetic collection of PSMs.
+
+    Each decoy peptide is a target peptide with its internal residues
+    reversed, so that the implicit target/decoy pairing of both Tide and
+    Comet can be used.
+
+    Parameters
+    ----------
+    n_spectra : int, optional
+        The number of spectra.
+    psms_per_spectrum : int, optional
+        The number of candidate PSMs for each spectrum.
+    decoy_ratio : float, optional
+        The expected number of decoy PSMs per target PSM.
+    tie_rate : float, optional
+        The fraction of PSMs whose scores are rounded, creating ties.
+    proteins_per_peptide : float, optional
+        The mean number of proteins that contain each peptide. Values greater
+        than 1 create shared peptides.
+    n_files : int, optional
+        The number of mass spectrometry data files the spectra are spread
+        across.
+    seed : int, optional
+        The random seed.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The PSMs, with the columns of Tide tab-delimited output.
+    """
+    rng = np.random.default_rng(seed)
+    n_psms = n_spectra * psms_per_spectrum
+    n_peptides = max(n_psms // 2, 1)
+    n_proteins = max(n_peptides // 5, 1)
+
+    # Create the target peptides and their decoys:
+    lengths = rng.integers(7, 21, size=n_peptides)
+    residues = AMINO_ACIDS[rng.integers(0, 20, size=lengths.sum())]
+    bounds = np.cumsum(lengths)[:-1]
+    targets = np.array(["".join(p) for p in np.split(residues, bounds)])
+    decoys = np.array([p[0] + p[-2:0:-1] + p[-1] for p in targets])
+
+    # Assign proteins, with shared peptides:
+    n_prot = 1 + rng.poisson(max(proteins_per_peptide - 1, 0), n_peptides)
+    prot_ids = rng.integers(0, n_proteins, size=n_prot.sum())
+    prot_ids = np.split(prot_ids, np.cumsum(n_prot)[:-1])
+    proteins = np.array([",".join(f"prot{i}" for i in p) for p in prot_ids])
+
+    # Create the PSMs:
+    pep_idx = rng.integers(0, n_peptides, size=n_psms)
+    is_decoy = rng.random(n_psms) < decoy_ratio / (1 + decoy_ratio)
+    correct = ~is_decoy & (rng.random(n_psms) < 0.3)
+    xcorr = rng.normal(1.0, 0.5, n_psms) + 2.0 * correct
+    ties = rng.random(n_psms) < tie_rate
+    xcorr[ties] = np.round(xcorr[ties], 1)
+    pval = np.exp(-4 * np.clip(xcorr, 0, None))
+
+    sequence = np.where(is_decoy, decoys[pep_idx], targets[pep_idx])
+    protein = proteins[pep_idx]
+    protein = np.where(
+        is_decoy,
+        pd.Series(protein).str.replace(r"(^|,)", r"\1decoy_", regex=True),
+        protein,
+    )
+
+    spectrum = np.repeat(np.arange(n_spectra), psms_per_spectrum)
+    mass = 500 + 2000 * rng.random(n_spectra)
+    return pd.DataFrame(
+        {
+            "file": [f"run{i}.mzML" for i in spectrum % n_files],
+            "scan": spectrum,
+            "charge": 2 + spectrum % 3,
+            "spectrum neutral mass": mass[spectrum],
+            "peptide mass": mass[spectrum],
+            "xcorr score": xcorr,
+            "exact p-value": pval,
+            "combined p-value": pval,
+            "sequence": sequence,
+            "target/decoy": np.where(is_decoy, "decoy", "target"),
+            "original target sequence": targets[pep_idx],
+            "protein id": protein,
+        }
+    )
+
+
+def _decoy_proteins(psms, prefix):
+    """Replace the Tide decoy prefix with another one"""
+    return psms["protein id"].str.replace("decoy_", prefix, regex=False)
+
+
+def write_tide(psms, path):
+    """Write PSMs in the Tide tab-delimited format.
+
+    Parameters
+    ----------
+    psms : pandas.DataFrame
+        PSMs from :py:func:`make_psms`.
+    path : str or Path
+        The output file, which should end with ".txt".
+    """
+    psms.to_csv(path, sep="\t", index=False)
+
+
+def write_comet(psms, path):
+    """Write PSMs in the standalone Comet tab-delimited format.
+
+    Parameters
+    ----------
+    psms : pandas.DataFrame
+        PSMs from :py:func:`make_psms`.
+    path : str or Path
+        The output file, which should end with ".txt".
+    """
+    out = pd.DataFrame(
+        {
+            "scan": psms["scan"],
+            "exp_neutral_mass": psms["spectrum neutral mass"],
+            "e-value": psms["exact p-value"],
+            "xcorr": psms["xcorr score"],
+            "modified_peptide": "K." + psms["sequence"] + ".A",
+            "protein": _decoy_proteins(psms, DECOY_PREFIXES["comet"]),
+        }
+    )
+    with open(path, "w") as out_file:
+        out_file.write("CometVersion 2023.01 rev. 0\n")
+
+    out.to_csv(path, sep="\t", index=False, mode="a")
+
+
+def write_msgf(psms, path):
+    """Write PSMs in the MSGF+ tsv format.
+
+    Parameters
+    ----------
+    psms : pandas.DataFrame
+        PSMs from :py:func:`make_psms`.
+    path : str or Path
+        The output file, which should end with ".tsv".
+    """
+    out = pd.DataFrame(
+        {
+            "#SpecFile": psms["file"],
+            "SpecID": psms["scan"],
+            "ScanNum": psms["scan"],
+            "Charge": psms["charge"],
+            "Peptide": psms["sequence"],
+            "Protein": _decoy_proteins(
+                psms, DECOY_PREFIXES["msgf"]
+            ).str.replace(",", ";"),
+            "DeNovoScore": psms["xcorr score"],
+            "MSGFScore": psms["xcorr score"],
+            "SpecEValue": psms["exact p-value"],
+            "EValue": psms["exact p-value"],
+        }
+    )
+    out.to_csv(path, sep="\t", index=False)
+
+
+def write_msamanda(psms, path):
+    """Write PSMs in the MSAmanda format.
+
+    Parameters
+    ----------
+    psms : pandas.DataFrame
+        PSMs from :py:func:`make_psms`.
+    path : str or Path
+        The output file, which should end with ".csv".
+    """
+    out = pd.DataFrame(
+        {
+            "Scan Number": psms["scan"],
+            "Sequence": psms["sequence"],
+            "Protein Accessions": _decoy_proteins(
+                psms, DECOY_PREFIXES["msamanda"]
+            ).str.replace(",", ";"),
+            "Amanda Score": psms["xcorr score"],
+            "Weighted Probability": psms["exact p-value"],
+            "Filename": psms["file"],
+        }
+    )
+    with open(path, "w") as out_file:
+        out_file.write("#version: 2.0.0.18350\n")
+
+    out.to_csv(path, sep="\t", index=False, mode="a")
+
+
+def write_mztab(psms, path):
+    """Write PSMs in the mzTab format.
+
+    Parameters
+    ----------
+    psms : pandas.DataFrame
+        PSMs from :py:func:`make_psms`.
+    path : str or Path
+        The output file, which should end with ".mzTab".
+    """
+    metadata = [
+        ("mzTab-version", "1.0.0"),
+        ("mzTab-mode", "Summary"),
+        ("mzTab-type", "Identification"),
+        ("description", "Synthetic PSMs"),
+        ("ms_run[1]-location", "file://run0.mzML"),
+        ("psm_search_engine_score[1]", "[MS, MS:1002252, xcorr, ]"),
+    ]
+    out = pd.DataFrame(
+        {
+            "PSH": "PSM",
+            "sequence": psms["sequence"],
+            "PSM_ID": np.arange(len(psms)),
+            "accession": _decoy_proteins(
+                psms, DECOY_PREFIXES["mztab"]
+            ).str.replace(",", ";"),
+            "modifications": "null",
+            "search_engine_score[1]": psms["xcorr score"],
+            "spectra_ref": "ms_run[1]:scan=" + psms["scan"].astype(str),
+            "opt_global_cv_MS:1002217_decoy_peptide": (
+                psms["target/decoy"] == "decoy"
+            ).astype(int),
+        }
+    )
+    with open(path, "w") as out_file:
+        for key, value in metadata:
+            out_file.write(f"MTD\t{key}\t{value}\n")
+
+        out_file.write("\n")
+
+    out.to_csv(path, sep="\t", index=False, mode="a")
+
+
+def write_pepxml(psms, path, engine="Tide"):
+    """Write PSMs in the pepXML format.
+
+    Parameters
+    ----------
+    psms : pandas.DataFrame
+        PSMs from :py:func:`make_psms`.
+    path : str or Path
+        The output file, which should end with ".pep.xml" or ".pepxml".
+    engine : {"Tide", "MSFragger"}, optional
+        The search engine to mimic. This determines the score names and the
+        decoy prefix.
+    """
+    if engine == "MSFragger":
+        prefix = DECOY_PREFIXES["msfragger"]
+        scores = {"hyperscore": "xcorr score", "expect": "exact p-value"}
+        summary = 'search_engine="X! Tandem" '
+        summary += 'search_engine_version="MSFragger-3.5"'
+    else:
+        prefix = DECOY_PREFIXES["pepxml"]
+        scores = {
+            "xcorr_score": "xcorr score",
+            "exact_pvalue": "exact p-value",
+        }
+        summary = f'search_engine="{engine}"'
+
+    proteins = _decoy_proteins(psms, prefix).str.split(",")
+    namespace = "http://regis-web.systemsbiology.net/pepXML"
+    with open(path, "w") as out_file:
+        out_file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out_file.write(f'<msms_pipeline_analysis xmlns="{namespace}">\n')
+        for fname, run in psms.groupby("file", sort=False):
+            base = fname.rsplit(".", 1)[0]
+            out_file.write(
+                f'<msms_run_summary base_name="{base}" raw_data=".mzML">\n'
+                f"<search_summary {summary}/>\n"
+            )
+            for scan, spectrum in run.groupby("scan", sort=False):
+                out_file.write(
+                    f'<spectrum_query start_scan="{scan}" end_scan="{scan}">'
+                    "<search_result>\n"
+                )
+                for idx, psm in spectrum.iterrows():
+                    prots = proteins[idx]
+                    out_file.write(
+                        f'<search_hit peptide="{psm["sequence"]}" '
+                        f'protein="{prots[0]}">'
+                    )
+                    for prot in prots[1:]:
+                        out_file.write(
+                            f'<alternative_protein protein="{prot}"/>'
+                        )
+
+                    for name, col in scores.items():
+                        out_file.write(
+                            f'<search_score name="{name}" value="{psm[col]}"/>'
+                        )
+
+                    out_file.write("</search_hit>\n")
+
+                out_file.write("</search_result></spectrum_query>\n")
+
+            out_file.write("</msms_run_summary>\n")
+
+        out_file.write("</msms_pipeline_analysis>\n")
+
+
+WRITERS = {
+    "tide": (write_tide, ".txt"),
+    "comet": (write_comet, ".txt"),
+    "msgf": (write_msgf, ".tsv"),
+    "msamanda": (write_msamanda, ".csv"),
+    "mztab": (write_mztab, ".mzTab"),
+    "pepxml": (write_pepxml, ".pep.xml"),
+    "msfragger": (
+        lambda psms, path: write_pepxml(psms, path, "MSFragger"),
+        ".pepxml",
+    ),
+}
+
+
+def write_psms(psms, fmt, path):
+    """Write PSMs in any of the supported formats.
+
+    Parameters
+    ----------
+    psms : pandas.DataFrame
+        PSMs from :py:func:`make_psms`.
+    fmt : str
+        The format name, as used by :py:func:`crema.parsers.get_reader`.
+    path : Path
+        The output file, without an extension.
+
+    Returns
+    -------
+    Path
+        The file that was written.
+    """
+    writer, ext = WRITERS[fmt]
+    path = path.with_name(path.name + ext)
+    writer(psms, path)
+    return path
@@ -16,15 +16,50 @@ except ImportError:
     except DistributionNotFound:
         pass
 
-# Here is where we can export public functions and classes.
-from .dataset import PsmDataset
-from .parsers.tide import read_tide
-from .parsers.msgf import read_msgf
-from .parsers.msamanda import read_msamanda
-from .parsers.msfragger import read_msfragger
-from .parsers.comet import read_comet
-from .parsers.txt import read_txt
-from .parsers.mztab import read_mztab
-from .parsers.pepxml import read_pepxml
-from .confidence import TdcConfidence, assign_confidence
-from .writers.txt import to_txt
+import importlib
+
+# Here is where we can export public functions and classes. They are
+# imported when they are first accessed, so that `import crema` and the
+# command line interface do not load every parser and the numba kernels.
+_EXPORTS = {
+    "PsmDataset": ".dataset",
+    "read_tide": ".parsers.tide",
+    "read_msgf": ".parsers.msgf",
+    "read_msamanda": ".parsers.msamanda",
+    "read_msfragger": ".parsers.msfragger",
+    "read_comet": ".parsers.comet",
+    "read_txt": ".parsers.txt",
+    "read_mztab": ".parsers.mztab",
+    "read_pepxml": ".parsers.pepxml",
+    "read_auto": ".parsers.auto",
+    "TdcConfidence": ".confidence",
+    "assign_confidence": ".confidence",
+    "assign_confidence_per_score": ".confidence",
+    "assign_confidence_ensemble": ".confidence",
+    "load_confidence": ".confidence",
+    "ConfidenceIndex": ".lookup",
+    "PeptidePairing": ".pairing",
+    "to_txt": ".writers.txt",
+    "assign_confidence_sharded": ".sharded",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    """Import the public functions and classes on first access"""
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}"
+        ) from None
+
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List the public functions and classes, including unloaded ones"""
+    return sorted(set(globals()) | set(__all__))
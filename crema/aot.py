@@ -0,0 +1,107 @@
+"""Ahead-of-time compilation of the numba kernels used for q-values.
+
+By default, the numba kernels in :py:mod:`crema.qvalues` are compiled the
+first time they are called and the result is cached on disk, so only the
+first run pays the compilation cost. Set the ``NUMBA_CACHE_DIR`` environment
+variable to control where that cache is written, for example when crema is
+installed in a read-only location.
+
+To avoid compilation at runtime entirely, the kernels can instead be compiled
+ahead of time into an extension module with explicit signatures::
+
+    python -m crema.aot
+
+When the resulting ``crema._qvalues_aot`` module is present, it is used for
+64-bit floating point inputs. Other inputs fall back to the JIT kernels.
+"""
+import logging
+import argparse
+from pathlib import Path
+
+from . import qvalues
+
+LOGGER = logging.getLogger(__name__)
+
+MODULE_NAME = "_qvalues_aot"
+
+# The exported name, the numba kernel, and its signature.
+SIGNATURES = [
+    (
+        "tdc_qvalues",
+        "_tdc_qvalues",
+        "void(f8[:], b1[:], i8[:], b1, f8[:])",
+    ),
+    (
+        "sorted_tdc_qvalues",
+        "_sorted_tdc_qvalues",
+        "void(f8[:], b1[:], f8[:])",
+    ),
+    (
+        "estimate_pi0",
+        "estimate_pi0",
+        "f8(f8[:])",
+    ),
+    (
+        "calculate_mixmax_qval",
+        "calculate_mixmax_qval",
+        "f8[:](f8[:], f8[:], f8)",
+    ),
+]
+
+
+def build(output_dir=None, verbose=False):
+    """Compile the q-value kernels into an extension module.
+
+    Parameters
+    ----------
+    output_dir : str or Path, optional
+        The directory in which to write the extension module. By default, it
+        is written next to this file, so that it is imported by
+        :py:mod:`crema.qvalues`.
+    verbose : bool, optional
+        Show the compiler output.
+
+    Returns
+    -------
+    Path
+        The directory containing the extension module.
+    """
+    from numba.pycc import CC
+
+    if output_dir is None:
+        output_dir = Path(__file__).parent
+
+    cc = CC(MODULE_NAME)
+    cc.output_dir = str(output_dir)
+    cc.verbose = verbose
+    for export_name, kernel_name, signature in SIGNATURES:
+        kernel = getattr(qvalues, kernel_name)
+        cc.export(export_name, signature)(kernel.py_func)
+
+    LOGGER.info("Compiling %s in %s...", MODULE_NAME, output_dir)
+    cc.compile()
+    return Path(output_dir)
+
+
+def main():
+    """Build the extension module from the command line"""
+    parser = argparse.ArgumentParser(
+        description="Compile crema's q-value kernels ahead of time."
+    )
+    parser.add_argument(
+        "--output_dir",
+        default=None,
+        help="The directory in which to write the extension module.",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Show the compiler output.",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(format="%(message)s", level=logging.INFO)
+    build(args.output_dir, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
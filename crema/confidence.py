@@ -2,18 +2,25 @@
 peptide-spectrum matches with calculated false discovery rates (FDR) and q-values.
 """
 
+import copy
+import pickle
+import importlib
 import logging
 import numpy as np
 import pandas as pd
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 
-from . import qvalues
 from . import utils
+from . import metrics
 
 from .writers.txt import to_txt
 
 np.random.seed(0)
 
+# The default FDR thresholds for discovery curves: 0.1% to 10%
+DISCOVERY_THRESHOLDS = np.arange(1, 101) / 1000
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -26,6 +33,7 @@ def assign_confidence(
     desc=None,
     eval_fdr=0.01,
     method="tdc",
+    n_jobs=1,
 ):
     """Assign confidence estimates to a collection of peptide-spectrum matches.
 
@@ -59,33 +67,44 @@ def assign_confidence(
         Default is 0.01.
     method : {"tdc"}, optional
         The method for crema to use when calculating the confidence estimates.
+    n_jobs : int, optional
+        The number of worker processes used to assign confidence to multiple
+        PsmDataset objects at once. The PSMs are sent to the workers through
+        shared memory. Default is 1, which processes the datasets one at a
+        time in this process.
 
     Returns
     -------
     Confidence object or List of Confidence objects
-        The confidence estimates for each PsmDataset.
+        The confidence estimates for each PsmDataset, in the same order as
+        `psms`.
     """
     if isinstance(psms, str):
         raise ValueError("'psms' should be a PsmDataset object, not a string.")
 
+    _check_n_jobs(n_jobs)
+
     # TODO unable to check whether psms is type PsmDataset w/o circular import
     try:
         assert isinstance(psms, list)
     except (AssertionError, TypeError):
         psms = [psms]
 
-    confs = []
-    for dset in psms:
-        conf = dset.assign_confidence(
-            score_column=score_column,
-            threshold=threshold,
-            pep_fdr_type=pep_fdr_type,
-            prot_fdr_type=prot_fdr_type,
-            desc=desc,
-            eval_fdr=eval_fdr,
-            method=method,
-        )
-        confs.append(conf)
+    kwargs = dict(
+        score_column=score_column,
+        threshold=threshold,
+        pep_fdr_type=pep_fdr_type,
+        prot_fdr_type=prot_fdr_type,
+        desc=desc,
+        eval_fdr=eval_fdr,
+        method=method,
+    )
+
+    if n_jobs == 1 or len(psms) == 1:
+        confs = [dset.assign_confidence(**kwargs) for dset in psms]
+    else:
+        tasks = [(idx, kwargs) for idx in range(len(psms))]
+        confs = _assign_confidence_parallel(psms, tasks, n_jobs)
 
     if len(confs) == 1:
         return confs[0]
@@ -93,6 +112,429 @@ def assign_confidence(
     return confs
 
 
+def assign_confidence_per_score(
+    psms,
+    score_columns=None,
+    threshold=0.01,
+    pep_fdr_type="psm-peptide",
+    prot_fdr_type="best",
+    desc=None,
+    eval_fdr=0.01,
+    method="tdc",
+    n_jobs=1,
+):
+    """Assign confidence estimates separately for each score column.
+
+    This is useful for comparing the scores of a search engine. The PSMs
+    are parsed and encoded once and shared by the competition and q-value
+    calculation for every score, which can run in worker processes.
+
+    Parameters
+    ----------
+    psms : PsmDataset
+        The collection of PSMs.
+    score_columns : list of str, optional
+        The scores for which to estimate confidence. By default, all of the
+        score columns of `psms` are used.
+    threshold : float or "q-value", optional
+        The FDR threshold for accepting discoveries. Default is 0.01. If
+        "q-value" is chosen, then "accept" column is replaced with
+        "crema q-value".
+    pep_fdr_type : {"psm-only","peptide-only",psm-peptide"}, optional
+        The method for Crema to use when calculating peptide level confidence
+        estimates.
+    prot_fdr_type : {"best", "combine"}, optional
+        The method for crema to use when calculating protein level confidence
+        estimates. Default is "best".
+    desc : bool or dict of str, bool, optional
+        True if higher scores better, False if lower scores are better. A
+        dictionary can specify this for each score. If None, crema will try
+        both for each score and use the choice that yields the most PSMs at
+        the specified false discovery rate threshold (`eval_fdr`).
+    eval_fdr : float, optional
+        The false discovery rate threshold used to choose `desc`. This should
+        range from 0 to 1. Default is 0.01.
+    method : {"tdc"}, optional
+        The method for crema to use when calculating the confidence estimates.
+    n_jobs : int, optional
+        The number of worker processes. The PSMs are sent to the workers once,
+        through shared memory. Default is 1, which processes the scores one at
+        a time in this process.
+
+    Returns
+    -------
+    dict of str, Confidence object
+        The confidence estimates for each score, in the order of
+        `score_columns`.
+    """
+    if score_columns is None:
+        score_columns = psms.score_columns
+
+    _check_n_jobs(n_jobs)
+    score_columns = utils.listify(score_columns)
+    if not isinstance(desc, dict):
+        desc = {score: desc for score in score_columns}
+
+    tasks = [
+        (
+            0,
+            dict(
+                score_column=score,
+                threshold=threshold,
+                pep_fdr_type=pep_fdr_type,
+                prot_fdr_type=prot_fdr_type,
+                desc=desc.get(score),
+                eval_fdr=eval_fdr,
+                method=method,
+            ),
+        )
+        for score in score_columns
+    ]
+
+    if n_jobs == 1 or len(tasks) == 1:
+        confs = [psms.assign_confidence(**kwargs) for _, kwargs in tasks]
+    else:
+        confs = _assign_confidence_parallel([psms], tasks, n_jobs)
+
+    return dict(zip(score_columns, confs))
+
+
+def assign_confidence_ensemble(
+    psms,
+    n_seeds=10,
+    seed=None,
+    score_column=None,
+    threshold=0.01,
+    pep_fdr_type="psm-peptide",
+    prot_fdr_type="best",
+    desc=None,
+    eval_fdr=0.01,
+    method="tdc",
+    n_jobs=1,
+):
+    """Assign confidence estimates repeatedly, breaking ties differently.
+
+    Ties between PSMs with equal scores are broken at random during
+    competition, so the accepted discoveries can change from run to run.
+    This reruns the competition and confidence estimation with `n_seeds`
+    independent random seeds, using the same parsed and encoded PSMs, to
+    measure how much they change.
+
+    Parameters
+    ----------
+    psms : PsmDataset
+        The collection of PSMs.
+    n_seeds : int, optional
+        The number of runs, each with a different random seed.
+    seed : int, optional
+        The seed used to draw the seed of each run. By default, they are
+        drawn from the global random state.
+    score_column : str, optional
+        The score by which to rank the PSMs for confidence estimation. If
+        :code:`None`, the score that yields the most PSMs at the specified
+        false discovery rate threshold (`eval_fdr`) will be used, and it is
+        chosen once for all of the runs.
+    threshold : float, optional
+        The FDR threshold for accepting discoveries. Default is 0.01.
+    pep_fdr_type : {"psm-only","peptide-only",psm-peptide"}, optional
+        The method for Crema to use when calculating peptide level confidence
+        estimates.
+    prot_fdr_type : {"best", "combine"}, optional
+        The method for crema to use when calculating protein level confidence
+        estimates. Default is "best".
+    desc : bool, optional
+        True if higher scores better, False if lower scores are better. If
+        :code:`None`, it is chosen once for all of the runs as in
+        :py:func:`assign_confidence()`.
+    eval_fdr : float, optional
+        The false discovery rate threshold used to choose `score_column` and
+        `desc`. This should range from 0 to 1. Default is 0.01.
+    method : {"tdc"}, optional
+        The method for crema to use when calculating the confidence estimates.
+    n_jobs : int, optional
+        The number of worker processes. The PSMs are sent to the workers once,
+        through shared memory. Default is 1, which runs one seed at a time in
+        this process.
+
+    Returns
+    -------
+    ConfidenceEnsemble object
+        The confidence estimates of every run.
+    """
+    if threshold == "q-value" or not 0 <= threshold <= 1:
+        raise ValueError("'threshold' should be between 0 and 1.")
+
+    _check_n_jobs(n_jobs)
+    if score_column is None:
+        score_column, _, desc = psms.find_best_score(eval_fdr)
+    elif desc is None:
+        desc = _choose_desc(psms, score_column, eval_fdr)
+
+    if seed is None:
+        seeds = _draw_seeds(n_seeds)
+    else:
+        seeds = _draw_seeds(n_seeds, np.random.RandomState(seed))
+
+    kwargs = dict(
+        score_column=score_column,
+        threshold=threshold,
+        pep_fdr_type=pep_fdr_type,
+        prot_fdr_type=prot_fdr_type,
+        desc=desc,
+        eval_fdr=eval_fdr,
+        method=method,
+    )
+
+    if n_jobs == 1:
+        state = np.random.get_state()
+        try:
+            confs = []
+            for run_seed in seeds:
+                np.random.seed(run_seed)
+                confs.append(psms.assign_confidence(**kwargs))
+        finally:
+            np.random.set_state(state)
+    else:
+        tasks = [(0, kwargs)] * n_seeds
+        confs = _assign_confidence_parallel([psms], tasks, n_jobs, seeds)
+
+    return ConfidenceEnsemble(confs, seeds)
+
+
+def _check_n_jobs(n_jobs):
+    """Check that the number of worker processes is valid.
+
+    Parameters
+    ----------
+    n_jobs : int
+        The number of worker processes.
+    """
+    if n_jobs < 1:
+        raise ValueError("'n_jobs' should be at least 1.")
+
+
+def _draw_seeds(n_seeds, random_state=np.random):
+    """Draw random seeds for independent runs.
+
+    Parameters
+    ----------
+    n_seeds : int
+        The number of seeds.
+    random_state : numpy.random.RandomState, optional
+        The source of the seeds. By default, the global random state.
+
+    Returns
+    -------
+    numpy.ndarray of int
+        The seeds.
+    """
+    return random_state.randint(np.iinfo(np.int32).max, size=n_seeds)
+
+
+def _choose_desc(psms, score_column, eval_fdr):
+    """Choose whether higher or lower scores are better.
+
+    Parameters
+    ----------
+    psms : PsmDataset
+        The collection of PSMs.
+    score_column : str
+        The score.
+    eval_fdr : float
+        The false discovery rate threshold used to compare the choices.
+
+    Returns
+    -------
+    bool
+        True if higher scores yield more PSMs at `eval_fdr`.
+    """
+    from . import qvalues
+
+    scores, targ = psms[score_column], psms.targets
+    order = psms.score_order(score_column)
+    t_pass = (qvalues.tdc(scores, targ, True, order=order) <= eval_fdr).sum()
+    f_pass = (qvalues.tdc(scores, targ, False, order=order) <= eval_fdr).sum()
+    return t_pass > f_pass
+
+
+def _assign_confidence_parallel(psms, tasks, n_jobs, seeds=None):
+    """Assign confidence estimates to PsmDatasets in worker processes.
+
+    Each dataset is placed in shared memory once, and each worker rebuilds it
+    at most once, no matter how many tasks use it.
+
+    Parameters
+    ----------
+    psms : list of PsmDataset
+        The collections of PSMs.
+    tasks : list of tuple of int, dict
+        The index of the dataset in `psms` and the keyword arguments for
+        :py:meth:`~crema.dataset.PsmDataset.assign_confidence()` of each task.
+    n_jobs : int
+        The number of worker processes.
+    seeds : list of int, optional
+        The random seed used to break ties in each task. By default, they are
+        drawn from the global random state.
+
+    Returns
+    -------
+    list of Confidence objects
+        The confidence estimates for each task, in input order.
+    """
+    # Draw a seed for each task so that ties are broken independently,
+    # but reproducibly, in each worker.
+    if seeds is None:
+        seeds = _draw_seeds(len(tasks))
+
+    shared = []
+    blocks = []
+    try:
+        for dset in psms:
+            spec, dset_blocks = utils.to_shared_memory(dset._data)
+            blocks += dset_blocks
+            shared.append((spec, dset._column_roles()))
+
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_worker,
+            initargs=(shared,),
+        ) as pool:
+            futures = [
+                pool.submit(_assign_confidence_shared, idx, kwargs, seed)
+                for (idx, kwargs), seed in zip(tasks, seeds)
+            ]
+            confs = [f.result() for f in futures]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    # The workers do not send back the PSMs, so reattach the originals.
+    for conf, (idx, _) in zip(confs, tasks):
+        conf._dataset = psms[idx]
+        conf._data = psms[idx].data
+
+    return confs
+
+
+# The datasets shared with a worker process, and those it has rebuilt.
+_WORKER_SHARED = []
+_WORKER_DATASETS = {}
+
+
+def _init_worker(shared):
+    """Receive the shared datasets in a worker process.
+
+    Parameters
+    ----------
+    shared : list of tuple
+        The shared memory specification from
+        :py:func:`~crema.utils.to_shared_memory()` and the column roles of
+        each dataset.
+    """
+    _WORKER_SHARED[:] = shared
+    _WORKER_DATASETS.clear()
+
+
+def _assign_confidence_shared(idx, kwargs, seed):
+    """Assign confidence estimates to a PsmDataset in shared memory.
+
+    This is run in a worker process.
+
+    Parameters
+    ----------
+    idx : int
+        The index of the shared dataset.
+    kwargs : dict
+        The keyword arguments for
+        :py:meth:`~crema.dataset.PsmDataset.assign_confidence()`.
+    seed : int
+        The random seed used to break ties.
+
+    Returns
+    -------
+    Confidence object
+        The confidence estimates, without the underlying PSMs.
+    """
+    # Imported here to avoid a circular import.
+    from .dataset import PsmDataset
+
+    np.random.seed(seed)
+
+    dset = _WORKER_DATASETS.get(idx)
+    if dset is None:
+        spec, roles = _WORKER_SHARED[idx]
+        # The rebuilt data are already a private copy, so keep them as is.
+        data = utils.from_shared_memory(spec)
+        dset = PsmDataset(data, copy_data=False, **roles)
+        _WORKER_DATASETS[idx] = dset
+
+    conf = dset.assign_confidence(**kwargs)
+    conf._dataset = None
+    conf._data = None
+    return conf
+
+
+def load_confidence(path):
+    """Load confidence estimates saved with :py:meth:`Confidence.save()`.
+
+    The loaded object does not contain the underlying PSMs, so its `dataset`
+    and `data` attributes are :code:`None`. Only load files from sources you
+    trust, because they are read with :py:mod:`pickle`.
+
+    The tables are pickled pandas objects, which may not load correctly with
+    other versions of crema or pandas. A warning is logged if the file was
+    saved with a different version of crema. No warning is logged if either
+    version is unknown.
+
+    Parameters
+    ----------
+    path : str or Path
+        The saved confidence estimates.
+
+    Returns
+    -------
+    Confidence
+        The loaded confidence estimates.
+    """
+    with open(path, "rb") as in_file:
+        saved = pickle.load(in_file)
+
+    try:
+        conf = saved["confidence"]
+    except (TypeError, KeyError):
+        conf = None
+
+    if not isinstance(conf, Confidence):
+        raise ValueError(f"{path} does not contain saved crema results.")
+
+    # The version is unknown when crema is run from a source checkout.
+    saved_version = saved.get("crema_version")
+    version = _crema_version()
+    if None not in (saved_version, version) and saved_version != version:
+        LOGGER.warning(
+            "%s was saved with crema %s, but this is crema %s. The loaded "
+            "results may be incorrect; assign confidence again if in doubt.",
+            path,
+            saved_version,
+            version,
+        )
+
+    return conf
+
+
+def _crema_version():
+    """The installed version of crema.
+
+    Returns
+    -------
+    str or None
+        The version, or :code:`None` if crema is not installed, such as when
+        it is run from a source checkout.
+    """
+    return getattr(importlib.import_module(__package__), "__version__", None)
+
+
 class Confidence(ABC):
     """Estimate statistical confidence estimates for a collection of PSMs.
 
@@ -188,10 +630,7 @@ class Confidence(ABC):
             raise ValueError("%s not valid prot_fdr_type" % (prot_fdr_type))
 
         if desc is None:
-            scores, targ = psms[score_column], psms.targets
-            t_pass = (qvalues.tdc(scores, targ, desc=True) <= eval_fdr).sum()
-            f_pass = (qvalues.tdc(scores, targ, desc=False) <= eval_fdr).sum()
-            desc = t_pass > f_pass
+            desc = _choose_desc(psms, score_column, eval_fdr)
 
         self._dataset = psms
         self._data = psms.data
@@ -208,11 +647,19 @@ class Confidence(ABC):
         self._pep_fdr_type = pep_fdr_type
         self._prot_fdr_type = prot_fdr_type
         self._threshold = threshold
+        if psms.compact:
+            self._qvalue_dtype = np.float32
+        else:
+            self._qvalue_dtype = np.float64
+
         self.confidence_estimates = {}
         self.decoy_confidence_estimates = {}
+        self._qvalues = {}
+        self._decoy_qvalues = {}
 
         # Assign confidence estimates
-        self._assign_confidence()
+        with metrics.stage("confidence"):
+            self._assign_confidence()
 
         # Clean up tables
         self._prettify_tables(threshold)
@@ -227,6 +674,11 @@ class Confidence(ABC):
         """The underlying :py:class:`~crema.dataset.PsmDataset`"""
         return self._dataset
 
+    @property
+    def threshold(self):
+        """The FDR threshold for accepting discoveries, or "q-value"."""
+        return self._threshold
+
     @property
     def levels(self):
         """The available levels of confidence estimates"""
@@ -270,6 +722,7 @@ class Confidence(ABC):
 
             # reverse order so best score is begining of df
             df = df.iloc[::-1]
+            self._qvalues[level] = df["crema q-value"].to_numpy()
 
             if level == "protein_groups":
                 self.confidence_estimates[level] = df.loc[:, prot_group_cols]
@@ -289,6 +742,7 @@ class Confidence(ABC):
 
             # reverse order so best score is begining of df
             df = df.iloc[::-1]
+            self._decoy_qvalues[level] = df["crema q-value"].to_numpy()
 
             if level == "protein_groups":
                 self.decoy_confidence_estimates[level] = df.loc[
@@ -299,7 +753,118 @@ class Confidence(ABC):
             else:  # PSM and peptide
                 self.decoy_confidence_estimates[level] = df.loc[:, cols]
 
-    def _compete(self, df, group_columns):
+    def rethreshold(self, threshold):
+        """Change the FDR threshold for accepting discoveries.
+
+        The "accept" column of the confidence estimates is recalculated from
+        the stored q-values, so the confidence estimates do not need to be
+        assigned again.
+
+        Parameters
+        ----------
+        threshold : float or "q-value"
+            The FDR threshold for accepting discoveries. If "q-value" is
+            chosen, then "accept" column is replaced with "crema q-value".
+
+        Returns
+        -------
+        self
+        """
+        if threshold != "q-value" and not 0 <= threshold <= 1:
+            raise ValueError(
+                "'threshold' should be between 0 and 1 or 'q-value'."
+            )
+
+        for level, df in self.confidence_estimates.items():
+            df = df.drop(columns=["accept", "crema q-value"], errors="ignore")
+            if threshold == "q-value":
+                df["crema q-value"] = self._qvalues[level]
+            else:
+                df["accept"] = self._qvalues[level] <= threshold
+
+            self.confidence_estimates[level] = df
+
+        self._threshold = threshold
+        return self
+
+    def discovery_curve(self, thresholds=None):
+        """Count the accepted discoveries at each of many FDR thresholds.
+
+        The counts for all thresholds are found in a single pass over the
+        sorted q-values of each level.
+
+        Parameters
+        ----------
+        thresholds : array-like of float, optional
+            The FDR thresholds. By default, 0.1% to 10% in steps of 0.1%.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The number of target discoveries with q-values less than or equal
+            to each threshold, with a column for each level.
+        """
+        if thresholds is None:
+            thresholds = DISCOVERY_THRESHOLDS
+
+        thresholds = np.asarray(thresholds, dtype=float)
+        curve = pd.DataFrame({"threshold": thresholds})
+        for level, qvals in self._qvalues.items():
+            # The q-values are sorted unless the method does not guarantee it.
+            if np.any(qvals[1:] < qvals[:-1]):
+                qvals = np.sort(qvals)
+
+            curve[level] = np.searchsorted(qvals, thresholds, side="right")
+
+        return curve
+
+    def index(self):
+        """Index the confidence estimates for fast lookups.
+
+        The index supports looking up a batch of spectra, peptides, proteins
+        or protein groups at once, instead of selecting each from the
+        confidence estimate tables.
+
+        Returns
+        -------
+        ConfidenceIndex
+            The q-values and accepted discoveries of each level, indexed by
+            their keys.
+        """
+        from .lookup import ConfidenceIndex
+
+        return ConfidenceIndex.from_confidence(self)
+
+    def save(self, path):
+        """Save the confidence estimates to a file.
+
+        The target and decoy confidence estimates, their q-values and the
+        parameters used to assign them are saved, but not the underlying
+        PSMs. Use :py:func:`~crema.load_confidence()` to load the file.
+
+        Parameters
+        ----------
+        path : str or Path
+            The file in which to save the confidence estimates.
+
+        Returns
+        -------
+        str
+            The path to the saved file.
+        """
+        conf = copy.copy(self)
+        conf._dataset = None
+        conf._data = None
+        with open(path, "wb") as out_file:
+            pickle.dump(
+                {"crema_version": _crema_version(), "confidence": conf},
+                out_file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+        return str(path)
+
+    def _compete(self, df, group_columns, keys=None):
         """Perform target-decoy competition
 
         For each group defined by `group_columns`, keep only the element
@@ -312,6 +877,10 @@ class Confidence(ABC):
         group_columns: str or list of str
             The columns that define a group. The best score is retained
             within the group.
+        keys : numpy.ndarray, optional
+            The spectrum keys of the rows of `df`, which define the groups in
+            place of `group_columns`. If each spectrum has only one PSM, the
+            competition is skipped.
 
         Returns
         -------
@@ -319,23 +888,37 @@ class Confidence(ABC):
             A :py:class:`pandas.DataFrame` containing only rows that won the
             competition.
         """
-        if self._desc:
-            keep = "last"
-        else:
-            keep = "first"
+        if keys is not None and self.dataset.one_psm_per_spectrum:
+            metrics.skip("competition", "each spectrum has one PSM")
+            return _compete(
+                df, group_columns, self._score_column, self._desc, keys, True
+            )
 
-        group_columns = utils.listify(group_columns)
-        # Shuffle dataframe so ties are broken randomly.
-        out_df = (
-            df.sample(frac=1)
-            .sort_values([self._score_column] + group_columns)
-            .drop_duplicates(group_columns, keep=keep)
-        )
+        with metrics.stage("competition"):
+            return _compete(
+                df, group_columns, self._score_column, self._desc, keys
+            )
 
-        # This ensures that best score is at top of dataframe
-        if self._desc == False:
-            out_df = out_df[::-1]
-        return out_df
+    def _competition_order(self, num_rows):
+        """The indices that sort the result of a competition by score
+
+        :py:meth:`_compete()` orders its rows from worst to best score, so
+        the ascending order of the scores is known without sorting again.
+
+        Parameters
+        ----------
+        num_rows : int
+            The number of rows in the competition result.
+
+        Returns
+        -------
+        numpy.ndarray of int
+            The indices that sort the scores in ascending order.
+        """
+        if self._desc:
+            return np.arange(num_rows)
+
+        return np.arange(num_rows - 1, -1, -1)
 
     def __getitem__(self, column):
         """Return the specified column"""
@@ -481,147 +1064,185 @@ class TdcConfidence(Confidence):
         )
 
         for level, group_cols in zip(self.levels, self._level_columns):
-            # NOTE line below can removed if psm-only and peptide-only methods are removed
-            df = self.data
-            pair_col = utils.new_column("pairing", df)
-
-            if level == "peptides":
-                if self._pep_fdr_type == "psm-only":
-                    group_cols = utils.listify(group_cols)
-                elif (
-                    self._pep_fdr_type == "peptide-only"
-                    or self._pep_fdr_type == "psm-peptide"
-                ):
-                    if self._pep_fdr_type == "psm-peptide":
-                        df = self._compete(df, self.dataset._spectrum_columns)
-                        group_cols = utils.listify(group_cols)
+            with metrics.stage(level):
+                # NOTE line below can removed if psm-only and peptide-only methods are removed
+                df = self.data
+                pair_col = utils.new_column("pairing", df)
 
-                    # replace sequence with pairing
-                    pair_col = utils.new_column("pairing", df)
-                    df[pair_col] = df[self.dataset._peptide_column].map(
-                        lambda x: pairing.get(x, x)
-                    )
-                    group_cols = utils.listify(group_cols) + [pair_col]
-                    group_cols.remove(self.dataset._peptide_column)
-                else:
-                    raise ValueError(
-                        f"'{self._pep_fdr_type}' is not a valid value for "
-                        "pep_fdr_type "
-                    )
-            elif level == "proteins" or level == "protein_groups":
-                if level == "proteins":
-                    # Perform PSM level TDC
-                    df = self._compete(df, self.dataset._spectrum_columns)
-
-                    # Remove peptides found in multiple proteins
-                    df = df[
-                        ~df[self.dataset._protein_column].str.contains(
-                            self.dataset._protein_delim
+                if level == "peptides":
+                    if self._pep_fdr_type == "psm-only":
+                        group_cols = utils.listify(group_cols)
+                    elif (
+                        self._pep_fdr_type == "peptide-only"
+                        or self._pep_fdr_type == "psm-peptide"
+                    ):
+                        if self._pep_fdr_type == "psm-peptide":
+                            df = self._compete(
+                                df,
+                                self.dataset._spectrum_columns,
+                                self.dataset.spectrum_keys,
+                            )
+                            group_cols = utils.listify(group_cols)
+
+                        # replace sequence with pairing, without adding a
+                        # column to the PSMs, which may be shared.
+                        pair_col = utils.new_column("pairing", df)
+                        with metrics.stage("pairing"):
+                            peptides = df[self.dataset._peptide_column]
+                            df = df.assign(
+                                **{
+                                    pair_col: utils.map_unique(
+                                        peptides,
+                                        lambda peps: peps.map(
+                                            lambda x: pairing.get(x, x)
+                                        ),
+                                    )
+                                }
+                            )
+                        group_cols = utils.listify(group_cols) + [pair_col]
+                        group_cols.remove(self.dataset._peptide_column)
+                    else:
+                        raise ValueError(
+                            f"'{self._pep_fdr_type}' is not a valid value for "
+                            "pep_fdr_type "
+                        )
+                elif level == "proteins" or level == "protein_groups":
+                    if level == "proteins":
+                        # Perform PSM level TDC
+                        df = self._compete(
+                            df,
+                            self.dataset._spectrum_columns,
+                            self.dataset.spectrum_keys,
                         )
-                    ]
-                elif level == "protein_groups":
-                    # obtain peptides at 1% peptide-level FDR
-                    pep_tar = self.confidence_estimates["peptides"]
-                    conf_tar = pep_tar[pep_tar["crema q-value"] <= 0.01].copy()
-
-                    pep_dec = self.decoy_confidence_estimates["peptides"]
-                    conf_dec = pep_dec[pep_dec["crema q-value"] <= 0.01].copy()
-
-                    LOGGER.info("Building protein groups...")
-                    protein_group, pep_to_prot = _group_proteins(
-                        conf_tar,
-                        conf_dec,
-                        self.dataset._protein_delim,
-                        self.dataset._protein_column,
-                        self.dataset._peptide_column,
-                    )
-
-                    LOGGER.info("Discarding shared peptides...")
-                    unique_peptides = {}
-                    for pep, prots in pep_to_prot.items():
-                        if len(prots) == 1:
-                            unique_peptides[pep] = next(iter(prots))
-
-                    conf_tar["protein group"] = conf_tar[
-                        self.dataset._peptide_column
-                    ].apply(lambda x: next(iter(pep_to_prot.get(x))))
-                    conf_dec["protein group"] = conf_dec[
-                        self.dataset._peptide_column
-                    ].apply(lambda x: next(iter(pep_to_prot.get(x))))
-
-                    conf_tar = conf_tar.drop(
-                        columns=[self.dataset._protein_column, "crema q-value"]
-                    )
-                    conf_dec = conf_dec.drop(
-                        columns=[
-                            self.dataset._protein_column,
-                            "crema q-value",
-                        ],
-                    )
-
-                    df = pd.concat([conf_tar, conf_dec])
 
-                # Determines how to aggregate protein score
-                if self._prot_fdr_type == "best":
-                    if self._desc == True:
-                        agg_val = "max"  # larger score is better
-                    else:
-                        agg_val = "min"  # smaller score is better
-                else:  # prot_fdr_type == combine
-                    if self._desc == True:
-                        agg_val = "sum"
-                    else:
-                        agg_val = "prod"
+                        # Remove peptides found in multiple proteins
+                        shared = utils.map_unique(
+                            df[self.dataset._protein_column],
+                            lambda prots: prots.str.contains(
+                                self.dataset._protein_delim
+                            ),
+                        )
+                        df = df[~shared]
+                    elif level == "protein_groups":
+                        # obtain peptides at 1% peptide-level FDR
+                        pep_tar = self.confidence_estimates["peptides"]
+                        conf_tar = pep_tar[
+                            pep_tar["crema q-value"] <= 0.01
+                        ].copy()
+
+                        pep_dec = self.decoy_confidence_estimates["peptides"]
+                        conf_dec = pep_dec[
+                            pep_dec["crema q-value"] <= 0.01
+                        ].copy()
+
+                        LOGGER.info("Building protein groups...")
+                        with metrics.stage("protein grouping"):
+                            protein_group, pep_to_prot = _group_proteins(
+                                conf_tar,
+                                conf_dec,
+                                self.dataset._protein_delim,
+                                self.dataset._protein_column,
+                                self.dataset._peptide_column,
+                            )
+
+                        LOGGER.info("Discarding shared peptides...")
+                        unique_peptides = {}
+                        for pep, prots in pep_to_prot.items():
+                            if len(prots) == 1:
+                                unique_peptides[pep] = next(iter(prots))
+
+                        conf_tar["protein group"] = conf_tar[
+                            self.dataset._peptide_column
+                        ].apply(lambda x: next(iter(pep_to_prot.get(x))))
+                        conf_dec["protein group"] = conf_dec[
+                            self.dataset._peptide_column
+                        ].apply(lambda x: next(iter(pep_to_prot.get(x))))
+
+                        conf_tar = conf_tar.drop(
+                            columns=[
+                                self.dataset._protein_column,
+                                "crema q-value",
+                            ]
+                        )
+                        conf_dec = conf_dec.drop(
+                            columns=[
+                                self.dataset._protein_column,
+                                "crema q-value",
+                            ],
+                        )
 
-                if level == "proteins":
-                    df2 = df.groupby(
-                        [
+                        df = pd.concat([conf_tar, conf_dec])
+
+                    # Determines how to aggregate protein score
+                    if self._prot_fdr_type == "best":
+                        if self._desc == True:
+                            agg_val = "max"  # larger score is better
+                        else:
+                            agg_val = "min"  # smaller score is better
+                    else:  # prot_fdr_type == combine
+                        if self._desc == True:
+                            agg_val = "sum"
+                        else:
+                            agg_val = "prod"
+
+                    if level == "proteins":
+                        df2 = df.groupby(
+                            [
+                                self.dataset._protein_column,
+                                self.dataset._target_column,
+                            ]
+                        ).agg({self._score_column: [agg_val]})
+                    elif level == "protein_groups":
+                        df2 = df.groupby(
+                            [
+                                "protein group",
+                                self.dataset._target_column,
+                            ]
+                        ).agg({self._score_column: [agg_val]})
+
+                    df2 = df2.reset_index()
+                    if level == "proteins":
+                        df2.columns = [
                             self.dataset._protein_column,
                             self.dataset._target_column,
+                            self._score_column,
                         ]
-                    ).agg({self._score_column: [agg_val]})
-                elif level == "protein_groups":
-                    df2 = df.groupby(
-                        [
+                    elif level == "protein_groups":
+                        df2.columns = [
                             "protein group",
                             self.dataset._target_column,
+                            self._score_column,
                         ]
-                    ).agg({self._score_column: [agg_val]})
-
-                df2 = df2.reset_index()
-                if level == "proteins":
-                    df2.columns = [
-                        self.dataset._protein_column,
-                        self.dataset._target_column,
-                        self._score_column,
-                    ]
-                elif level == "protein_groups":
-                    df2.columns = [
-                        "protein group",
-                        self.dataset._target_column,
-                        self._score_column,
-                    ]
-                df = df2
-
-            df = self._compete(df, group_cols)
-            targets = df[self.dataset._target_column]
-
-            # Now calculate q-values:
-            df["crema q-value"] = qvalues.tdc(
-                scores=df[self._score_column],
-                target=targets,
-                desc=self._desc,
-            )
+                    df = df2
 
-            LOGGER.info(
-                "  - Found %i %s at q<=%g.",
-                (df[targets]["crema q-value"] <= self._eval_fdr).sum(),
-                self._level_labs[level],
-                self._eval_fdr,
-            )
+                keys = None
+                if level == "psms":
+                    keys = self.dataset.spectrum_keys
+
+                df = self._compete(df, group_cols, keys)
+                targets = df[self.dataset._target_column]
 
-            self.confidence_estimates[level] = df.loc[targets, :]
-            self.decoy_confidence_estimates[level] = df.loc[~targets, :]
+                # Now calculate q-values:
+                from . import qvalues
+
+                with metrics.stage("q-values"):
+                    df["crema q-value"] = qvalues.tdc(
+                        scores=df[self._score_column],
+                        target=targets,
+                        desc=self._desc,
+                        out=np.empty(len(df), dtype=self._qvalue_dtype),
+                        order=self._competition_order(len(df)),
+                    )
+
+                LOGGER.info(
+                    "  - Found %i %s at q<=%g.",
+                    (df[targets]["crema q-value"] <= self._eval_fdr).sum(),
+                    self._level_labs[level],
+                    self._eval_fdr,
+                )
+
+                self.confidence_estimates[level] = df.loc[targets, :]
+                self.decoy_confidence_estimates[level] = df.loc[~targets, :]
 
 
 class MixmaxConfidence(Confidence):
@@ -717,89 +1338,281 @@ class MixmaxConfidence(Confidence):
             if level != "psms":
                 continue
 
-            df = self.data
-            group_cols = utils.listify(group_cols)
+            with metrics.stage(level):
+                # Compete on the encoded spectrum keys.
+                key_col = utils.new_column("spectrum key", self.data)
+                df = self.data.assign(**{key_col: self.dataset.spectrum_keys})
+                group_cols = [key_col]
+
+                targets = df[df[self.dataset._target_column]]
+                decoys = df[~df[self.dataset._target_column]]
+
+                if targets.shape[1] != decoys.shape[1]:
+                    LOGGER.warning(
+                        "The mix-max procedure is not well behaved when "
+                        "# targets (%i) != # decoys (%i).",
+                        targets.shape[0],
+                        decoys.shape[0],
+                    )
 
-            targets = df[df[self.dataset._target_column]]
-            decoys = df[~df[self.dataset._target_column]]
+                if self._desc:
+                    keep = "last"
+                else:
+                    keep = "first"
+
+                with metrics.stage("competition"):
+                    # sort targets by score column and keep top rank
+                    targets_sorted = (
+                        targets.sample(frac=1)
+                        .sort_values([self._score_column] + group_cols)
+                        .drop_duplicates(
+                            group_cols, keep=keep, ignore_index=True
+                        )
+                    )
 
-            if targets.shape[1] != decoys.shape[1]:
-                LOGGER.warning(
-                    "The mix-max procedure is not well behaved when "
-                    "# targets (%i) != # decoys (%i).",
-                    targets.shape[0],
-                    decoys.shape[0],
-                )
+                    # sort decoys by score column and keep top rank
+                    decoys_sorted = (
+                        decoys.sample(frac=1)
+                        .sort_values([self._score_column] + group_cols)
+                        .drop_duplicates(
+                            group_cols, keep=keep, ignore_index=True
+                        )
+                    )
 
-            if self._desc:
-                keep = "last"
-            else:
-                keep = "first"
+                # combine top ranked target and decoy into one dataframe
+                combined = pd.concat([targets_sorted, decoys_sorted])
+                combined_sorted = combined.sample(frac=1).sort_values(
+                    [self._score_column],
+                    ascending=~self._desc,
+                    ignore_index=True,
+                )
 
-            # sort targets by score column and keep top rank
-            targets_sorted = (
-                targets.sample(frac=1)
-                .sort_values([self._score_column] + group_cols)
-                .drop_duplicates(group_cols, keep=keep, ignore_index=True)
-            )
+                # qvalues.py::calculate_mixmax_qval expects target scores
+                # and decoy scores to be sorted from worst to best
+                # qvalues.py::mixmax expected combined_sorted scores
+                # to be sorted from best to worst
+                if self._desc:  # larger score is better
+                    combined_sorted = combined_sorted[::-1]
+                else:  # smaller score is better
+                    targets_sorted[self._score_column] = (
+                        targets_sorted[self._score_column] * -1.0
+                    )
+                    decoys_sorted[self._score_column] = (
+                        decoys_sorted[self._score_column] * -1.0
+                    )
+                    targets_sorted = targets_sorted[::-1]
+                    decoys_sorted = decoys_sorted[::-1]
+
+                # Now calculate q-values:
+                from . import qvalues
+
+                with metrics.stage("q-values"):
+                    pi0, targets_sorted["crema q-value"] = qvalues.mixmax(
+                        target_scores=targets_sorted[self._score_column],
+                        decoy_scores=decoys_sorted[self._score_column],
+                        combined_score=combined_sorted[self._score_column],
+                        combined_score_target=combined_sorted[
+                            self.dataset._target_column
+                        ],
+                    )
 
-            # sort decoys by score column and keep top rank
-            decoys_sorted = (
-                decoys.sample(frac=1)
-                .sort_values([self._score_column] + group_cols)
-                .drop_duplicates(group_cols, keep=keep, ignore_index=True)
-            )
+                targets_sorted["crema q-value"] = targets_sorted[
+                    "crema q-value"
+                ].astype(self._qvalue_dtype)
 
-            # combine top ranked target and decoy into one dataframe
-            combined = pd.concat([targets_sorted, decoys_sorted])
-            combined_sorted = combined.sample(frac=1).sort_values(
-                [self._score_column], ascending=~self._desc, ignore_index=True
-            )
+                LOGGER.info("  - Estimated pi_zero = %f.", pi0)
 
-            # qvalues.py::calculate_mixmax_qval expects target scores
-            # and decoy scores to be sorted from worst to best
-            # qvalues.py::mixmax expected combined_sorted scores
-            # to be sorted from best to worst
-            if self._desc:  # larger score is better
-                combined_sorted = combined_sorted[::-1]
-            else:  # smaller score is better
-                targets_sorted[self._score_column] = (
-                    targets_sorted[self._score_column] * -1.0
-                )
-                decoys_sorted[self._score_column] = (
-                    decoys_sorted[self._score_column] * -1.0
+                LOGGER.info(
+                    "  - Found %i %s at q<=%g.",
+                    (targets_sorted["crema q-value"] <= self._eval_fdr).sum(),
+                    self._level_labs[level],
+                    self._eval_fdr,
                 )
+
+                # reverse rows so that best score is at top
                 targets_sorted = targets_sorted[::-1]
-                decoys_sorted = decoys_sorted[::-1]
-
-            # Now calculate q-values:
-            pi0, targets_sorted["crema q-value"] = qvalues.mixmax(
-                target_scores=targets_sorted[self._score_column],
-                decoy_scores=decoys_sorted[self._score_column],
-                combined_score=combined_sorted[self._score_column],
-                combined_score_target=combined_sorted[
-                    self.dataset._target_column
-                ],
-            )
 
-            LOGGER.info("  - Estimated pi_zero = %f.", pi0)
+                # undo previous multipliation by -1.0
+                if self._desc == False:
+                    targets_sorted[self._score_column] = (
+                        targets_sorted[self._score_column] * -1.0
+                    )
+                self.confidence_estimates[level] = targets_sorted
+
+
+class ConfidenceEnsemble:
+    """Confidence estimates from repeated runs with different random seeds.
+
+    Created by :py:func:`~crema.assign_confidence_ensemble()`. Each run
+    breaks ties between PSMs with equal scores differently, so comparing them
+    shows how much the accepted discoveries depend on the tie-breaking.
+
+    Parameters
+    ----------
+    confidences : list of Confidence objects
+        The confidence estimates of each run.
+    seeds : list of int
+        The random seed of each run.
+
+    Attributes
+    ----------
+    confidences : list of Confidence objects
+    seeds : list of int
+    levels : list of str
+    """
+
+    def __init__(self, confidences, seeds):
+        """Initialize a ConfidenceEnsemble object"""
+        self.confidences = list(confidences)
+        self.seeds = list(seeds)
+
+    @property
+    def levels(self):
+        """The levels with confidence estimates in every run"""
+        return [
+            level
+            for level in self.confidences[0].levels
+            if level in self.confidences[0].confidence_estimates
+        ]
+
+    def discovery_counts(self):
+        """The number of accepted target discoveries in each run.
 
-            LOGGER.info(
-                "  - Found %i %s at q<=%g.",
-                (targets_sorted["crema q-value"] <= self._eval_fdr).sum(),
-                self._level_labs[level],
-                self._eval_fdr,
+        Returns
+        -------
+        pandas.DataFrame
+            The seed of each run and its number of accepted discoveries, with
+            a column for each level.
+        """
+        counts = pd.DataFrame({"seed": self.seeds})
+        for level in self.levels:
+            counts[level] = [
+                int((conf._qvalues[level] <= conf.threshold).sum())
+                for conf in self.confidences
+            ]
+
+        return counts
+
+    def discovery_spread(self):
+        """Summarize the spread of the discovery counts across runs.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The minimum, maximum, mean and standard deviation of the number
+            of accepted discoveries, with a row for each level.
+        """
+        counts = self.discovery_counts().drop(columns="seed")
+        spread = counts.agg(["min", "max", "mean", "std"]).T
+        spread.index.name = "level"
+        return spread
+
+    def acceptance_frequency(self, level="psms"):
+        """The fraction of runs in which each target discovery is accepted.
+
+        Parameters
+        ----------
+        level : str, optional
+            The level of the discoveries.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Each discovery that was accepted in at least one run, with the
+            fraction of runs in which it was accepted in the "accept
+            frequency" column, from the most to the least frequent.
+        """
+        if level not in self.levels:
+            raise ValueError(
+                f"'{level}' is not an available level. Available levels are: "
+                f"{', '.join(self.levels)}"
             )
 
-            # reverse rows so that best score is at top
-            targets_sorted = targets_sorted[::-1]
+        keys = self._keys(level)
+        accepted = []
+        for conf in self.confidences:
+            df = conf.confidence_estimates[level]
+            passed = conf._qvalues[level] <= conf.threshold
+            accepted.append(df.loc[passed, keys])
 
-            # undo previous multipliation by -1.0
-            if self._desc == False:
-                targets_sorted[self._score_column] = (
-                    targets_sorted[self._score_column] * -1.0
-                )
-            self.confidence_estimates[level] = targets_sorted
+        accepted = pd.concat(accepted, ignore_index=True)
+        freq = accepted.groupby(keys, sort=False).size() / len(self.seeds)
+        freq = freq.rename("accept frequency").reset_index()
+        return freq.sort_values(
+            "accept frequency", ascending=False, kind="mergesort"
+        ).reset_index(drop=True)
+
+    def _keys(self, level):
+        """The columns that identify a discovery at a level"""
+        conf = self.confidences[0]
+        dataset = conf.dataset
+        if level == "psms":
+            return [*dataset._spectrum_columns, dataset._peptide_column]
+        if level == "peptides":
+            return [dataset._peptide_column]
+        if level == "proteins":
+            return [dataset._protein_column]
+
+        return ["protein group"]
+
+
+def _compete(df, group_columns, score_column, desc, keys=None, unique=False):
+    """Perform target-decoy competition on a DataFrame
+
+    For each group defined by `group_columns`, keep only the element
+    with the best score. Ties are broken randomly.
+
+    Parameters
+    ----------
+    df : panda.DataFrame
+        The DataFrame on which to perform the competition.
+    group_columns: str or list of str
+        The columns that define a group.
+    score_column : str
+        The score by which to rank the rows.
+    desc : bool
+        True if higher scores better, False if lower scores are better.
+    keys : numpy.ndarray, optional
+        Integer keys for the rows of `df` that define the groups in place of
+        `group_columns`, such as :py:attr:`PsmDataset.spectrum_keys`.
+    unique : bool, optional
+        Is each group already a single row? If so, the rows are only sorted
+        by score, without the shuffle and deduplication.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A :py:class:`pandas.DataFrame` containing only rows that won the
+        competition, ordered from worst to best score.
+    """
+    if desc:
+        keep = "last"
+    else:
+        keep = "first"
+
+    if keys is not None:
+        key_column = utils.new_column("spectrum key", df)
+        df = df.assign(**{key_column: keys})
+        group_columns = [key_column]
+
+    group_columns = utils.listify(group_columns)
+    if unique:
+        # There are no ties to break, and no rows to drop.
+        out_df = df.sort_values([score_column] + group_columns)
+    else:
+        # Shuffle dataframe so ties are broken randomly.
+        out_df = (
+            df.sample(frac=1)
+            .sort_values([score_column] + group_columns)
+            .drop_duplicates(group_columns, keep=keep)
+        )
+    if keys is not None:
+        del out_df[key_column]
+
+    # Reverse so that rows are ordered from worst to best score.
+    if desc == False:
+        out_df = out_df[::-1]
+    return out_df
 
 
 def _group_proteins(conf_pep_tar, conf_pep_dec, prot_delim, prot_col, pep_col):
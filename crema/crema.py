@@ -6,21 +6,24 @@ import os
 import sys
 import time
 import logging
+from contextlib import nullcontext
 
-from .parsers.tide import read_tide
-from .parsers.msamanda import read_msamanda
-from .parsers.msfragger import read_msfragger
-from .parsers.msgf import read_msgf
-from .parsers.comet import read_comet
-from .parsers.mztab import read_mztab
-from .parsers.pepxml import read_pepxml
-from .params import Params
+from . import metrics
+from . import profiling
+from .params import Params, RethresholdParams
+from .parsers import get_reader
+from .parsers.auto import detect_format, read_auto
 
 
 def main():
     """The CLI entry point"""
     start_time = time.time()
 
+    # Subcommands:
+    if sys.argv[1:2] == ["rethreshold"]:
+        _main_rethreshold(RethresholdParams(sys.argv[2:]))
+        return
+
     # Creates the parser for parse args and reads in command line arguments
     args = Params()
 
@@ -55,23 +58,24 @@ def main():
     logging.info("Starting Analysis")
     logging.info("=================")
 
-    # Create dataset object
-    readers = [
-        read_tide,
-        read_msgf,
-        read_msamanda,
-        read_comet,
-        read_msfragger,
-        read_pepxml,
-        read_mztab,
-    ]
-
-    for read_fn in readers:
-        try:
-            psms = read_fn(args.psm_files)
-            break
-        except:
-            raise ValueError("Unrecognized file type.")
+    collect = metrics.collect() if args.metrics else nullcontext()
+    with collect, _profile(args):
+        if args.sharded:
+            _main_sharded(args)
+        else:
+            _main_in_memory(args)
+
+    _finish(args, start_time)
+
+
+def _main_in_memory(args):
+    """Run crema with all of the PSMs in memory"""
+    # Create dataset object, using the reader for the detected format
+    with metrics.stage("read"):
+        psms = read_auto(args.psm_files)
+
+    if args.compact:
+        psms.to_compact()
 
     conf = psms.assign_confidence(
         score_column=args.score,
@@ -81,14 +85,94 @@ def main():
 
     # Write result to file
     logging.info("Writing results...")
-    conf.to_txt(output_dir=args.output_dir, file_root=args.file_root)
+    conf.to_txt(
+        output_dir=args.output_dir,
+        file_root=args.file_root,
+        decoys=args.decoys,
+    )
+    if args.discovery_curve:
+        conf.discovery_curve().to_csv(
+            _output_path(args, "crema.discoveries.txt"), sep="\t", index=False
+        )
+
+    if args.save:
+        conf.save(_output_path(args, "crema.confidence.pkl"))
+
+
+def _main_rethreshold(args):
+    """Write saved confidence estimates using a new threshold"""
+    from .confidence import load_confidence
+
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname)s] %(message)s"
+    )
+    conf = load_confidence(args.saved_file)
+    conf.rethreshold(args.threshold)
+    out_files = conf.to_txt(
+        output_dir=args.output_dir,
+        file_root=args.file_root,
+        decoys=args.decoys,
+    )
+    for out_file in out_files:
+        logging.info("Wrote %s", out_file)
+
 
+def _output_path(args, file_name):
+    """The path to an output file, with the file root if given"""
+    if args.file_root is not None:
+        file_name = args.file_root + "." + file_name
+
+    return os.path.join(args.output_dir, file_name)
+
+
+def _profile(args):
+    """Profile the pipeline if requested"""
+    if args.profile is None:
+        return nullcontext()
+
+    profile_file = "crema.profile" + profiling.FORMATS[args.profile]
+    return profiling.profile(_output_path(args, profile_file), args.profile)
+
+
+def _finish(args, start_time):
+    """Log the wall time and save the stage metrics if requested"""
     # Calculate how long the confidence estimation took
     end_time = time.time()
     total_time = end_time - start_time
+    if args.metrics:
+        metrics.to_json(
+            _output_path(args, "crema.metrics.json"),
+            wall_time_seconds=total_time,
+        )
+
     logging.info("==== DONE! =====")
     logging.info("Wall Time: %.2fs", total_time)
 
 
+def _main_sharded(args):
+    """Run crema in sharded mode, with each PSM file as a shard"""
+    from .sharded import assign_confidence_sharded
+
+    if args.score is None or len(args.score) != 1 or args.desc == "None":
+        raise ValueError(
+            "Sharded mode requires a single --score and --desc to be True "
+            "or False."
+        )
+
+    assign_confidence_sharded(
+        args.psm_files,
+        score_column=args.score[0],
+        desc=args.desc == "True",
+        reader=get_reader(detect_format(args.psm_files)),
+        threshold=args.threshold,
+        pep_fdr_type=args.pep_fdr_type,
+        eval_fdr=args.eval_fdr,
+        output_dir=args.output_dir,
+        file_root=args.file_root,
+        decoys=args.decoys,
+        n_jobs=args.n_jobs,
+    )
+
+
 if __name__ == "__main__":
     main()
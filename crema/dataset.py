@@ -2,12 +2,16 @@
 peptide-spectrum matches.
 """
 
+import copy
 import logging
 
+import numpy as np
+import pandas as pd
+
 from .confidence import TdcConfidence
 from .confidence import MixmaxConfidence
-from .qvalues import tdc
-from .utils import listify
+from .confidence import _compete
+from .utils import listify, new_column, encode_keys
 
 LOGGER = logging.getLogger(__name__)
 
@@ -46,6 +50,11 @@ class PsmDataset:
         is safer because it prevents accidental modification of the underlying
         data. This argument only has an effect when `pin_files` is a
         :py:class:`pandas.DataFrame`
+    compact : bool, optional
+        If true, the score columns are stored as 32-bit floats and integer
+        spectrum columns as 32-bit integers, and q-values are calculated
+        in single precision. This roughly halves the memory used by these
+        columns. See :py:meth:`to_compact()`.
 
     Attributes
     ----------
@@ -58,6 +67,7 @@ class PsmDataset:
     protein_delim : str
     methods : dict
     peptide_pairing : dict
+    compact : bool
     """
 
     methods = {"tdc": TdcConfidence, "mixmax": MixmaxConfidence}
@@ -73,6 +83,7 @@ class PsmDataset:
         protein_delim,
         peptide_pairing=None,
         copy_data=True,
+        compact=False,
     ):
         """Initialize a PsmDataset object."""
         self.score_columns = listify(score_columns)
@@ -82,6 +93,10 @@ class PsmDataset:
         self._protein_column = protein_column
         self._protein_delim = protein_delim
         self._peptide_pairing = peptide_pairing
+        self._compact = False
+        self._spectrum_keys = None
+        self._one_psm_per_spectrum = None
+        self._score_orders = {}
 
         fields = sum(
             [
@@ -93,7 +108,12 @@ class PsmDataset:
             ],
             [],
         )
-        self._data = psms.copy(deep=copy_data).loc[:, fields]
+        # Selecting columns copies them, so only copy when none are dropped.
+        if list(psms.columns) == fields:
+            self._data = psms.copy(deep=copy_data)
+        else:
+            self._data = psms.loc[:, fields]
+
         self._data[target_column] = self._data[target_column].astype(bool)
         self._num_targets = self.targets.sum()
         self._num_decoys = (~self.targets).sum()
@@ -107,6 +127,9 @@ class PsmDataset:
         if not self._num_targets:
             raise ValueError("No target PSMs were detected.")
 
+        if compact:
+            self.to_compact()
+
     @property
     def columns(self):
         """The columns of the PSM :py:class:`pandas.DataFrame`"""
@@ -122,6 +145,35 @@ class PsmDataset:
         """The mass spectrum identifiers as a :py:class:`pandas.DataFrame`."""
         return self[self._spectrum_columns]
 
+    @property
+    def spectrum_keys(self):
+        """An integer key identifying the mass spectrum of each PSM.
+
+        The spectrum columns are encoded into one 64-bit integer per PSM the
+        first time the keys are needed, and competition and partitioning use
+        the keys instead of the spectrum columns.
+        """
+        if self._spectrum_keys is None:
+            self._spectrum_keys = encode_keys(
+                self._data, self._spectrum_columns
+            )
+
+        return self._spectrum_keys
+
+    @property
+    def one_psm_per_spectrum(self):
+        """Does each mass spectrum have only one PSM?
+
+        This is the case for searches that report only the best match for
+        each spectrum, including concatenated target-decoy searches, and
+        PSM-level competition is then skipped.
+        """
+        if self._one_psm_per_spectrum is None:
+            keys = pd.Series(self.spectrum_keys)
+            self._one_psm_per_spectrum = keys.is_unique
+
+        return self._one_psm_per_spectrum
+
     @property
     def peptides(self):
         """The peptides as a :py:class:`pandas.Series`."""
@@ -152,6 +204,11 @@ class PsmDataset:
         """A dictionary containing target/decoy peptide pairs"""
         return self._peptide_pairing
 
+    @property
+    def compact(self):
+        """Are scores and q-values stored in single precision?"""
+        return self._compact
+
     def __getitem__(self, column):
         """Return the specified column"""
         return self._data.loc[:, column]
@@ -237,11 +294,18 @@ class PsmDataset:
         desc : bool
             True if higher scores better, False if lower scores are better.
         """
+        from .qvalues import tdc
+
         best_score = None
         best_passing = 0
         for desc in (True, False):
-            qvals = self.scores.apply(tdc, target=self.targets, desc=desc)
-            num_passing = (qvals <= eval_fdr).sum()
+            num_passing = pd.Series(0, index=self.score_columns)
+            for col in self.score_columns:
+                qvals = tdc(
+                    self[col], self.targets, desc, order=self.score_order(col)
+                )
+                num_passing[col] = (qvals <= eval_fdr).sum()
+
             feat_idx = num_passing.idxmax()
             num_passing = num_passing[feat_idx]
             if num_passing > best_passing:
@@ -254,6 +318,249 @@ class PsmDataset:
 
         return best_score, best_passing, best_desc
 
+    def score_order(self, score_column):
+        """The indices that sort the PSMs by a score in ascending order.
+
+        The scores are sorted the first time the order is needed and the
+        order is cached, so that choosing a score, choosing its direction and
+        estimating q-values for this dataset share one sort. The same order
+        serves both directions, because the q-value kernels walk it from
+        either end. The cache is cleared when the scores change.
+
+        Parameters
+        ----------
+        score_column : str
+            The score.
+
+        Returns
+        -------
+        numpy.ndarray of int
+            The indices that sort the PSMs by `score_column`.
+        """
+        order = self._score_orders.get(score_column)
+        if order is None:
+            order = np.argsort(self[score_column].to_numpy())
+            order.flags.writeable = False
+            self._score_orders[score_column] = order
+
+        return order
+
+    def to_compact(self):
+        """Store the PSMs using compact data types.
+
+        Score columns are converted to 32-bit floats and integer spectrum
+        columns to 32-bit integers, when their values fit. Score columns
+        with values that 32-bit floats cannot represent, such as p-values
+        below about 1e-38, are kept as 64-bit floats with a warning, because
+        rounding them to zero would create ties between PSMs. Spectrum
+        columns containing floats, such as precursor masses, are left
+        unchanged because they are used to identify spectra. Confidence
+        estimates calculated from a compact dataset store their q-values as
+        32-bit floats.
+
+        Returns
+        -------
+        PsmDataset
+            This dataset, for chaining.
+        """
+        float32 = np.finfo(np.float32)
+        for col in self.score_columns:
+            values = np.abs(self._data[col].to_numpy(dtype=float))
+            values = values[np.isfinite(values) & (values > 0)]
+            if values.size and (
+                values.min() < float32.tiny or values.max() > float32.max
+            ):
+                LOGGER.warning(
+                    "Keeping the '%s' scores as 64-bit floats, because some "
+                    "are outside the range of 32-bit floats.",
+                    col,
+                )
+                continue
+
+            self._data[col] = self._data[col].astype(np.float32)
+
+        self._score_orders.clear()
+
+        int32 = np.iinfo(np.int32)
+        for col in self._spectrum_columns:
+            values = self._data[col]
+            if not pd.api.types.is_integer_dtype(values) or values.empty:
+                continue
+
+            if values.min() >= int32.min and values.max() <= int32.max:
+                self._data[col] = values.astype(np.int32)
+
+        self._compact = True
+        return self
+
+    def partition(self, n_partitions=None, column=None):
+        """Split the PSMs into independent partitions.
+
+        Every PSM for a mass spectrum is placed in the same partition, so
+        PSM-level competition can be performed on each partition separately.
+        The partitions share the column roles and peptide pairing of this
+        dataset, and each holds only its own PSMs, so they can be sent to
+        separate worker processes.
+
+        Parameters
+        ----------
+        n_partitions : int, optional
+            Split the PSMs into this many partitions using the spectrum
+            keys. Ignored if `column` is specified.
+        column : str, optional
+            A spectrum column, such as the spectrum file, with one partition
+            created for each of its unique values.
+
+        Returns
+        -------
+        list of PsmDataset
+            The non-empty partitions. A partition may hold only target or
+            only decoy PSMs, so assign confidence estimates to the merged
+            competition results rather than to each partition.
+        """
+        if column is not None:
+            if column not in self._spectrum_columns:
+                raise ValueError(f"'{column}' is not a spectrum column.")
+
+            keys = self._data[column]
+        elif n_partitions is not None and n_partitions > 0:
+            keys = self.spectrum_keys % n_partitions
+        else:
+            raise ValueError("Specify either 'n_partitions' or 'column'.")
+
+        groups = self._data.groupby(keys, sort=False).indices
+        return [self._subset(idx) for idx in groups.values()]
+
+    def _subset(self, idx):
+        """A dataset holding some of the PSMs of this one.
+
+        Unlike the constructor, this does not require both target and decoy
+        PSMs, which a partition may lack.
+
+        Parameters
+        ----------
+        idx : numpy.ndarray of int
+            The positions of the PSMs to keep.
+
+        Returns
+        -------
+        PsmDataset
+            The subset, which shares the column roles and peptide pairing of
+            this dataset.
+        """
+        part = copy.copy(self)
+        part._data = self._data.take(idx)
+        part._num_targets = part.targets.sum()
+        part._num_decoys = len(idx) - part._num_targets
+        part._one_psm_per_spectrum = None
+        part._score_orders = {}
+        if self._spectrum_keys is not None:
+            part._spectrum_keys = self._spectrum_keys[idx]
+
+        return part
+
+    def compete(self, score_column, desc, level="psms"):
+        """Perform target-decoy competition on this collection of PSMs.
+
+        Parameters
+        ----------
+        score_column : str
+            The score by which to rank the PSMs.
+        desc : bool
+            True if higher scores better, False if lower scores are better.
+        level : {"psms", "peptides"}, optional
+            At the "psms" level, the best PSM is kept for each mass spectrum.
+            At the "peptides" level, the best PSM for each spectrum then
+            competes with the PSMs for its paired peptide.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The PSMs that won the competition, ordered from worst to best
+            score. The results from several partitions can be combined with
+            :py:meth:`merge_competitions()`.
+        """
+        group_cols = self._competition_columns(level)
+        df = _compete(
+            self._data,
+            self._spectrum_columns,
+            score_column,
+            desc,
+            self.spectrum_keys,
+            self.one_psm_per_spectrum,
+        )
+        if level == "psms":
+            return df
+
+        pairing = self.peptide_pairing
+        if pairing is None:
+            raise ValueError(
+                "Must provide paired target decoy peptide infomation (see FAQ)."
+            )
+
+        df[group_cols[0]] = df[self._peptide_column].map(
+            lambda x: pairing.get(x, x)
+        )
+        return _compete(df, group_cols, score_column, desc)
+
+    def merge_competitions(self, results, score_column, desc, level="psms"):
+        """Combine the competition results from several partitions.
+
+        Parameters
+        ----------
+        results : list of pandas.DataFrame
+            The results of :py:meth:`compete()` for each partition of this
+            dataset.
+        score_column : str
+            The score by which to rank the PSMs.
+        desc : bool
+            True if higher scores better, False if lower scores are better.
+        level : {"psms", "peptides"}, optional
+            The level of the competition.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The PSMs that won the competition across all partitions, ordered
+            from worst to best score.
+        """
+        group_cols = self._competition_columns(level)
+        df = pd.concat(results)
+        keys = None
+        if level == "psms":
+            keys = encode_keys(df, group_cols)
+
+        return _compete(df, group_cols, score_column, desc, keys)
+
+    def _competition_columns(self, level):
+        """The columns that define a competition group at a level"""
+        if level == "psms":
+            return self._spectrum_columns
+        elif level == "peptides":
+            return [new_column("pairing", self._data)]
+
+        raise ValueError("'level' should be 'psms' or 'peptides'.")
+
+    def _column_roles(self):
+        """The arguments needed to create a PsmDataset with the same columns.
+
+        Returns
+        -------
+        dict
+            The keyword arguments for :py:class:`PsmDataset`, excluding the
+            PSMs themselves.
+        """
+        return dict(
+            target_column=self._target_column,
+            spectrum_columns=self._spectrum_columns,
+            score_columns=self.score_columns,
+            peptide_column=self._peptide_column,
+            protein_column=self._protein_column,
+            protein_delim=self._protein_delim,
+            peptide_pairing=self._peptide_pairing,
+            compact=self._compact,
+        )
+
     def set_protein_column(self, new_protein_column):
         """Replaces current protein column with input protein column
 
@@ -0,0 +1,327 @@
+"""Look up confidence estimates by spectrum, peptide, protein or group.
+
+Selecting rows from the result tables with boolean masks scans the whole
+table for every query. A :py:class:`ConfidenceIndex` instead builds a hash
+index on the keys of each level once, so that many keys are looked up
+together in a single vectorized step::
+
+    index = conf.index()
+    index.peptides(["PEPTIDEK", "LESSK"])
+
+An index can also be built from the files written by
+:py:func:`~crema.to_txt()`, reading only the key and result columns.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .utils import listify, open_file
+
+LEVELS = ("psms", "peptides", "proteins", "protein_groups")
+QVALUE_COLUMN = "crema q-value"
+ACCEPT_COLUMN = "accept"
+
+
+class ConfidenceIndex:
+    """An index of the target confidence estimates at each level.
+
+    Each lookup returns the q-value and whether the discovery is accepted
+    for a batch of keys. Keys that are not found, because they are decoys or
+    were not detected, have a missing q-value and are not accepted.
+
+    Parameters
+    ----------
+    tables : dict of str, pandas.DataFrame
+        The discoveries at each level. Each table has the columns that
+        identify a discovery, followed by a "crema q-value" column, an
+        "accept" column or both. If a key appears more than once, the first
+        row is used.
+    threshold : float, optional
+        The FDR threshold for accepting discoveries from their q-values,
+        which is used when a table has no "accept" column.
+    """
+
+    def __init__(self, tables, threshold=0.01):
+        """Initialize a ConfidenceIndex"""
+        self._threshold = threshold
+        self._indexes = {}
+        self._qvalues = {}
+        self._accepted = {}
+        for level, df in tables.items():
+            results = [QVALUE_COLUMN, ACCEPT_COLUMN]
+            keys = df.drop(columns=results, errors="ignore")
+            if keys.shape[1] == 1:
+                index = pd.Index(keys.iloc[:, 0])
+            else:
+                index = pd.MultiIndex.from_frame(keys)
+
+            first = ~index.duplicated()
+            if first.all():
+                first = slice(None)
+
+            self._indexes[level] = index[first]
+            if QVALUE_COLUMN in df.columns:
+                qvals = df[QVALUE_COLUMN].to_numpy(dtype=float)
+                self._qvalues[level] = qvals[first]
+
+            if ACCEPT_COLUMN in df.columns:
+                accepted = df[ACCEPT_COLUMN].to_numpy(dtype=bool)
+                self._accepted[level] = accepted[first]
+            elif level not in self._qvalues:
+                raise ValueError(
+                    f"The {level} table needs a '{QVALUE_COLUMN}' or "
+                    f"'{ACCEPT_COLUMN}' column."
+                )
+
+    @classmethod
+    def from_confidence(cls, conf):
+        """Index the confidence estimates of a Confidence object.
+
+        Parameters
+        ----------
+        conf : Confidence object
+            The confidence estimates, which may have been loaded with
+            :py:func:`~crema.load_confidence()`.
+
+        Returns
+        -------
+        ConfidenceIndex
+            The index. Discoveries are accepted using the threshold of
+            `conf`, or its `eval_fdr` if the threshold is "q-value".
+        """
+        tables = {}
+        for level, key_cols in zip(conf.levels, conf._level_columns):
+            df = conf.confidence_estimates.get(level)
+            if df is None:
+                continue
+
+            tables[level] = df.loc[:, listify(key_cols)].assign(
+                **{QVALUE_COLUMN: conf._qvalues[level]}
+            )
+
+        threshold = conf.threshold
+        if threshold == "q-value":
+            threshold = conf._eval_fdr
+
+        return cls(tables, threshold)
+
+    @classmethod
+    def from_txt(cls, txt_files, sep="\t", threshold=0.01):
+        """Index confidence estimates saved with :py:func:`~crema.to_txt()`.
+
+        Only the columns that identify discoveries and the "crema q-value"
+        or "accept" column are read. The level of each file is found from
+        its name, such as "crema.peptides.txt".
+
+        Parameters
+        ----------
+        txt_files : str, Path or list of str or Path
+            The saved target confidence estimates, with at most one file for
+            each level.
+        sep : str, optional
+            The delimiter used in the files.
+        threshold : float, optional
+            The FDR threshold for accepting discoveries from files that
+            contain q-values instead of an "accept" column.
+
+        Returns
+        -------
+        ConfidenceIndex
+            The index.
+        """
+        tables = {}
+        for txt_file in listify(txt_files):
+            level = _file_level(txt_file)
+            if level in tables:
+                raise ValueError(f"More than one file was given for {level}.")
+
+            with open_file(txt_file, "rt", threaded=False) as txt_ref:
+                columns = txt_ref.readline().rstrip("\r\n").split(sep)
+
+            # The column layout of the tables written by to_txt().
+            if level == "psms":
+                key_cols = columns[:-4]
+            elif level == "peptides":
+                key_cols = columns[-4:-3]
+            else:
+                key_cols = columns[:1]
+
+            # The spectrum columns may be numbers, such as scan numbers.
+            dtypes = None
+            if level != "psms":
+                dtypes = {col: str for col in key_cols}
+
+            with open_file(txt_file) as txt_ref:
+                tables[level] = pd.read_csv(
+                    txt_ref,
+                    sep=sep,
+                    usecols=key_cols + columns[-1:],
+                    dtype=dtypes,
+                )
+
+        return cls(tables, threshold)
+
+    @property
+    def levels(self):
+        """The indexed levels"""
+        return tuple(self._indexes)
+
+    @property
+    def threshold(self):
+        """The FDR threshold for accepting discoveries from q-values"""
+        return self._threshold
+
+    def lookup(self, level, keys, threshold=None):
+        """Look up a batch of discoveries at a level.
+
+        Parameters
+        ----------
+        level : {"psms", "peptides", "proteins", "protein_groups"}
+            The level of the discoveries.
+        keys : array-like or pandas.DataFrame
+            The keys to look up. For PSMs, a :py:class:`pandas.DataFrame`
+            with the spectrum columns or a list of tuples of their values.
+        threshold : float, optional
+            Accept discoveries using this FDR threshold instead of that of
+            the index. This requires q-values.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The "crema q-value" and "accept" columns for each key, in the
+            order of `keys`.
+        """
+        try:
+            index = self._indexes[level]
+        except KeyError:
+            raise ValueError(
+                f"'{level}' is not an indexed level. Available levels are: "
+                f"{', '.join(self.levels)}"
+            ) from None
+
+        if isinstance(index, pd.MultiIndex):
+            if isinstance(keys, pd.DataFrame):
+                queries = pd.MultiIndex.from_frame(keys.loc[:, index.names])
+            else:
+                queries = pd.MultiIndex.from_tuples(
+                    list(keys), names=index.names
+                )
+        else:
+            if isinstance(keys, pd.DataFrame):
+                keys = keys.loc[:, index.name]
+
+            queries = pd.Index(listify(keys))
+
+        pos = index.get_indexer(queries)
+        found = pos >= 0
+        pos = pos[found]
+
+        qvals = np.full(len(found), np.nan)
+        if level in self._qvalues:
+            qvals[found] = self._qvalues[level][pos]
+
+        if threshold is None and level in self._accepted:
+            accepted = np.zeros(len(found), dtype=bool)
+            accepted[found] = self._accepted[level][pos]
+        else:
+            if level not in self._qvalues:
+                raise ValueError(
+                    f"A threshold cannot be applied to {level} without "
+                    "q-values."
+                )
+
+            if threshold is None:
+                threshold = self._threshold
+
+            accepted = qvals <= threshold
+
+        return pd.DataFrame({QVALUE_COLUMN: qvals, ACCEPT_COLUMN: accepted})
+
+    def spectra(self, spectra, threshold=None):
+        """Look up PSMs by their spectrum.
+
+        Parameters
+        ----------
+        spectra : pandas.DataFrame or list of tuple
+            The spectrum columns of the PSMs.
+        threshold : float, optional
+            Accept discoveries using this FDR threshold.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The "crema q-value" and "accept" columns for each spectrum.
+        """
+        return self.lookup("psms", spectra, threshold)
+
+    def peptides(self, peptides, threshold=None):
+        """Look up peptides.
+
+        Parameters
+        ----------
+        peptides : array-like of str
+            The peptides.
+        threshold : float, optional
+            Accept discoveries using this FDR threshold.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The "crema q-value" and "accept" columns for each peptide.
+        """
+        return self.lookup("peptides", peptides, threshold)
+
+    def proteins(self, proteins, threshold=None):
+        """Look up proteins.
+
+        Parameters
+        ----------
+        proteins : array-like of str
+            The protein IDs.
+        threshold : float, optional
+            Accept discoveries using this FDR threshold.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The "crema q-value" and "accept" columns for each protein.
+        """
+        return self.lookup("proteins", proteins, threshold)
+
+    def protein_groups(self, groups, threshold=None):
+        """Look up protein groups.
+
+        Parameters
+        ----------
+        groups : array-like of str
+            The protein groups.
+        threshold : float, optional
+            Accept discoveries using this FDR threshold.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The "crema q-value" and "accept" columns for each protein group.
+        """
+        return self.lookup("protein_groups", groups, threshold)
+
+    def __repr__(self):
+        """A short description"""
+        sizes = ", ".join(
+            f"{len(index)} {level}" for level, index in self._indexes.items()
+        )
+        return f"<ConfidenceIndex with {sizes}>"
+
+
+def _file_level(txt_file):
+    """The level of a file written by to_txt()"""
+    name = Path(txt_file).name
+    for level in LEVELS:
+        if f"crema.{level}.txt" in name:
+            return level
+
+    raise ValueError(
+        f"Could not find the level of {txt_file}. Files should be named like "
+        "'crema.psms.txt'."
+    )
@@ -0,0 +1,227 @@
+"""Lightweight timing and memory instrumentation for the stages of crema.
+
+Each stage is timed with the :py:func:`stage` context manager, which logs the
+elapsed time and the peak resident set size (RSS) of the process when the
+stage ends. While collection is enabled, with :py:func:`enable` or the
+:py:func:`collect` context manager, the stages are logged at the INFO level
+and recorded so they can be saved with :py:func:`to_json`. Otherwise, they
+are only logged at the DEBUG level. Stages can be nested, in which case their
+names are joined with "/".
+"""
+import sys
+import json
+import time
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LOGGER = logging.getLogger(__name__)
+
+_RECORDS = []
+_ENABLED = False
+_LOCAL = threading.local()
+
+
+def enable():
+    """Start recording the stages"""
+    global _ENABLED
+    _ENABLED = True
+
+
+def disable():
+    """Stop recording the stages, keeping those already recorded"""
+    global _ENABLED
+    _ENABLED = False
+
+
+def enabled():
+    """Whether the stages are being recorded.
+
+    Returns
+    -------
+    bool
+        True while collection is enabled.
+    """
+    return _ENABLED
+
+
+@contextmanager
+def collect():
+    """Record the stages run within this context.
+
+    The previously recorded stages are discarded when the context is
+    entered, and the recorded stages are kept when it exits, so they can be
+    read with :py:func:`records` or saved with :py:func:`to_json`.
+    """
+    was_enabled = _ENABLED
+    reset()
+    enable()
+    try:
+        yield
+    finally:
+        if not was_enabled:
+            disable()
+
+
+@contextmanager
+def stage(name):
+    """Time a stage and find the peak RSS when it ends.
+
+    While collection is enabled, the stage is recorded and logged at the
+    INFO level. Otherwise, it is only logged at the DEBUG level.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage.
+    """
+    stack = getattr(_LOCAL, "stack", [])
+    _LOCAL.stack = stack + [name]
+    full_name = "/".join(_LOCAL.stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _LOCAL.stack = stack
+        level = logging.INFO if _ENABLED else logging.DEBUG
+        if _ENABLED or LOGGER.isEnabledFor(level):
+            rss = peak_rss()
+            if _ENABLED:
+                _RECORDS.append(
+                    {
+                        "stage": full_name,
+                        "seconds": elapsed,
+                        "peak_rss_mb": rss,
+                    }
+                )
+
+            if rss is None:
+                LOGGER.log(level, "  [%s] %.2fs", full_name, elapsed)
+            else:
+                LOGGER.log(
+                    level,
+                    "  [%s] %.2fs, peak RSS %.1f MB",
+                    full_name,
+                    elapsed,
+                    rss,
+                )
+
+
+def skip(name, reason):
+    """Record that a stage was skipped.
+
+    The skipped stage is always logged at the INFO level, because skipping
+    a stage changes how the results are found, but it is only recorded while
+    collection is enabled.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage.
+    reason : str
+        Why the stage was skipped.
+    """
+    full_name = "/".join(getattr(_LOCAL, "stack", []) + [name])
+    if _ENABLED:
+        _RECORDS.append(
+            {
+                "stage": full_name,
+                "seconds": 0.0,
+                "peak_rss_mb": peak_rss(),
+                "skipped": reason,
+            }
+        )
+
+    LOGGER.info("  - Skipped %s, because %s.", full_name, reason)
+
+
+def propagate(func):
+    """Nest the stages recorded by a function under the current stages.
+
+    The stages are tracked per thread, so use this to wrap a function that
+    will run in another thread.
+
+    Parameters
+    ----------
+    func : callable
+        The function.
+
+    Returns
+    -------
+    callable
+        The wrapped function.
+    """
+    stack = getattr(_LOCAL, "stack", [])
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _LOCAL.stack = stack
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def peak_rss():
+    """The peak resident set size of this process.
+
+    Returns
+    -------
+    float or None
+        The peak RSS in megabytes, or None if it cannot be measured on this
+        platform.
+    """
+    if resource is None:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return rss / 1024**2  # bytes
+
+    return rss / 1024  # kilobytes
+
+
+def records():
+    """The stages recorded since the last :py:func:`reset`.
+
+    Returns
+    -------
+    list of dict
+        The name, elapsed seconds and peak RSS in megabytes of each stage, in
+        the order they ended. Skipped stages also record why they were
+        skipped.
+    """
+    return [rec.copy() for rec in _RECORDS]
+
+
+def reset():
+    """Discard the recorded stages"""
+    _RECORDS.clear()
+
+
+def to_json(path, **kwargs):
+    """Save the recorded stages to a JSON file.
+
+    Parameters
+    ----------
+    path : str or Path
+        The file to write.
+    **kwargs : dict
+        Additional top-level fields to save, such as the total wall time.
+
+    Returns
+    -------
+    str
+        The path to the saved file.
+    """
+    report = {**kwargs, "peak_rss_mb": peak_rss(), "stages": records()}
+    with open(path, "w") as out_file:
+        json.dump(report, out_file, indent=2)
+
+    return str(path)
@@ -0,0 +1,247 @@
+"""A compact store for explicit target/decoy peptide pairings.
+
+The peptide list written by tide-index (``--peptide-list T``) pairs every
+target peptide with its decoy. For large indexes this is tens of millions of
+pairs, which take many gigabytes as a dictionary of Python strings. A
+:py:class:`PeptidePairing` instead keeps the pairs in two NumPy arrays of
+fixed-width byte strings, sorted by target, and looks them up by binary
+search.
+
+Reading the tab-delimited peptide list is slow for large indexes, so it can
+be converted once into a binary file that is memory-mapped when loaded::
+
+    python -m crema.pairing peptide-list.txt pairing.npy
+
+Either file can be passed as the `pairing_file_name` of the readers, which
+keep only the pairs for the peptides in the PSMs.
+"""
+import logging
+import argparse
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+# The columns of the tide-index peptide list.
+TARGET_FIELD = "target"
+DECOY_FIELD = "decoy(s)"
+
+# The number of lines of the peptide list to parse at once.
+CHUNK_SIZE = 1000000
+
+
+class PeptidePairing(Mapping):
+    """A read-only map of target peptides to their paired decoys.
+
+    This behaves like a :py:class:`dict` of strings, but the pairs are stored
+    in NumPy arrays, which may be memory-mapped.
+
+    Parameters
+    ----------
+    targets : numpy.ndarray of bytes
+        The target peptides, sorted and unique.
+    decoys : numpy.ndarray of bytes
+        The decoy peptide paired with each target.
+    """
+
+    def __init__(self, targets, decoys):
+        """Initialize a PeptidePairing"""
+        self._targets = targets
+        self._decoys = decoys
+
+    @classmethod
+    def from_pairs(cls, targets, decoys):
+        """Create a pairing from unsorted pairs.
+
+        If a target is paired more than once, the last pair is kept.
+
+        Parameters
+        ----------
+        targets : array-like of str
+            The target peptides.
+        decoys : array-like of str
+            The decoy peptide paired with each target.
+
+        Returns
+        -------
+        PeptidePairing
+            The pairing.
+        """
+        targets = _encode(targets)
+        decoys = _encode(decoys)
+        order = np.argsort(targets, kind="stable")
+        targets = targets[order]
+        decoys = decoys[order]
+
+        # Keep the last of each run of duplicate targets.
+        last = np.ones(len(targets), dtype=bool)
+        last[:-1] = targets[1:] != targets[:-1]
+        return cls(targets[last], decoys[last])
+
+    @classmethod
+    def from_file(cls, pairing_file_name):
+        """Read a pairing from a tab-delimited or binary file.
+
+        Parameters
+        ----------
+        pairing_file_name : str or Path
+            A tab-delimited file with columns labeled 'target' and 'decoy(s)',
+            such as the peptide list from tide-index, or a binary file
+            written by :py:meth:`save()`, which ends with ".npy" and is
+            memory-mapped.
+
+        Returns
+        -------
+        PeptidePairing
+            The pairing.
+        """
+        if str(pairing_file_name).endswith(".npy"):
+            pairs = np.load(pairing_file_name, mmap_mode="r")
+            return cls(pairs["target"], pairs["decoy"])
+
+        # Imported here to avoid a circular import.
+        from .utils import open_file
+
+        targets = []
+        decoys = []
+        with open_file(pairing_file_name) as pairing_ref:
+            chunks = pd.read_csv(
+                pairing_ref,
+                sep="\t",
+                usecols=lambda c: c in (TARGET_FIELD, DECOY_FIELD),
+                dtype=str,
+                chunksize=CHUNK_SIZE,
+            )
+            for chunk in chunks:
+                # ensure pairing_file dataframe contains all necessary columns
+                if len(chunk.columns) < 2:
+                    miss = {TARGET_FIELD, DECOY_FIELD} - set(chunk.columns)
+                    raise ValueError(
+                        "Required columns for peptide pairing were not "
+                        f"detected: {', '.join(miss)}"
+                    )
+
+                # drop targets that do not have corresponding decoys
+                chunk = chunk.dropna()
+                chunk = chunk[chunk[DECOY_FIELD] != ""]
+                targets.append(_encode(chunk[TARGET_FIELD]))
+                decoys.append(_encode(chunk[DECOY_FIELD]))
+
+        if not targets:
+            return cls.from_pairs([], [])
+
+        return cls.from_pairs(_concatenate(targets), _concatenate(decoys))
+
+    def save(self, path):
+        """Save the pairing as a binary file that can be memory-mapped.
+
+        Parameters
+        ----------
+        path : str or Path
+            The file to write, which should end with ".npy".
+
+        Returns
+        -------
+        str
+            The path to the saved file.
+        """
+        pairs = np.empty(
+            len(self),
+            dtype=[
+                ("target", self._targets.dtype),
+                ("decoy", self._decoys.dtype),
+            ],
+        )
+        pairs["target"] = self._targets
+        pairs["decoy"] = self._decoys
+        np.save(path, pairs)
+        return str(path)
+
+    def subset(self, peptides):
+        """Keep only the pairs that involve the given peptides.
+
+        Parameters
+        ----------
+        peptides : array-like of str
+            The peptides, such as those in a collection of PSMs.
+
+        Returns
+        -------
+        PeptidePairing
+            A pairing, in memory, of the pairs whose target or decoy is one of
+            `peptides`.
+        """
+        peptides = np.unique(_encode(pd.unique(np.asarray(peptides))))
+        keep = np.isin(self._targets, peptides)
+        keep |= np.isin(self._decoys, peptides)
+        return PeptidePairing(
+            np.array(self._targets[keep]), np.array(self._decoys[keep])
+        )
+
+    def __getitem__(self, target):
+        """The decoy paired with a target"""
+        try:
+            key = target.encode()
+        except AttributeError:
+            raise KeyError(target)
+
+        idx = np.searchsorted(self._targets, key)
+        if idx == len(self._targets) or self._targets[idx] != key:
+            raise KeyError(target)
+
+        return self._decoys[idx].decode()
+
+    def __iter__(self):
+        """Iterate over the targets"""
+        return (target.decode() for target in self._targets)
+
+    def __len__(self):
+        """The number of pairs"""
+        return len(self._targets)
+
+    def __repr__(self):
+        """A short description"""
+        return f"<PeptidePairing with {len(self)} pairs>"
+
+
+def _encode(peptides):
+    """Encode peptides as an array of fixed-width byte strings"""
+    peptides = np.asarray(peptides)
+    if peptides.dtype.kind == "S":
+        return peptides
+
+    if not len(peptides):
+        return np.array([], dtype="S1")
+
+    return peptides.astype(str).astype("S")
+
+
+def _concatenate(arrays):
+    """Concatenate arrays of byte strings, widening them as needed"""
+    width = max(arr.dtype.itemsize for arr in arrays)
+    return np.concatenate([arr.astype(f"S{width}") for arr in arrays])
+
+
+def main():
+    """Convert a peptide list into a binary pairing file"""
+    parser = argparse.ArgumentParser(
+        description=(
+            "Convert a tab-delimited target/decoy peptide list, such as the "
+            "one from tide-index, into a binary file that crema can "
+            "memory-map."
+        )
+    )
+    parser.add_argument("peptide_list", help="The tab-delimited peptide list.")
+    parser.add_argument("output_file", help="The binary file to write.")
+    args = parser.parse_args()
+    logging.basicConfig(format="%(message)s", level=logging.INFO)
+    pairing = PeptidePairing.from_file(args.peptide_list)
+    LOGGER.info(
+        "Saved %i pairs to %s", len(pairing), pairing.save(args.output_file)
+    )
+
+
+if __name__ == "__main__":
+    main()
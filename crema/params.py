@@ -32,6 +32,20 @@ class Params:
         return self._namespace[option]
 
 
+class RethresholdParams(Params):
+    """
+    All possible arguments and parameters for the 'crema rethreshold'
+    subcommand. Options can be specified as command-line arguments.
+    """
+
+    def __init__(self, args=None):
+        """
+        Initialize a RethresholdParams object that holds an argparse parser.
+        """
+        self.parser = _configure_rethreshold_parser()
+        self._namespace = vars(self.parser.parse_args(args))
+
+
 def _configure_parser():
     """Creates and configures all the arguments for the parser"""
 
@@ -157,9 +171,156 @@ def _configure_parser():
         choices=["tdc"],
         help="The confidence estimation method to use.",
     )
+
+    parser.add_argument(
+        "--decoys",
+        action="store_true",
+        help="Also write the decoy confidence estimates.",
+    )
+
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help=(
+            "Store scores and q-values as 32-bit floats to reduce memory "
+            "use on large datasets."
+        ),
+    )
+
+    parser.add_argument(
+        "--discovery_curve",
+        action="store_true",
+        help=(
+            "Save the number of accepted discoveries at each level for FDR "
+            "thresholds from 0.1%% to 10%% to 'crema.discoveries.txt' in the "
+            "output directory."
+        ),
+    )
+
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help=(
+            "Save the confidence estimates to 'crema.confidence.pkl' in the "
+            "output directory, so that they can be rethresholded with "
+            "'crema rethreshold' without being assigned again."
+        ),
+    )
+
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help=(
+            "Log the time and peak memory use of each stage of the analysis "
+            "and save them to 'crema.metrics.json' in the output directory."
+        ),
+    )
+
+    parser.add_argument(
+        "--profile",
+        default=None,
+        choices=["pstats", "speedscope"],
+        help=(
+            "Record a function-level profile of the analysis, including the "
+            "numba kernels, and save it to 'crema.profile.pstats' or "
+            "'crema.profile.speedscope.json' in the output directory."
+        ),
+    )
+
+    parser.add_argument(
+        "--sharded",
+        action="store_true",
+        help=(
+            "Treat each input file as an independent shard of PSMs and "
+            "estimate PSM- and peptide-level confidence out-of-core. Each "
+            "shard must contain both the target and decoy PSMs for its "
+            "spectra. Requires a single --score and --desc to be True or "
+            "False."
+        ),
+    )
+
+    parser.add_argument(
+        "--n_jobs",
+        type=int,
+        default=1,
+        help=(
+            "The number of processes used to process the shards with "
+            "--sharded. It has no effect otherwise. Default is 1."
+        ),
+    )
     return parser
 
 
+def _configure_rethreshold_parser():
+    """Creates and configures the arguments for 'crema rethreshold'"""
+    desc = (
+        f"crema version {__version__}\n\n"
+        "Write the confidence estimates saved by 'crema --save' using a new "
+        "FDR threshold, without assigning them again."
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="crema rethreshold",
+        description=desc,
+        formatter_class=CremaHelpFormatter,
+    )
+
+    parser.add_argument(
+        "saved_file",
+        type=str,
+        help="The confidence estimates saved by 'crema --save'.",
+    )
+
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=_threshold,
+        default=0.01,
+        help=(
+            "The FDR threshold for accepting discoveries. Default is 0.01. "
+            "If 'q-value' is chosen, then 'accept' column is replaced "
+            "with 'crema q-value'."
+        ),
+    )
+
+    parser.add_argument(
+        "-f",
+        "--file_root",
+        type=str,
+        help="This string will be added as a prefix to all output file names.",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        type=str,
+        help=(
+            "The directory where output files will be created. Defaults to "
+            "the current working directory."
+        ),
+    )
+
+    parser.add_argument(
+        "--decoys",
+        action="store_true",
+        help="Also write the decoy confidence estimates.",
+    )
+    return parser
+
+
+def _threshold(value):
+    """Parse a threshold, which is either a float or 'q-value'"""
+    if value == "q-value":
+        return value
+
+    try:
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid threshold: '{value}' is not a float or 'q-value'"
+        )
+
+
 def _process_line(line, width, indent):
     """Process a line in the CLI help"""
     line = textwrap.fill(
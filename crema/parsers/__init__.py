@@ -0,0 +1,44 @@
+"""The parsers for search engine output files.
+
+The readers are registered by format name and imported on demand, so that
+only the parsers that are needed, and their dependencies, are loaded.
+"""
+import importlib
+
+# The format name, mapped to the module and name of its reader.
+READERS = {
+    "tide": (".tide", "read_tide"),
+    "msgf": (".msgf", "read_msgf"),
+    "msamanda": (".msamanda", "read_msamanda"),
+    "comet": (".comet", "read_comet"),
+    "msfragger": (".msfragger", "read_msfragger"),
+    "pepxml": (".pepxml", "read_pepxml"),
+    "mztab": (".mztab", "read_mztab"),
+    "txt": (".txt", "read_txt"),
+}
+
+
+def get_reader(name):
+    """Get the reader function for a file format.
+
+    Parameters
+    ----------
+    name : str
+        The format name, such as "tide" or "mztab". See ``READERS`` for
+        the available formats.
+
+    Returns
+    -------
+    Callable
+        The reader function, which returns a
+        :py:class:`~crema.dataset.PsmDataset`.
+    """
+    try:
+        module, func = READERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unrecognized format '{name}'. Available formats are: "
+            f"{', '.join(READERS)}"
+        ) from None
+
+    return getattr(importlib.import_module(module, __name__), func)
@@ -0,0 +1,167 @@
+"""Detect the format of PSM files from their first few lines"""
+
+import logging
+from pathlib import Path
+
+from . import get_reader
+
+LOGGER = logging.getLogger(__name__)
+
+# The number of lines to look at when detecting a tab-delimited format.
+HEADER_LINES = 5
+
+# Columns that identify each tab-delimited format.
+TXT_SIGNATURES = [
+    ("msamanda", {"Amanda Score", "Weighted Probability"}),
+    ("comet", {"e-value", "sp_score"}),
+    ("msgf", {"MSGFScore", "SpecEValue", "DeNovoScore"}),
+    (
+        "tide",
+        {
+            "xcorr score",
+            "exact p-value",
+            "refactored xcorr",
+            "res-ev p-value",
+            "combined p-value",
+            "tailor score",
+        },
+    ),
+]
+
+PEPXML_ROOT = "msms_pipeline_analysis"
+
+
+def read_auto(files, **kwargs):
+    """Read peptide-spectrum matches (PSMs) from files in any supported format.
+
+    The format is detected from the first few lines of each file, or from
+    the root element for XML files, and the files are then parsed once with
+    the matching reader.
+
+    Parameters
+    ----------
+    files : str or tuple of str
+        One or more collections of PSMs, all in the same format.
+    **kwargs : dict
+        Keyword arguments passed to the reader for the detected format.
+
+    Returns
+    -------
+    PsmDataset
+        A :py:class:`~crema.dataset.PsmDataset` object containing the parsed
+        PSMs.
+    """
+    fmt = detect_format(files)
+    LOGGER.info("Reading PSMs in %s format...", fmt)
+    return get_reader(fmt)(files, **kwargs)
+
+
+def detect_format(files):
+    """Detect the format of one or more PSM files.
+
+    Parameters
+    ----------
+    files : str or tuple of str
+        One or more collections of PSMs, all in the same format.
+
+    Returns
+    -------
+    str
+        The format name, which can be passed to
+        :py:func:`~crema.parsers.get_reader`.
+    """
+    from ..utils import listify
+
+    formats = {_detect_file(f) for f in listify(files)}
+    if len(formats) > 1:
+        raise ValueError(
+            "All files must be in the same format. Detected formats: "
+            f"{', '.join(sorted(formats))}"
+        )
+
+    return formats.pop()
+
+
+def _detect_file(path):
+    """Detect the format of a single PSM file.
+
+    Parameters
+    ----------
+    path : str or Path
+        The PSM file.
+
+    Returns
+    -------
+    str
+        The format name.
+    """
+    from ..utils import open_file
+
+    with open_file(path, "rt", threaded=False, errors="replace") as fh:
+        lines = [fh.readline() for _ in range(HEADER_LINES)]
+
+    first = lines[0].lstrip()
+    if first.startswith("<"):
+        return _detect_xml(path)
+
+    if first.startswith("MTD"):
+        return "mztab"
+
+    if first.startswith("CometVersion"):
+        return "comet"
+
+    if first.startswith("#version"):
+        return "msamanda"
+
+    cols = set()
+    for line in lines:
+        cols.update(c.strip() for c in line.rstrip("\r\n").split("\t"))
+
+    for fmt, signature in TXT_SIGNATURES:
+        if cols & signature:
+            return fmt
+
+    raise ValueError(f"Unrecognized file type for {path}.")
+
+
+def _detect_xml(path):
+    """Detect the format of an XML PSM file from its root element.
+
+    Only the elements up to the first search summary are parsed.
+
+    Parameters
+    ----------
+    path : str or Path
+        The XML file.
+
+    Returns
+    -------
+    str
+        Either "pepxml" or "msfragger".
+    """
+    from lxml import etree
+    from ..utils import open_file
+
+    is_pepxml = False
+    with open_file(path, threaded=False) as fh:
+        for _, elem in etree.iterparse(fh, events=("start",)):
+            tag = etree.QName(elem).localname
+            if not is_pepxml:
+                if tag != PEPXML_ROOT:
+                    break
+
+                is_pepxml = True
+            elif tag == "search_summary":
+                version = elem.get("search_engine_version", "")
+                engine = elem.get("search_engine", "")
+                if "msfragger" in f"{engine} {version}".lower():
+                    return "msfragger"
+
+                return "pepxml"
+            elif tag == "spectrum_query":
+                break
+
+    if is_pepxml:
+        return "pepxml"
+
+    raise ValueError(f"Unrecognized file type for {Path(path)}.")
@@ -2,18 +2,23 @@
 
 import re
 import logging
+from functools import partial
 
 import pandas as pd
-from pathlib import Path
 
 from .txt import read_txt
 from .. import utils
+from .. import metrics
 
 LOGGER = logging.getLogger(__name__)
 
 
 def read_comet(
-    txt_files, pairing_file_name=None, decoy_prefix="DECOY_", copy_data=True
+    txt_files,
+    pairing_file_name=None,
+    decoy_prefix="DECOY_",
+    copy_data=True,
+    engine="c",
 ):
     """Read peptide-spectrum matches (PSMs) from Comet output.
     Can parse tab-delimited files.
@@ -36,6 +41,10 @@ def read_comet(
         is safer because it prevents accidental modification of the underlying
         data. This argument only has an effect when `txt_files` is a
         :py:class:`pandas.DataFrame`
+    engine : {"c", "pyarrow"}, optional
+        The CSV parser to use. The "pyarrow" engine reads with multiple
+        threads and requires the optional pyarrow package. This argument only
+        has an effect when `txt_files` are files.
 
     Returns
     -------
@@ -66,9 +75,9 @@ def read_comet(
     else:
         txt_files = utils.listify(txt_files)
         for txt_file in txt_files:
-            with open(txt_file) as txt_ref:
+            with utils.open_file(txt_file, "rt", threaded=False) as txt_ref:
                 # check file type
-                if Path(txt_file).suffix != ".txt":
+                if utils.file_suffix(txt_file) != ".txt":
                     raise ValueError(f"{txt_file} must be in .txt format.")
 
                 # First line of Comet output consists only of version
@@ -96,20 +105,25 @@ def read_comet(
     scores = list(scores)
 
     # Read in the files:
+    dtypes = utils.psm_dtypes(scores, ["scan"])
     fields = [*spectrum, peptide, target, *scores, pairing, protein]
+    if crux_comet and decoy_prefix == "DECOY_":
+        decoy_prefix = "decoy_"
+
+    process = partial(
+        _label_decoys, protein=protein, decoy_prefix=decoy_prefix
+    )
     if isinstance(txt_files, pd.DataFrame):
-        data = txt_files.copy(deep=copy_data).loc[:, fields]
+        data = process(txt_files.copy(deep=copy_data).loc[:, fields])
     else:
-        data = pd.concat(
-            [
-                utils.parse_psms_txt(f, fields, skip_first_line)
-                for f in txt_files
-            ]
+        parse = partial(
+            utils.parse_psms_txt,
+            cols=fields,
+            skip_line=skip_first_line,
+            dtypes=dtypes,
+            engine=engine,
         )
-
-    if crux_comet and decoy_prefix == "DECOY_":
-        decoy_prefix = "decoy_"
-    data["target/decoy"] = ~data[protein].str.contains(decoy_prefix)
+        data = utils.parse_files(txt_files, parse, process)
 
     psms = read_txt(
         data,
@@ -119,7 +133,6 @@ def read_comet(
         peptide_column=peptide,
         protein_column=protein,
         protein_delim=protein_delim,
-        pairing_file_name=pairing_file_name,
         sep="\t",
         copy_data=False,
     )
@@ -127,27 +140,59 @@ def read_comet(
     # Remove first and last amino acid from sequence
     # Looks like "R.WVNEK.Y"
     peptide_column = psms.peptides
-    new_peptide_column = peptide_column.str[2:-2]
+    new_peptide_column = utils.map_unique(
+        peptide_column, lambda peps: peps.str[2:-2]
+    )
     psms.set_peptide_column(new_peptide_column)
 
     # always pair target and decoys for Comet
-    # explicit pairing done in read_txt
-    if pairing_file_name == None:
-        # implicit pairing based off fact that Comet reverses peptides
-        psms._peptide_pairing = _create_pairing(
-            data, peptide, protein, decoy_prefix
+    # explicit pairing is read after the flanks are removed, so that the
+    # pairs are kept for the peptides in the PSMs
+    if pairing_file_name != None:
+        psms._peptide_pairing = utils.create_pairing_from_file(
+            pairing_file_name, psms.peptides
         )
+    else:
+        # implicit pairing based off fact that Comet reverses peptides
+        with metrics.stage("pairing"):
+            psms._peptide_pairing = _create_pairing(
+                data, peptide, protein, decoy_prefix
+            )
 
     # Remove decoy prefix from protein ID
     protein_column = psms.proteins
-    new_protein_column = protein_column.str.replace(
-        decoy_prefix, "", regex=True
+    new_protein_column = utils.map_unique(
+        protein_column,
+        lambda prots: prots.str.replace(decoy_prefix, "", regex=True),
     )
     psms.set_protein_column(new_protein_column)
 
     return psms
 
 
+def _label_decoys(data, protein, decoy_prefix):
+    """Label the target and decoy Comet PSMs.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The PSMs.
+    protein : str
+        The protein column.
+    decoy_prefix : str
+        The prefix used to indicate a decoy protein in the protein column.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The PSMs, with the target/decoy labels.
+    """
+    data["target/decoy"] = ~utils.map_unique(
+        data[protein], lambda prots: prots.str.contains(decoy_prefix)
+    )
+    return data
+
+
 def _create_pairing(pairing_data, peptide_col, protein_col, decoy_prefix):
     """Parse a single Comet dataframe to implicity pair target and
     decoy sequences.
@@ -182,19 +227,18 @@ def _create_pairing(pairing_data, peptide_col, protein_col, decoy_prefix):
         )
 
     pairing_data = pairing_data.loc[:, req_fields]
-    pairing_data[peptide_col] = pairing_data[peptide_col].str[2:-2]
-
-    pairing_data["target/decoy"] = ~pairing_data[protein_col].str.contains(
-        decoy_prefix
+    pairing_data[peptide_col] = utils.map_unique(
+        pairing_data[peptide_col], lambda peps: peps.str[2:-2]
     )
 
-    reverse_peptide_list = []
-    for seq in list(pairing_data[peptide_col]):
-        seq_sp = re.split(r"(?<=.)(?=[A-Z])", seq)
-        peptide_rev = "".join([seq_sp[0], *reversed(seq_sp[1:-1]), seq_sp[-1]])
-        reverse_peptide_list.append(peptide_rev)
+    pairing_data["target/decoy"] = ~utils.map_unique(
+        pairing_data[protein_col],
+        lambda prots: prots.str.contains(decoy_prefix),
+    )
 
-    pairing_data["reverse_peptide"] = reverse_peptide_list
+    pairing_data["reverse_peptide"] = utils.map_unique(
+        pairing_data[peptide_col], lambda peps: peps.map(_reverse_peptide)
+    )
 
     targets = pairing_data[pairing_data["target/decoy"]]
     decoys = pairing_data[~pairing_data["target/decoy"]]
@@ -204,3 +248,20 @@ def _create_pairing(pairing_data, peptide_col, protein_col, decoy_prefix):
 
     dic2.update(dic1)
     return dic2
+
+
+def _reverse_peptide(seq):
+    """Reverse a peptide, keeping the first and last amino acids in place.
+
+    Parameters
+    ----------
+    seq : str
+        The modified peptide sequence.
+
+    Returns
+    -------
+    str
+        The reversed peptide.
+    """
+    seq_sp = re.split(r"(?<=.)(?=[A-Z])", seq)
+    return "".join([seq_sp[0], *reversed(seq_sp[1:-1]), seq_sp[-1]])
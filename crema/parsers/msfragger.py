@@ -103,7 +103,7 @@ def read_msfragger(
 
     if pairing_file_name != None:
         psms._peptide_pairing = utils.create_pairing_from_file(
-            pairing_file_name
+            pairing_file_name, psms.peptides
         )
 
     return psms
@@ -2,9 +2,9 @@
 
 import re
 import logging
+from functools import partial
 
 import pandas as pd
-from pathlib import Path
 
 from .txt import read_txt
 from .. import utils
@@ -13,7 +13,11 @@ LOGGER = logging.getLogger(__name__)
 
 
 def read_msgf(
-    txt_files, pairing_file_name=None, decoy_prefix="XXX_", copy_data=True
+    txt_files,
+    pairing_file_name=None,
+    decoy_prefix="XXX_",
+    copy_data=True,
+    engine="c",
 ):
     """Read peptide-spectrum matches (PSMs) from MSGF+ tab-delimited files.
 
@@ -34,6 +38,10 @@ def read_msgf(
         is safer because it prevents accidental modification of the underlying
         data. This argument only has an effect when `txt_files` is a
         :py:class:`pandas.DataFrame`
+    engine : {"c", "pyarrow"}, optional
+        The CSV parser to use. The "pyarrow" engine reads with multiple
+        threads and requires the optional pyarrow package. This argument only
+        has an effect when `txt_files` are files.
 
     Returns
     -------
@@ -65,10 +73,10 @@ def read_msgf(
         txt_files = utils.listify(txt_files)
         for txt_file in txt_files:
             # check file type
-            if Path(txt_file).suffix != ".tsv":
+            if utils.file_suffix(txt_file) != ".tsv":
                 raise ValueError(f"{txt_file} must be in .tsv format.")
 
-            with open(txt_file) as txt_ref:
+            with utils.open_file(txt_file, "rt", threaded=False) as txt_ref:
                 cols = txt_ref.readline().rstrip().split("\t")
                 scores = scores.intersection(set(cols))
 
@@ -81,15 +89,22 @@ def read_msgf(
     scores = list(scores)
 
     # Read in the files:
+    dtypes = utils.psm_dtypes(scores, ["ScanNum"])
     fields = [*spectrum, peptide, target, *scores, pairing, protein]
+    process = partial(
+        _process_psms, protein=protein, decoy_prefix=decoy_prefix
+    )
     if isinstance(txt_files, pd.DataFrame):
-        data = txt_files.copy(deep=copy_data).loc[:, fields]
+        data = process(txt_files.copy(deep=copy_data).loc[:, fields])
     else:
-        data = pd.concat(
-            [utils.parse_psms_txt(f, fields, False) for f in txt_files]
+        parse = partial(
+            utils.parse_psms_txt,
+            cols=fields,
+            skip_line=False,
+            dtypes=dtypes,
+            engine=engine,
         )
-
-    data["target/decoy"] = ~data[protein].str.contains(decoy_prefix)
+        data = utils.parse_files(txt_files, parse, process)
 
     psms = read_txt(
         data,
@@ -104,16 +119,37 @@ def read_msgf(
         copy_data=False,
     )
 
+    return psms
+
+
+def _process_psms(data, protein, decoy_prefix):
+    """Label the decoys and clean up the protein IDs of MSGF+ PSMs.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The PSMs.
+    protein : str
+        The protein column.
+    decoy_prefix : str
+        The prefix used to indicate a decoy protein in the protein column.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The PSMs, with the target/decoy labels and cleaned protein IDs.
+    """
+    data["target/decoy"] = ~utils.map_unique(
+        data[protein], lambda prots: prots.str.contains(decoy_prefix)
+    )
+
     # Remove pre/post from protein ID
     # This looks like "sp|P0AC43|SDHA_ECO57(pre=R,post=G)"
     # Remove decoy prefix from protein ID
-    protein_column = psms.proteins
-    new_protein_column = protein_column.str.replace(
-        "\\([^()]*\\)", "", regex=True
-    )
-    new_protein_column = new_protein_column.str.replace(
-        decoy_prefix, "", regex=True
+    data[protein] = utils.map_unique(
+        data[protein],
+        lambda prots: prots.str.replace(
+            "\\([^()]*\\)", "", regex=True
+        ).str.replace(decoy_prefix, "", regex=True),
     )
-    psms.set_protein_column(new_protein_column)
-
-    return psms
+    return data
@@ -1,15 +1,30 @@
 """This module contains the parser for PSMs in mzTab format"""
 
+import io
 import logging
+from itertools import islice
 
 import pandas as pd
-from pyteomics.mztab import MzTab
 
 from .. import utils
+from .. import metrics
 from ..dataset import PsmDataset
 
 LOGGER = logging.getLogger(__name__)
 
+# Initialize column names from mzTab standard specifications
+SPECTRUM_COLUMNS = ["spectra_ref"]
+TARGET_COLUMN = "opt_global_cv_MS:1002217_decoy_peptide"
+SEQUENCE_COLUMN = "sequence"
+PROTEIN_COLUMN = "accession"  # TODO check if correct
+MOD_COLUMN = "modifications"
+STRING_COLUMNS = [
+    *SPECTRUM_COLUMNS,
+    SEQUENCE_COLUMN,
+    PROTEIN_COLUMN,
+    MOD_COLUMN,
+]
+
 
 def read_mztab(mztab_files, pairing_file_name=None):
     """Read peptide-spectrum matches (PSMs) from mzTab files.
@@ -33,16 +48,15 @@ def read_mztab(mztab_files, pairing_file_name=None):
     mztab_files = utils.listify(mztab_files)
 
     # Create a dataframe from the PSMs in the mzTab files.
-    data = pd.concat([_parse_psms(f) for f in mztab_files])
+    data = pd.concat([_parse_psms(f) for f in mztab_files], ignore_index=True)
 
-    # Initialize column names from mzTab standard specifications
-    spectrum_col = ["spectra_ref"]
+    spectrum_col = SPECTRUM_COLUMNS
     score_col = [c for c in data.columns if "search_engine_score" in c]
-    target_col = "opt_global_cv_MS:1002217_decoy_peptide"
-    sequence_col = "sequence"
-    protein_col = "accession"  # TODO check if correct
+    target_col = TARGET_COLUMN
+    sequence_col = SEQUENCE_COLUMN
+    protein_col = PROTEIN_COLUMN
     delim_col = ";"  # TODO check if correct
-    mod_col = "modifications"
+    mod_col = MOD_COLUMN
 
     # Check that all column headers are valid, otherwise, throw error
     if len(set(spectrum_col) & set(data.columns)) < len(spectrum_col):
@@ -70,8 +84,9 @@ def read_mztab(mztab_files, pairing_file_name=None):
         )
 
     # Create the necesssary columns
-    data["peptide"] = data[sequence_col] + "[" + data[mod_col] + "]"
-    data["target"] = ~data[target_col].astype(bool)
+    mods = data[mod_col].fillna("")
+    data["peptide"] = data[sequence_col] + "[" + mods + "]"
+    data["target"] = ~data[target_col].fillna(0).astype(bool)
 
     # Keep only the relevant columns
     columns = spectrum_col + score_col + ["peptide", "target"] + [protein_col]
@@ -90,19 +105,25 @@ def read_mztab(mztab_files, pairing_file_name=None):
 
     if pairing_file_name != None:
         psms._peptide_pairing = utils.create_pairing_from_file(
-            pairing_file_name
+            pairing_file_name, psms.peptides
         )
 
     return psms
 
 
-def _parse_psms(mztab_file):
-    """Parse a single mzTab file using Pyteomics
+def _parse_psms(mztab_file, chunk_size=100000):
+    """Parse the PSM section of a single mzTab file.
+
+    Only the lines of the PSM section, which start with "PSH" or "PSM", are
+    parsed, in chunks of `chunk_size` lines, and only the columns needed by
+    :py:func:`read_mztab()` are kept. The other sections are skipped.
 
     Parameters
     ----------
     mztab_file : str
         The mzTab file to read.
+    chunk_size : int, optional
+        The number of PSM lines to parse at once.
 
     Returns
     -------
@@ -110,4 +131,45 @@ def _parse_psms(mztab_file):
         A :py:class:`pandas.DataFrame` containing the parsed PSMs.
     """
     LOGGER.info("Reading PSMs from %s...", mztab_file)
-    return MzTab(str(mztab_file)).spectrum_match_table
+    with metrics.stage("parse"):
+        with utils.open_file(mztab_file, "rt") as mztab:
+            lines = (line for line in mztab if line.startswith(("PSH", "PSM")))
+            header = next(lines, None)
+            if header is None or not header.startswith("PSH"):
+                raise ValueError(f"No PSM section was found in {mztab_file}.")
+
+            header = header.rstrip("\r\n").split("\t")
+            keep = [c for c in header if _keep_column(c)]
+            dtypes = {c: str for c in keep if c in STRING_COLUMNS}
+            chunks = []
+            while True:
+                chunk = "".join(islice(lines, chunk_size))
+                if not chunk:
+                    break
+
+                chunks.append(
+                    pd.read_csv(
+                        io.StringIO(chunk),
+                        sep="\t",
+                        header=None,
+                        names=header,
+                        usecols=keep,
+                        dtype=dtypes,
+                        na_values=["null"],
+                        keep_default_na=False,
+                    )
+                )
+
+    if not chunks:
+        return pd.DataFrame(columns=keep)
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _keep_column(column):
+    """Is the column of the PSM section needed by :py:func:`read_mztab()`?"""
+    return (
+        column in STRING_COLUMNS
+        or column == TARGET_COLUMN
+        or "search_engine_score" in column
+    )
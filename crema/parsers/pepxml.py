@@ -11,7 +11,8 @@ import pandas as pd
 import itertools
 import re
 
-from ..utils import listify
+from ..utils import listify, open_file
+from .. import metrics
 from ..dataset import PsmDataset
 
 LOGGER = logging.getLogger(__name__)
@@ -113,13 +114,15 @@ def _parse_pepxml(pepxml_file, decoy_prefix):
         A :py:class:`pandas.DataFrame` containing the parsed PSMs.
     """
     LOGGER.info("Reading PSMs from %s...", pepxml_file)
-    parser = etree.iterparse(str(pepxml_file), tag="{*}msms_run_summary")
+    pepxml_ref = open_file(pepxml_file)
+    parser = etree.iterparse(pepxml_ref, tag="{*}msms_run_summary")
     parse_fun = partial(_parse_msms_run, decoy_prefix=decoy_prefix)
     spectra = map(parse_fun, parser)
     try:
-        psms = itertools.chain.from_iterable(spectra)
-        df = pd.DataFrame.from_records(itertools.chain.from_iterable(psms))
-        df["ms_data_file"] = df["ms_data_file"].astype("category")
+        with metrics.stage("parse"), pepxml_ref:
+            psms = itertools.chain.from_iterable(spectra)
+            df = pd.DataFrame.from_records(itertools.chain.from_iterable(psms))
+            df["ms_data_file"] = df["ms_data_file"].astype("category")
     except etree.XMLSyntaxError:
         raise ValueError(
             f"{pepxml_file} is not a PepXML file or is malformed."
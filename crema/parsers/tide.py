@@ -2,18 +2,23 @@
 
 import re
 import logging
+from functools import partial
 
 import pandas as pd
-from pathlib import Path
 
 from .txt import read_txt
 from .. import utils
+from .. import metrics
 
 LOGGER = logging.getLogger(__name__)
 
 
 def read_tide(
-    txt_files, pairing_file_name=None, decoy_prefix="decoy_", copy_data=True
+    txt_files,
+    pairing_file_name=None,
+    decoy_prefix="decoy_",
+    copy_data=True,
+    engine="c",
 ):
     """Read peptide-spectrum matches (PSMs) from Tide tab-delimited files.
 
@@ -35,6 +40,10 @@ def read_tide(
         is safer because it prevents accidental modification of the underlying
         data. This argument only has an effect when `txt_files` is a
         :py:class:`pandas.DataFrame`
+    engine : {"c", "pyarrow"}, optional
+        The CSV parser to use. The "pyarrow" engine reads with multiple
+        threads and requires the optional pyarrow package. This argument only
+        has an effect when `txt_files` are files.
 
     Returns
     -------
@@ -70,10 +79,10 @@ def read_tide(
         txt_files = utils.listify(txt_files)
         for txt_file in txt_files:
             # check file type
-            if Path(txt_file).suffix != ".txt":
+            if utils.file_suffix(txt_file) != ".txt":
                 raise ValueError(f"{txt_file} must be .txt format.")
 
-            with open(txt_file) as txt_ref:
+            with utils.open_file(txt_file, "rt", threaded=False) as txt_ref:
                 cols = txt_ref.readline().rstrip().split("\t")
                 scores = scores.intersection(set(cols))
 
@@ -86,13 +95,22 @@ def read_tide(
     scores = list(scores)
 
     # Read in the files:
+    dtypes = utils.psm_dtypes(scores, ["scan"])
     fields = [*spectrum, peptide, target, *scores, pairing, protein]
+    process = partial(
+        _clean_proteins, protein=protein, decoy_prefix=decoy_prefix
+    )
     if isinstance(txt_files, pd.DataFrame):
-        data = txt_files.copy(deep=copy_data).loc[:, fields]
+        data = process(txt_files.copy(deep=copy_data).loc[:, fields])
     else:
-        data = pd.concat(
-            [utils.parse_psms_txt(f, fields, False) for f in txt_files]
+        parse = partial(
+            utils.parse_psms_txt,
+            cols=fields,
+            skip_line=False,
+            dtypes=dtypes,
+            engine=engine,
         )
+        data = utils.parse_files(txt_files, parse, process)
 
     psms = read_txt(
         data,
@@ -110,21 +128,39 @@ def read_tide(
     # always pair target and decoys for Tide
     # explicit pairing done in read_txt
     if pairing_file_name == None:  # implicit pairing
-        psms._peptide_pairing = _create_pairing(data)
+        with metrics.stage("pairing"):
+            psms._peptide_pairing = _create_pairing(data)
+
+    return psms
+
 
+def _clean_proteins(data, protein, decoy_prefix):
+    """Clean up the protein IDs of the PSMs from a Tide file.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The PSMs.
+    protein : str
+        The protein column.
+    decoy_prefix : str
+        The prefix used to indicate a decoy protein in the protein column.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The PSMs, with the cleaned protein IDs.
+    """
     # Remove the start position of peptide in protein if present
     # This looks like "protName(XX)"
     # Remove decoy prefix from protein ID
-    protein_column = psms.proteins
-    new_protein_column = protein_column.str.replace(
-        "\\([^()]*\\)", "", regex=True
+    data[protein] = utils.map_unique(
+        data[protein],
+        lambda prots: prots.str.replace(
+            "\\([^()]*\\)", "", regex=True
+        ).str.replace(decoy_prefix, "", regex=True),
     )
-    new_protein_column = new_protein_column.str.replace(
-        decoy_prefix, "", regex=True
-    )
-    psms.set_protein_column(new_protein_column)
-
-    return psms
+    return data
 
 
 def _create_pairing(pairing_data):
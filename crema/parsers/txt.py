@@ -20,6 +20,7 @@ def read_txt(
     sep="\t",
     pairing_file_name=None,
     copy_data=True,
+    engine="c",
 ):
     """Read peptide-spectrum matches (PSMs) from delimited text files.
 
@@ -57,6 +58,10 @@ def read_txt(
         is safer because it prevents accidental modification of the underlying
         data. This argument only has an effect when `pin_files` is a
         :py:class:`pandas.DataFrame`
+    engine : {"c", "pyarrow"}, optional
+        The CSV parser to use. The "pyarrow" engine reads with multiple
+        threads and requires the optional pyarrow package. This argument only
+        has an effect when `txt_files` are files.
 
     Returns
     -------
@@ -76,8 +81,12 @@ def read_txt(
     if isinstance(txt_files, pd.DataFrame):
         data = txt_files.copy(deep=copy_data).loc[:, fields]
     else:
+        dtypes = utils.psm_dtypes(score_columns)
         data = pd.concat(
-            [_parse_psms(f, sep, fields) for f in utils.listify(txt_files)]
+            [
+                _parse_psms(f, sep, fields, dtypes, engine)
+                for f in utils.listify(txt_files)
+            ]
         )
 
     data[target_column] = _convert_target_col(data[target_column])
@@ -94,13 +103,13 @@ def read_txt(
 
     if pairing_file_name != None:
         psms._peptide_pairing = utils.create_pairing_from_file(
-            pairing_file_name
+            pairing_file_name, psms.peptides
         )
 
     return psms
 
 
-def _parse_psms(txt_file, sep, cols):
+def _parse_psms(txt_file, sep, cols, dtypes=None, engine="c"):
     """Parse a single delimited txt file.
 
     Parameters
@@ -111,14 +120,17 @@ def _parse_psms(txt_file, sep, cols):
         The delimiter to use.
     cols : list of str
         The columns to parse.
+    dtypes : dict of str, dtype, optional
+        The data types of the columns.
+    engine : {"c", "pyarrow"}, optional
+        The CSV parser to use.
 
     Returns
     -------
     pandas.DataFrame
         A :py:class:`pandas.DataFrame` containing the parsed PSMs
     """
-    LOGGER.info("Reading PSMs from %s...", txt_file)
-    return pd.read_csv(txt_file, sep=sep, usecols=cols)
+    return utils.parse_psms_txt(txt_file, cols, False, dtypes, engine, sep)
 
 
 def _convert_target_col(data):
@@ -0,0 +1,137 @@
+"""Record function-level profiles of crema.
+
+Two formats are supported:
+
+- "pstats" uses :py:mod:`cProfile` to record every function call, and can
+  be read with :py:mod:`pstats` or tools such as snakeviz.
+- "speedscope" records when each function in crema is entered and exited,
+  as an evented profile that can be opened at https://www.speedscope.app.
+
+In both formats the numba kernels appear as function calls, so the time
+spent in them is included.
+"""
+import os
+import sys
+import json
+import time
+import cProfile
+import logging
+from contextlib import contextmanager
+
+LOGGER = logging.getLogger(__name__)
+
+FORMATS = {"pstats": ".pstats", "speedscope": ".speedscope.json"}
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+@contextmanager
+def profile(path, fmt="pstats"):
+    """Profile the enclosed code and save the profile.
+
+    Parameters
+    ----------
+    path : str or Path
+        The file in which to save the profile.
+    fmt : {"pstats", "speedscope"}, optional
+        The profile format.
+    """
+    if fmt == "pstats":
+        profiler = cProfile.Profile()
+    elif fmt == "speedscope":
+        profiler = _EventProfiler()
+    else:
+        raise ValueError(
+            f"Unrecognized profile format '{fmt}'. Available formats are: "
+            f"{', '.join(FORMATS)}"
+        )
+
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(path))
+        LOGGER.info("Saved the %s profile to %s", fmt, path)
+
+
+class _EventProfiler:
+    """Record the entry and exit times of the functions in crema.
+
+    Only functions defined in the crema package are recorded, which keeps
+    the profile small enough to load. Calls in worker processes are not
+    recorded.
+    """
+
+    def __init__(self):
+        """Initialize the profiler"""
+        self._root = os.path.dirname(os.path.abspath(__file__))
+        self._frames = {}
+        self._events = []
+        self._stack = []
+        self._start = None
+        self._end = None
+
+    def enable(self):
+        """Start recording"""
+        self._start = time.perf_counter()
+        sys.setprofile(self._trace)
+
+    def disable(self):
+        """Stop recording, closing any functions that are still open"""
+        sys.setprofile(None)
+        self._end = time.perf_counter() - self._start
+        while self._stack:
+            self._events.append(
+                {"type": "C", "frame": self._stack.pop(), "at": self._end}
+            )
+
+    def _trace(self, frame, event, arg):
+        """The profile function passed to :py:func:`sys.setprofile`"""
+        if event not in ("call", "return"):
+            return
+
+        code = frame.f_code
+        if not code.co_filename.startswith(self._root):
+            return
+
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        idx = self._frames.setdefault(key, len(self._frames))
+        now = time.perf_counter() - self._start
+        if event == "call":
+            self._stack.append(idx)
+            self._events.append({"type": "O", "frame": idx, "at": now})
+        elif self._stack and self._stack[-1] == idx:
+            self._stack.pop()
+            self._events.append({"type": "C", "frame": idx, "at": now})
+
+    def dump_stats(self, path):
+        """Save the profile in the speedscope format.
+
+        Parameters
+        ----------
+        path : str
+            The file in which to save the profile.
+        """
+        frames = [
+            {"name": name, "file": fname, "line": line}
+            for name, fname, line in self._frames
+        ]
+        report = {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": "crema",
+            "exporter": "crema",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "evented",
+                    "name": "crema",
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": self._end,
+                    "events": self._events,
+                }
+            ],
+        }
+        with open(path, "w") as out_file:
+            json.dump(report, out_file)
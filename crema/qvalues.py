@@ -7,10 +7,18 @@ import logging
 import numpy as np
 import numba as nb
 
+# Use the ahead-of-time compiled kernels if they have been built with
+# `python -m crema.aot`. Otherwise, the numba kernels below are compiled
+# on first use and cached on disk.
+try:
+    from . import _qvalues_aot
+except ImportError:
+    _qvalues_aot = None
+
 LOGGER = logging.getLogger(__name__)
 
 
-def tdc(scores, target, desc=True):
+def tdc(scores, target, desc=True, out=None, order=None):
     """
     Estimate q-values using target decoy competition.
 
@@ -49,16 +57,28 @@ def tdc(scores, target, desc=True):
         Are higher scores better? `True` indicates that they are,
         `False` indicates that they are not.
 
+    out : numpy.ndarray of float, optional
+        A preallocated 1D array in which to store the q-values. It must be
+        the same length as `scores`. If :code:`None`, a new array is
+        allocated.
+
+    order : numpy.ndarray of int, optional
+        The indices that sort `scores` in ascending order with NaNs last, as
+        :py:func:`numpy.argsort` does, such as those cached by
+        :py:meth:`~crema.dataset.PsmDataset.score_order()`. The same order
+        is used for either value of `desc`. If :code:`None`, the scores are
+        sorted.
+
     Returns
     -------
     numpy.ndarray
         A 1D array with the estimated q-value for each entry. The
         array is the same length as the `scores` and `target` arrays.
     """
-    scores = np.array(scores)
+    scores = np.asarray(scores)
 
     try:
-        target = np.array(target, dtype=bool)
+        target = np.asarray(target, dtype=bool)
     except ValueError:
         raise ValueError("'target' should be boolean.")
 
@@ -70,37 +90,217 @@ def tdc(scores, target, desc=True):
     if np.issubdtype(scores.dtype, np.integer):
         scores = scores.astype(np.float_)
 
-    # Sort and estimate FDR
-    if desc:
-        srt_idx = np.argsort(-scores)
-    else:
+    if out is None:
+        out = np.empty(scores.shape[0])
+    elif out.shape != scores.shape:
+        raise ValueError("'out' must be the same length as 'scores'")
+
+    # A single ascending sort; the kernel walks it in whichever direction
+    # goes from worst to best. NaN scores sort last and are always ranked
+    # worst. Tied scores are handled as a group, so the sort does not need
+    # to be stable.
+    if order is None:
         srt_idx = np.argsort(scores)
+    else:
+        srt_idx = np.asarray(order)
+        if srt_idx.shape != scores.shape:
+            raise ValueError("'order' must be the same length as 'scores'")
+    if _use_aot(scores, out) and srt_idx.dtype == np.int64:
+        _qvalues_aot.tdc_qvalues(scores, target, srt_idx, desc, out)
+    else:
+        _tdc_qvalues(scores, target, srt_idx, desc, out)
 
-    scores = scores[srt_idx]
-    target = target[srt_idx]
-    cum_targets = target.cumsum()
-    cum_decoys = (~target).cumsum()
-
-    # Handles zeros in denominator
-    fdr = np.divide(
-        (cum_decoys + 1),
-        cum_targets,
-        out=np.ones_like(cum_targets, dtype=float),
-        where=(cum_targets != 0),
-    )
+    return out
 
-    # Some arrays need to be flipped so that we can loop through from
-    # worse to best score.
-    fdr = np.flip(fdr)
-    scores = np.flip(scores)
-    qvals = _fdr2qvalue(scores, fdr)
-    qvals = np.flip(qvals)
-    qvals = qvals[np.argsort(srt_idx)]
 
-    return qvals
+def _sorted_tdc(scores, target, out):
+    """Calculate TDC q-values for PSMs sorted from best to worst score.
+
+    Parameters
+    ----------
+    scores : np.ndarray
+        The scores of the PSMs, sorted from best to worst.
+    target : np.ndarray of bool
+        The target/decoy labels of the PSMs, sorted to match scores.
+    out : np.ndarray
+        The array in which the q-values are stored.
+    """
+    if _use_aot(scores, out):
+        _qvalues_aot.sorted_tdc_qvalues(scores, target, out)
+    else:
+        _sorted_tdc_qvalues(scores, target, out)
+
 
+def _use_aot(*arrays):
+    """Can the ahead-of-time compiled kernels be used for these arrays?
 
-@nb.njit
+    The ahead-of-time kernels are compiled only for 64-bit floats.
+
+    Parameters
+    ----------
+    *arrays : np.ndarray
+        The floating point arrays passed to the kernel.
+
+    Returns
+    -------
+    bool
+    """
+    if _qvalues_aot is None:
+        return False
+
+    return all(a.dtype == np.float64 for a in arrays)
+
+
+@nb.njit(cache=True)
+def _tdc_qvalues(scores, target, srt_idx, desc, out):
+    """Calculate TDC q-values in a single pass over sorted scores.
+
+    The sorted order is walked from worst to best score without copying it.
+    NaN scores, which are sorted last, are walked first as one group of ties,
+    so they rank worst for either direction. Cumulative target and decoy counts start at
+    their totals and are decremented as each group of tied scores is passed,
+    so the FDR for a group is evaluated with all of its tied PSMs accepted.
+    The running minimum FDR is scattered directly back to the original
+    positions.
+
+    Parameters
+    ----------
+    scores : np.ndarray
+        The scores of the PSMs, in their original order.
+    target : np.ndarray of bool
+        The target/decoy labels of the PSMs, in their original order.
+    srt_idx : np.ndarray of int
+        The indices that sort `scores` in ascending order, with NaNs last.
+    desc : bool
+        Are higher scores better?
+    out : np.ndarray
+        The array in which the q-values are stored, in the original order.
+    """
+    num_psms = srt_idx.shape[0]
+    num_targets = 0
+    for idx in range(num_psms):
+        if target[idx]:
+            num_targets += 1
+
+    num_nans = 0
+    while num_nans < num_psms and np.isnan(
+        scores[srt_idx[num_psms - num_nans - 1]]
+    ):
+        num_nans += 1
+
+    num_decoys = num_psms - num_targets
+    min_q = 1.0
+    start = 0
+    while start < num_psms:
+        if start < num_nans:
+            # The NaN scores are tied with each other.
+            stop = num_nans
+        else:
+            cur_score = scores[_worst_to_best(srt_idx, start, desc, num_nans)]
+            stop = start + 1
+            while stop < num_psms:
+                next_idx = _worst_to_best(srt_idx, stop, desc, num_nans)
+                if scores[next_idx] != cur_score:
+                    break
+
+                stop += 1
+
+        if num_targets:
+            fdr = (num_decoys + 1) / num_targets
+            if fdr < min_q:
+                min_q = fdr
+
+        for pos in range(start, stop):
+            idx = _worst_to_best(srt_idx, pos, desc, num_nans)
+            out[idx] = min_q
+            if target[idx]:
+                num_targets -= 1
+            else:
+                num_decoys -= 1
+
+        start = stop
+
+
+@nb.njit(cache=True)
+def _worst_to_best(srt_idx, pos, desc, num_nans):
+    """The index of the PSM at a position in the worst to best order.
+
+    Parameters
+    ----------
+    srt_idx : np.ndarray of int
+        The indices that sort the scores in ascending order, with NaNs last.
+    pos : int
+        The position, counting from the worst score.
+    desc : bool
+        Are higher scores better?
+    num_nans : int
+        The number of NaN scores.
+
+    Returns
+    -------
+    int
+        The index of the PSM in the original order.
+    """
+    num_psms = srt_idx.shape[0]
+    # The NaNs at the end of the ascending order are the worst either way.
+    if pos < num_nans:
+        return srt_idx[num_psms - pos - 1]
+
+    # Ascending order is worst to best only when higher scores are better.
+    if desc:
+        return srt_idx[pos - num_nans]
+
+    return srt_idx[num_psms - pos - 1]
+
+
+@nb.njit(cache=True)
+def _sorted_tdc_qvalues(scores, target, out):
+    """Calculate TDC q-values for PSMs that are already sorted.
+
+    This is the same calculation as :py:func:`_tdc_qvalues`, but for arrays
+    that are already ordered from best to worst score, such as the result
+    of merging several sorted shards. No sort index is needed, so the
+    arrays may be memory-mapped.
+
+    Parameters
+    ----------
+    scores : np.ndarray
+        The scores of the PSMs, sorted from best to worst.
+    target : np.ndarray of bool
+        The target/decoy labels of the PSMs, sorted to match scores.
+    out : np.ndarray
+        The array in which the q-values are stored.
+    """
+    num_psms = scores.shape[0]
+    num_targets = 0
+    for idx in range(num_psms):
+        if target[idx]:
+            num_targets += 1
+
+    num_decoys = num_psms - num_targets
+    min_q = 1.0
+    stop = num_psms
+    while stop > 0:
+        start = stop - 1
+        while start > 0 and scores[start - 1] == scores[stop - 1]:
+            start -= 1
+
+        if num_targets:
+            fdr = (num_decoys + 1) / num_targets
+            if fdr < min_q:
+                min_q = fdr
+
+        for idx in range(start, stop):
+            out[idx] = min_q
+            if target[idx]:
+                num_targets -= 1
+            else:
+                num_decoys -= 1
+
+        stop = start
+
+
+@nb.njit(cache=True)
 def _fdr2qvalue(scores, fdr):
     """Quickly calculate q-values.
 
@@ -196,7 +396,10 @@ def mixmax(target_scores, decoy_scores, combined_score, combined_score_target):
 
     # calculate pi0
     if len(pval_list) > 0:
-        pi0 = estimate_pi0(pval_list)
+        if _use_aot(pval_list):
+            pi0 = _qvalues_aot.estimate_pi0(pval_list)
+        else:
+            pi0 = estimate_pi0(pval_list)
     else:
         # Corner case: if pval_list is empty there are no targets.
         # In this case pi0 is undefined, but we set it to 1.0, as all
@@ -212,14 +415,19 @@ def mixmax(target_scores, decoy_scores, combined_score, combined_score_target):
             f"Invalid pi0 estimate ({pi0}); unable to proceed FDR estimation!"
         )
     else:
-        fdrmod = calculate_mixmax_qval(
-            np.array(target_scores), np.array(decoy_scores), pi0
-        )
+        target_scores = np.array(target_scores)
+        decoy_scores = np.array(decoy_scores)
+        if _use_aot(target_scores, decoy_scores):
+            fdrmod = _qvalues_aot.calculate_mixmax_qval(
+                target_scores, decoy_scores, pi0
+            )
+        else:
+            fdrmod = calculate_mixmax_qval(target_scores, decoy_scores, pi0)
 
     return (pi0, fdrmod)
 
 
-@nb.njit
+@nb.njit(cache=True)
 def estimate_pi0(pval_list):
     """
     Estimates pi0. Add description. TODO
@@ -292,7 +500,7 @@ def estimate_pi0(pval_list):
     return pi0
 
 
-@nb.njit
+@nb.njit(cache=True)
 def calculate_mixmax_qval(target_scores, decoy_scores, pi0):
     """
     Estimate q-values using mix-max.
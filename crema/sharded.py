@@ -0,0 +1,513 @@
+"""Out-of-core target-decoy competition across shards of PSMs.
+
+Competition between PSMs for the same mass spectrum only ever involves PSMs
+from the same spectrum file. Thus, PSM-level competition can be performed
+independently for each shard of the input, such as each search result file,
+and only the winners need to be retained. Peptide-level competition is
+also performed within each shard, because the best PSM for a peptide must
+be the best among the winners of each shard.
+
+Each shard is processed in its own process and its winners are written to
+disk, sorted from best to worst score. The shards are then combined with a
+k-way merge, which streams the winners in chunks. The global q-value pass
+uses memory-mapped arrays, so only one chunk from each shard needs to be
+held in memory at a time.
+"""
+
+import os
+import logging
+import tempfile
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import qvalues
+from . import utils
+from .confidence import Confidence, _compete
+from .parsers.tide import read_tide
+
+LOGGER = logging.getLogger(__name__)
+
+
+def assign_confidence_sharded(
+    shards,
+    score_column,
+    desc,
+    reader=read_tide,
+    threshold=0.01,
+    pep_fdr_type="psm-peptide",
+    eval_fdr=0.01,
+    output_dir=None,
+    file_root=None,
+    decoys=False,
+    n_jobs=1,
+    spill_dir=None,
+    chunk_size=100000,
+):
+    """Assign confidence estimates to PSMs split across many shards.
+
+    Each shard is read with `reader` and competed in a separate process.
+    The winners are spilled to disk and combined with a k-way merge for the
+    global q-value calculation, so the full collection of PSMs never needs
+    to fit in memory. The results are written directly to tab-delimited
+    files, in the same format as :py:func:`~crema.to_txt()`.
+
+    Only PSM- and peptide-level confidence estimates are calculated, because
+    protein-level estimates require the peptides from all shards at once.
+
+    Parameters
+    ----------
+    shards : str or list of (str or list of str)
+        The shards of PSMs. Each element is passed to `reader`, so a shard
+        may be a single file or a list of files. The spectra in one shard
+        must not appear in any other shard, and each shard must contain both
+        the target and decoy PSMs for its spectra.
+    score_column : str
+        The score by which to rank the PSMs.
+    desc : bool
+        True if higher scores better, False if lower scores are better.
+    reader : callable, optional
+        The function used to read each shard into a
+        :py:class:`~crema.dataset.PsmDataset`, such as
+        :py:func:`~crema.read_tide()`. It must be defined at the top level of
+        a module so that it can be sent to worker processes.
+    threshold : float or "q-value", optional
+        The FDR threshold for accepting discoveries. Default is 0.01. If
+        "q-value" is chosen, then "accept" column is replaced with
+        "crema q-value".
+    pep_fdr_type : {"psm-only","peptide-only",psm-peptide"}, optional
+        The method for crema to use when calculating peptide level confidence
+        estimates. Default is "psm-peptide".
+    eval_fdr : float, optional
+        The false discovery rate threshold used to report the number of
+        discoveries in logging messages.
+    output_dir : str or None, optional
+        The directory in which to save the files. :code:`None` will use the
+        current working directory.
+    file_root : str or None, optional
+        An optional prefix for the confidence estimate files.
+    decoys : bool, optional
+        Save decoys confidence estimates as well?
+    n_jobs : int, optional
+        The number of processes used to compete the shards.
+    spill_dir : str or None, optional
+        The directory in which to create a temporary directory for the
+        intermediate files. It is removed when finished. :code:`None` uses
+        the default location for temporary files.
+    chunk_size : int, optional
+        The number of rows read from each shard at a time during the merge.
+
+    Returns
+    -------
+    list of str
+        The paths to the saved files.
+    """
+    if isinstance(desc, str) or desc is None:
+        raise ValueError("'desc' must be True or False for sharded mode.")
+
+    pep_fdr_type_option = ["psm-only", "peptide-only", "psm-peptide"]
+    if pep_fdr_type not in pep_fdr_type_option:
+        raise ValueError("%s not valid pep_fdr_type" % (pep_fdr_type))
+
+    shards = utils.listify(shards)
+    LOGGER.info("Competing PSMs in %i shards...", len(shards))
+    with tempfile.TemporaryDirectory(dir=spill_dir) as tmp_dir:
+        args = [
+            (shard, idx, reader, score_column, desc, pep_fdr_type, tmp_dir)
+            for idx, shard in enumerate(shards)
+        ]
+        if n_jobs == 1:
+            results = [_compete_shard(*a) for a in args]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                results = list(pool.map(_compete_shard, *zip(*args)))
+
+        # Each shard can only pair the peptides it contains, so the pairings
+        # are combined to identify peptide groups across shards.
+        pairing = {}
+        for _, shard_pairing in results:
+            if shard_pairing is not None:
+                pairing.update(shard_pairing)
+
+        if pep_fdr_type == "psm-only":
+            pairing = {}
+
+        file_base = "crema"
+        if file_root is not None:
+            file_base = file_root + "." + file_base
+        if output_dir is not None:
+            file_base = Path(output_dir, file_base)
+
+        out_files = []
+        for level in ("psms", "peptides"):
+            files = [spills[level] for spills, _ in results]
+            out_files += _merge_level(
+                level=level,
+                spill_files=files,
+                pairing=pairing,
+                score_column=score_column,
+                desc=desc,
+                threshold=threshold,
+                eval_fdr=eval_fdr,
+                file_base=str(file_base),
+                decoys=decoys,
+                tmp_dir=tmp_dir,
+                chunk_size=chunk_size,
+            )
+
+    return out_files
+
+
+def _compete_shard(
+    shard, idx, reader, score_column, desc, pep_fdr_type, spill_dir
+):
+    """Read a shard, compete its PSMs, and spill the winners to disk.
+
+    Parameters
+    ----------
+    shard : str or list of str
+        The files in the shard.
+    idx : int
+        The index of the shard, used to name the spill files.
+    reader : callable
+        The function used to read the shard.
+    score_column : str
+        The score by which to rank the PSMs.
+    desc : bool
+        True if higher scores better, False if lower scores are better.
+    pep_fdr_type : {"psm-only","peptide-only",psm-peptide"}
+        The peptide-level FDR estimation method.
+    spill_dir : str
+        The directory in which to write the winners.
+
+    Returns
+    -------
+    spills : dict of str
+        The spill file for each level. The first column of each file is the
+        peptide used to deduplicate winners across shards, or is empty
+        when the groups cannot span shards.
+    pairing : dict or None
+        The target/decoy peptide pairing found in this shard.
+    """
+    psms = reader(shard)
+    data = psms.data
+    pairing = psms.peptide_pairing
+    spectrum_cols = psms._spectrum_columns
+    peptide_col = psms._peptide_column
+    columns = [
+        *spectrum_cols,
+        peptide_col,
+        psms._protein_column,
+        score_column,
+        psms._target_column,
+    ]
+
+    if pairing is None and pep_fdr_type != "psm-only":
+        raise ValueError(
+            "Must provide paired target decoy peptide infomation (see FAQ)."
+        )
+
+    spills = {}
+    psm_df = _compete(
+        data,
+        spectrum_cols,
+        score_column,
+        desc,
+        psms.spectrum_keys,
+        psms.one_psm_per_spectrum,
+    )
+    spills["psms"] = _spill(psm_df, None, columns, score_column, desc)
+    key = peptide_col
+
+    if pep_fdr_type == "psm-only":
+        pep_df = data
+        group_col = peptide_col
+    else:
+        if pep_fdr_type == "psm-peptide":
+            pep_df = psm_df.copy()
+        else:
+            pep_df = data
+
+        group_col = utils.new_column("pairing", pep_df)
+        pep_df[group_col] = pep_df[peptide_col].map(
+            lambda x: pairing.get(x, x)
+        )
+
+    pep_df = _compete(pep_df, group_col, score_column, desc)
+    spills["peptides"] = _spill(pep_df, key, columns, score_column, desc)
+
+    out_files = {}
+    for level, spill in spills.items():
+        out_file = os.path.join(spill_dir, f"shard{idx}.{level}.txt")
+        spill.to_csv(out_file, sep="\t", index=False)
+        out_files[level] = out_file
+
+    return out_files, pairing
+
+
+def _spill(df, key, columns, score_column, desc):
+    """Prepare competition winners to be written to disk.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The winners of the competition.
+    key : str or None
+        The column used to identify groups that may span shards.
+    columns : list of str
+        The columns to keep.
+    score_column : str
+        The score by which to rank the PSMs.
+    desc : bool
+        True if higher scores better, False if lower scores are better.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The winners, sorted from best to worst score, with the group key as
+        the first column.
+    """
+    out_df = df.loc[:, columns]
+    if key is None:
+        out_df.insert(0, "crema key", "")
+    else:
+        out_df.insert(0, "crema key", df[key].values)
+
+    return out_df.sort_values(score_column, ascending=not desc, kind="stable")
+
+
+def _merge_level(
+    level,
+    spill_files,
+    pairing,
+    score_column,
+    desc,
+    threshold,
+    eval_fdr,
+    file_base,
+    decoys,
+    tmp_dir,
+    chunk_size,
+):
+    """Merge the spilled winners for a level and write the results.
+
+    The shards are merged twice. The first pass collects the score and
+    target label of each winner into memory-mapped arrays, from which the
+    q-values are calculated. The second pass repeats the same merge, attaches
+    the q-values, and writes the rows to the output files.
+
+    Parameters
+    ----------
+    level : str
+        The level, such as "psms" or "peptides".
+    spill_files : list of str
+        The spill files for this level, one per shard.
+    pairing : dict
+        The combined target/decoy peptide pairing.
+    score_column : str
+        The score by which to rank the PSMs.
+    desc : bool
+        True if higher scores better, False if lower scores are better.
+    threshold : float or "q-value"
+        The FDR threshold for accepting discoveries.
+    eval_fdr : float
+        The FDR threshold used to report the number of discoveries.
+    file_base : str
+        The path and prefix of the output files.
+    decoys : bool
+        Save decoys confidence estimates as well?
+    tmp_dir : str
+        The directory for the memory-mapped arrays.
+    chunk_size : int
+        The number of rows read from each shard at a time.
+
+    Returns
+    -------
+    list of str
+        The paths to the saved files.
+    """
+    # Find the column names from the first spill file.
+    with open(spill_files[0]) as spill_ref:
+        columns = spill_ref.readline().rstrip("\n").split("\t")
+
+    target_col = columns[-1]
+    num_rows = 0
+    for spill_file in spill_files:
+        with open(spill_file) as spill_ref:
+            num_rows += sum(1 for _ in spill_ref) - 1
+
+    scores = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, f"{level}.scores.npy"),
+        mode="w+",
+        dtype=np.float64,
+        shape=(num_rows,),
+    )
+    targets = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, f"{level}.targets.npy"),
+        mode="w+",
+        dtype=bool,
+        shape=(num_rows,),
+    )
+
+    # First pass: scores and target labels of the global winners.
+    usecols = ["crema key", score_column, target_col]
+    num_kept = 0
+    blocks = _merge_spills(
+        spill_files, score_column, desc, usecols, chunk_size
+    )
+    for block in _deduplicate(blocks, pairing):
+        stop = num_kept + len(block)
+        scores[num_kept:stop] = block[score_column].values
+        targets[num_kept:stop] = block[target_col].values
+        num_kept = stop
+
+    qvals = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, f"{level}.qvals.npy"),
+        mode="w+",
+        dtype=np.float64,
+        shape=(num_kept,),
+    )
+    qvalues._sorted_tdc(scores[:num_kept], targets[:num_kept], qvals)
+    LOGGER.info(
+        "  - Found %i %s at q<=%g.",
+        ((qvals <= eval_fdr) & targets[:num_kept]).sum(),
+        Confidence._level_labs[level],
+        eval_fdr,
+    )
+
+    # Second pass: attach q-values and write the results.
+    if threshold != "q-value":
+        last_col = "accept"
+    else:
+        last_col = "crema q-value"
+
+    out_files = {True: file_base + f".{level}.txt"}
+    if decoys:
+        out_files[False] = file_base + f".decoy.{level}.txt"
+
+    header = True
+    start = 0
+    blocks = _merge_spills(spill_files, score_column, desc, None, chunk_size)
+    for block in _deduplicate(blocks, pairing):
+        stop = start + len(block)
+        block = block.drop(columns="crema key")
+        is_target = block.pop(target_col).values
+        block[last_col] = qvals[start:stop]
+        if threshold != "q-value":
+            block[last_col] = block[last_col] <= threshold
+
+        for label, out_file in out_files.items():
+            rows = block.loc[is_target == label, :]
+            if label is False:
+                rows = rows.drop(columns=last_col)
+
+            rows.to_csv(
+                out_file,
+                sep="\t",
+                index=False,
+                header=header,
+                mode="w" if header else "a",
+            )
+
+        header = False
+        start = stop
+
+    return list(out_files.values())
+
+
+def _merge_spills(spill_files, score_column, desc, usecols, chunk_size):
+    """Perform a k-way merge of sorted spill files in chunks.
+
+    A row can be emitted once no unread row in any shard can have a better
+    score. Because each shard is sorted, the unread rows of a shard are no
+    better than the last row read from it, so every buffered row that is at
+    least as good as the best of these last rows is safe to emit.
+
+    Parameters
+    ----------
+    spill_files : list of str
+        The spill files, each sorted from best to worst score.
+    score_column : str
+        The column to merge on.
+    desc : bool
+        True if higher scores better, False if lower scores are better.
+    usecols : list of str or None
+        The columns to read.
+    chunk_size : int
+        The number of rows read from each shard at a time.
+
+    Yields
+    ------
+    pandas.DataFrame
+        The next block of rows, sorted from best to worst score.
+    """
+    readers = [
+        pd.read_csv(
+            f,
+            sep="\t",
+            usecols=usecols,
+            chunksize=chunk_size,
+            keep_default_na=False,
+            na_values={score_column: [""]},
+        )
+        for f in spill_files
+    ]
+    buffers = [next(r, None) for r in readers]
+    sign = -1 if desc else 1
+    while True:
+        active = [i for i, buf in enumerate(buffers) if buf is not None]
+        if not active:
+            return
+
+        # Work with scores where smaller is better.
+        bound = min(sign * buffers[i][score_column].values[-1] for i in active)
+        block = []
+        for i in active:
+            buf = buffers[i]
+            scores = sign * buf[score_column].values
+            num_safe = np.searchsorted(scores, bound, side="right")
+            block.append(buf.iloc[:num_safe])
+            if num_safe < len(buf):
+                buffers[i] = buf.iloc[num_safe:]
+            else:
+                buffers[i] = next(readers[i], None)
+
+        block = pd.concat(block, ignore_index=True)
+        yield block.sort_values(
+            score_column, ascending=not desc, kind="stable"
+        )
+
+
+def _deduplicate(blocks, pairing):
+    """Keep only the first occurrence of each peptide group.
+
+    Blocks arrive from best to worst score, so the first occurrence of a
+    group is the winner of the competition across shards. Rows with an empty
+    key are always kept.
+
+    Parameters
+    ----------
+    blocks : iterable of pandas.DataFrame
+        The merged blocks of rows.
+    pairing : dict
+        The target/decoy peptide pairing used to group the peptide keys.
+
+    Yields
+    ------
+    pandas.DataFrame
+        The blocks, without the rows that lost the competition.
+    """
+    seen = set()
+    for block in blocks:
+        keys = block["crema key"].astype(str)
+        if (keys == "").all():
+            yield block
+            continue
+
+        keys = keys.map(lambda x: pairing.get(x, x))
+
+        drop = (keys != "") & (keys.isin(seen) | keys.duplicated())
+        seen.update(keys[~drop & (keys != "")])
+        yield block.loc[~drop, :]
@@ -1,12 +1,39 @@
 """Utility functions that are used in multiple modules"""
 
 import pandas as pd
+import numpy as np
 import logging
 
+import io
+import bz2
+import gzip
+import lzma
+import queue
+import functools
 import itertools
+import threading
+from pathlib import Path
+from multiprocessing import shared_memory
+
+from . import metrics
+from .pairing import PeptidePairing
 
 LOGGER = logging.getLogger(__name__)
 
+# The compressed formats that can be read, by file suffix.
+COMPRESSION_SUFFIXES = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".zst": "zstd",
+}
+
+# The parsers available for delimited text files.
+CSV_ENGINES = ("c", "pyarrow")
+
+# The size of the chunks decompressed by the background thread.
+DECOMPRESS_CHUNK_SIZE = 1024**2
+
 
 def listify(obj):
     """Create list containing an object if it is not already a list."""
@@ -19,6 +46,265 @@ def listify(obj):
     return list(obj)
 
 
+def compression(path):
+    """The compression format of a file, from its suffix.
+
+    Parameters
+    ----------
+    path : str or Path
+        The file.
+
+    Returns
+    -------
+    str or None
+        One of "gzip", "bz2", "xz" or "zstd", or :code:`None` if the file is
+        not compressed.
+    """
+    return COMPRESSION_SUFFIXES.get(Path(path).suffix.lower())
+
+
+def file_suffix(path):
+    """The suffix of a file, ignoring the suffix of any compression.
+
+    For example, both "psms.txt" and "psms.txt.gz" have the suffix ".txt".
+
+    Parameters
+    ----------
+    path : str or Path
+        The file.
+
+    Returns
+    -------
+    str
+        The suffix.
+    """
+    path = Path(path)
+    if compression(path) is not None:
+        path = path.with_suffix("")
+
+    return path.suffix
+
+
+def open_file(path, mode="rb", threaded=True, **kwargs):
+    """Open a PSM file for reading, decompressing it if needed.
+
+    Files compressed with gzip, bzip2, xz or zstd are recognized by their
+    suffix and decompressed as they are read. The zstd format requires the
+    optional zstandard package.
+
+    Parameters
+    ----------
+    path : str or Path
+        The file to open.
+    mode : {"rb", "rt"}, optional
+        Open the file in binary or text mode.
+    threaded : bool, optional
+        Decompress the file in a background thread, so that decompression
+        overlaps with parsing. This should be disabled when only the first
+        few lines are needed.
+    **kwargs : dict
+        Keyword arguments for :py:func:`open()` or
+        :py:class:`io.TextIOWrapper`, such as `encoding` and `errors`.
+
+    Returns
+    -------
+    file object
+        The opened file.
+    """
+    codec = compression(path)
+    if codec is None:
+        return open(path, mode, **kwargs)
+
+    stream = _open_compressed(path, codec)
+    if threaded:
+        stream = io.BufferedReader(
+            _ThreadedReader(stream), DECOMPRESS_CHUNK_SIZE
+        )
+
+    if "t" in mode:
+        return io.TextIOWrapper(stream, **kwargs)
+
+    return stream
+
+
+def _open_compressed(path, codec):
+    """Open a binary stream of the decompressed contents of a file.
+
+    Parameters
+    ----------
+    path : str or Path
+        The compressed file.
+    codec : {"gzip", "bz2", "xz", "zstd"}
+        The compression format.
+
+    Returns
+    -------
+    file object
+        The decompressed stream.
+    """
+    if codec == "gzip":
+        return gzip.open(path, "rb")
+
+    if codec == "bz2":
+        return bz2.open(path, "rb")
+
+    if codec == "xz":
+        return lzma.open(path, "rb")
+
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            f"Reading {path} requires the zstandard package. Install it with "
+            "'pip install crema-ms[zstd]'."
+        )
+
+    return zstandard.ZstdDecompressor().stream_reader(
+        open(path, "rb"), read_across_frames=True, closefd=True
+    )
+
+
+class _ThreadedReader(io.RawIOBase):
+    """Read a binary stream ahead in a background thread.
+
+    The thread reads chunks from the stream into a bounded buffer, so the
+    work done by the stream, such as decompression, overlaps with the work
+    done by the consumer.
+
+    Parameters
+    ----------
+    stream : file object
+        The binary stream to read.
+    chunk_size : int, optional
+        The number of bytes to read at a time.
+    max_chunks : int, optional
+        The maximum number of chunks to read ahead.
+    """
+
+    def __init__(self, stream, chunk_size=DECOMPRESS_CHUNK_SIZE, max_chunks=8):
+        """Initialize a _ThreadedReader"""
+        super().__init__()
+        self._stream = stream
+        chunks = iter(functools.partial(stream.read, chunk_size), b"")
+        self._chunks = prefetch(chunks, max_chunks)
+        self._buffer = memoryview(b"")
+
+    def readable(self):
+        """The stream is readable"""
+        return True
+
+    def readinto(self, buf):
+        """Read bytes into a buffer"""
+        if not self._buffer:
+            self._buffer = memoryview(next(self._chunks, b""))
+
+        size = min(len(buf), len(self._buffer))
+        buf[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        """Stop the background thread and close the stream"""
+        if not self.closed:
+            self._chunks.close()
+            self._stream.close()
+
+        super().close()
+
+
+def prefetch(iterable, buffer_size=2):
+    """Iterate over an iterable in a background thread.
+
+    Up to `buffer_size` items are produced ahead of the consumer, so the work
+    of producing the next item overlaps with the work done on the current
+    one. The items are yielded in order, and an exception raised while
+    producing an item is raised again by the consumer.
+
+    Parameters
+    ----------
+    iterable : iterable
+        The items to produce.
+    buffer_size : int, optional
+        The maximum number of items produced ahead of the consumer.
+
+    Yields
+    ------
+    object
+        The items of `iterable`.
+    """
+    items = queue.Queue(buffer_size)
+    closing = threading.Event()
+    done = object()
+
+    def put(item):
+        """Add an item to the buffer, unless the consumer has stopped"""
+        while not closing.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def produce():
+        """Produce the items, then mark the end"""
+        try:
+            for item in iterable:
+                put((item, None))
+                if closing.is_set():
+                    return
+        except Exception as exc:  # Raised again by the consumer.
+            put((None, exc))
+            return
+
+        put((done, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, exc = items.get()
+            if exc is not None:
+                raise exc
+
+            if item is done:
+                return
+
+            yield item
+    finally:
+        closing.set()
+        thread.join()
+
+
+def parse_files(files, parse, process=None, buffer_size=2):
+    """Parse files in order, processing each one while the next is parsed.
+
+    The files are parsed in a background thread and at most `buffer_size`
+    parsed files wait to be processed, which bounds the memory used.
+
+    Parameters
+    ----------
+    files : list of str
+        The files to parse.
+    parse : callable
+        A function that parses a file into a :py:class:`pandas.DataFrame`.
+    process : callable, optional
+        A function applied to each parsed :py:class:`pandas.DataFrame`, which
+        returns the processed :py:class:`pandas.DataFrame`.
+    buffer_size : int, optional
+        The maximum number of parsed files waiting to be processed.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The processed PSMs from all of the files, in the order of `files`.
+    """
+    parsed = prefetch(map(metrics.propagate(parse), files), buffer_size)
+    if process is not None:
+        parsed = map(process, parsed)
+
+    return pd.concat(list(parsed))
+
+
 def new_column(name, df):
     """Add a new column, ensuring a unique name"""
     new_name = name
@@ -31,7 +317,79 @@ def new_column(name, df):
     return new_name
 
 
-def create_pairing_from_file(pairing_file_name):
+def map_unique(values, func):
+    """Apply a transformation to only the unique values of a column.
+
+    Columns such as peptides and proteins have far fewer unique values than
+    rows. The column is factorized, `func` is applied to the unique values,
+    and the results are gathered back to the rows by their codes.
+
+    Parameters
+    ----------
+    values : pandas.Series
+        The column to transform.
+    func : callable
+        A function that takes and returns a :py:class:`pandas.Series` of the
+        same length, such as ``lambda x: x.str.replace("a", "b")``.
+
+    Returns
+    -------
+    pandas.Series
+        The transformed column, with the index and name of `values`.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=values.dtype)
+    if (codes < 0).any():
+        # Missing values are transformed as one more unique value.
+        codes = np.where(codes < 0, len(uniques), codes)
+        missing = pd.Series([None], dtype=values.dtype)
+        uniques = pd.concat([uniques, missing], ignore_index=True)
+
+    result = func(uniques).to_numpy()
+    return pd.Series(result[codes], index=values.index, name=values.name)
+
+
+def encode_keys(df, columns):
+    """Encode the values of several columns as one integer key per row.
+
+    Each column is factorized and the codes are packed into a single 64-bit
+    integer, so grouping, sorting and hashing by the key is much faster
+    than by tuples of strings and floats. Two rows have the same key if
+    and only if they have the same values in `columns`, and the keys sort
+    in the same order as the rows would by `columns`, with missing values
+    last.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table to encode.
+    columns : str or list of str
+        The columns that define a key.
+
+    Returns
+    -------
+    numpy.ndarray of int64
+        The key for each row of `df`.
+    """
+    keys = np.zeros(len(df), dtype=np.int64)
+    n_keys = 1
+    for col in listify(columns):
+        codes, uniques = pd.factorize(df[col], sort=True)
+        # Missing values are coded as -1, and sort last.
+        n_codes = len(uniques) + 1
+        codes = np.where(codes < 0, len(uniques), codes)
+        if n_keys * n_codes >= 2**63:
+            # Renumber the keys so far to make room for this column.
+            keys, used = pd.factorize(keys, sort=True)
+            n_keys = len(used)
+
+        keys = keys * n_codes + codes
+        n_keys *= n_codes
+
+    return keys
+
+
+def create_pairing_from_file(pairing_file_name, peptides=None):
     """Parse a single file that explicity pairs target and decoy sequences.
 
     Parameters
@@ -41,33 +399,30 @@ def create_pairing_from_file(pairing_file_name):
         sequences. Requires one column labeled 'target' that contains target
         sequences and a second column labeled 'decoy(s)' that contains decoy
         sequences. For analying fles generated by Tide, this file can be
-        generated by setting --peptide-list=T in tide-index.
+        generated by setting --peptide-list=T in tide-index. This may also be
+        a binary file created from it by :py:mod:`crema.pairing`, which is
+        memory-mapped.
+    peptides : array-like of str, optional
+        The peptides in the PSMs. If given, only the pairs with a target or
+        decoy among them are kept.
 
     Returns
     -------
-    pairing : dict[str, str]
+    pairing : PeptidePairing
         A map of target and decoy peptide sequence pairings. Targets with
         missing decoys will not be included among the keys.
     """
-    pairing_file = pd.read_csv(pairing_file_name, sep="\t")
-
-    # ensure pairing_file dataframe contains all necessary columns
-    target_field = "target"
-    decoy_field = "decoy(s)"
-    req_fields = [target_field, decoy_field]
-
-    if not set(req_fields).issubset(pairing_file.columns):
-        miss = ", ".join(set(req_fields) - set(pairing_file.columns))
-        raise ValueError(
-            f"Required columns for peptide pairing were not detected: {miss}"
-        )
+    with metrics.stage("pairing"):
+        pairing = PeptidePairing.from_file(pairing_file_name)
+        if peptides is not None:
+            pairing = pairing.subset(peptides)
 
-    # drop targets that do not have corresponding decoys
-    pairing_file = pairing_file[pairing_file[decoy_field] != ""]
-    return dict(zip(pairing_file[target_field], pairing_file[decoy_field]))
+    return pairing
 
 
-def parse_psms_txt(txt_file, cols, skip_line):
+def parse_psms_txt(
+    txt_file, cols, skip_line, dtypes=None, engine="c", sep="\t"
+):
     """Parse a single tab-delimited file
 
     Parameters
@@ -78,18 +433,209 @@ def parse_psms_txt(txt_file, cols, skip_line):
         The columns to parse.
     skip_line : bool
         If true, skip reading the first line.
+    dtypes : dict of str, dtype, optional
+        The data types of the columns, which saves pandas from inferring
+        them. Columns that are not parsed are ignored.
+    engine : {"c", "pyarrow"}, optional
+        The CSV parser used by :py:func:`pandas.read_csv()`. The "pyarrow"
+        engine reads with multiple threads and requires the optional pyarrow
+        package.
+    sep : str, optional
+        The delimiter to use.
 
     Returns
     -------
     pandas.DataFrame
         A :py:class:`pandas.DataFrame` containing the parsed PSMs
     """
+    if engine not in CSV_ENGINES:
+        raise ValueError(
+            f"Unrecognized engine '{engine}'. Available engines are: "
+            f"{', '.join(CSV_ENGINES)}"
+        )
+
     LOGGER.info("Reading PSMs from %s...", txt_file)
+    usecols = lambda c: c in cols
+    if engine == "pyarrow":
+        # The pyarrow engine does not accept a callable for 'usecols'.
+        with open_file(txt_file, "rt", threaded=False) as txt_ref:
+            if skip_line:
+                txt_ref.readline()
 
-    # Because skip_line is a boolean:
-    return pd.read_csv(
-        txt_file,
-        sep="\t",
-        skiprows=int(skip_line),
-        usecols=lambda c: c in cols,
-    )
+            header = txt_ref.readline().rstrip("\r\n").split(sep)
+            usecols = [c for c in header if c in cols]
+
+    with metrics.stage("parse"), open_file(txt_file) as txt_ref:
+        # Consume the line on the handle, because the pyarrow engine does
+        # not skip rows before the header the way the C engine does.
+        if skip_line:
+            txt_ref.readline()
+
+        return pd.read_csv(
+            txt_ref,
+            sep=sep,
+            usecols=usecols,
+            dtype=dtypes,
+            engine=engine,
+        )
+
+
+def psm_dtypes(score_columns, int_columns=()):
+    """The data types of PSM columns with known types.
+
+    Parameters
+    ----------
+    score_columns : list of str
+        The score columns, which are parsed as 64-bit floats.
+    int_columns : list of str, optional
+        Columns of integers, such as scan numbers, parsed as 64-bit integers.
+
+    Returns
+    -------
+    dict of str, str
+        The data type of each column.
+    """
+    dtypes = dict.fromkeys(score_columns, "float64")
+    dtypes.update(dict.fromkeys(int_columns, "int64"))
+    return dtypes
+
+
+def to_shared_memory(df):
+    """Copy the columns of a DataFrame into shared memory blocks.
+
+    Numeric and boolean NumPy columns are copied as they are. Other columns,
+    such as strings, categoricals and nullable extension types, are
+    factorized and only their integer codes are placed in shared memory; the
+    unique values are kept in the returned specification, so the column keeps
+    its dtype. The index is shared in the same way, unless it is a
+    :py:class:`pandas.RangeIndex`. The specification is small and can be sent
+    to another process, where :py:func:`from_shared_memory()` rebuilds the
+    DataFrame without pickling its data.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The DataFrame to share.
+
+    Returns
+    -------
+    spec : tuple
+        The name, shared memory block name, dtype, length, and unique values
+        (or :code:`None`) of each column, and the index, either as a
+        :py:class:`pandas.RangeIndex` or as the same details for each of its
+        levels.
+    blocks : list of multiprocessing.shared_memory.SharedMemory
+        The shared memory blocks. The caller must close and unlink these
+        once they are no longer needed.
+    """
+    blocks = []
+    try:
+        columns = [_share(col, df[col], blocks) for col in df.columns]
+        index = df.index
+        if not isinstance(index, pd.RangeIndex):
+            levels = index.to_frame(index=False)
+            index = [
+                _share(name, levels.iloc[:, pos], blocks)
+                for pos, name in enumerate(index.names)
+            ]
+    except Exception:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+        raise
+
+    return (columns, index), blocks
+
+
+def from_shared_memory(spec):
+    """Rebuild a DataFrame from shared memory blocks.
+
+    Parameters
+    ----------
+    spec : tuple
+        The specification returned by :py:func:`to_shared_memory()`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A copy of the shared DataFrame, with its index and dtypes.
+    """
+    columns, index = spec
+    data = {entry[0]: _unshare(entry) for entry in columns}
+    if not isinstance(index, pd.RangeIndex):
+        names = [entry[0] for entry in index]
+        levels = [_unshare(entry) for entry in index]
+        if len(levels) == 1:
+            index = pd.Index(levels[0], name=names[0])
+        else:
+            index = pd.MultiIndex.from_arrays(levels, names=names)
+
+    return pd.DataFrame(data, index=index)
+
+
+def _share(name, values, blocks):
+    """Copy an array into a new shared memory block.
+
+    Parameters
+    ----------
+    name : str
+        The name of the column or index level.
+    values : pandas.Series
+        The values to share.
+    blocks : list of multiprocessing.shared_memory.SharedMemory
+        The list to which the new block is added.
+
+    Returns
+    -------
+    tuple
+        The specification of the shared array.
+    """
+    uniques = None
+    if isinstance(values.dtype, np.dtype):
+        values = values.to_numpy()
+    else:
+        values = values.array
+
+    if not isinstance(values, np.ndarray) or values.dtype.kind not in "biuf":
+        try:
+            # Missing values are coded as -1.
+            values, uniques = pd.factorize(values)
+        except TypeError as err:
+            raise ValueError(
+                f"The '{name}' column cannot be placed in shared memory, "
+                "because its values cannot be hashed."
+            ) from err
+
+    block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    blocks.append(block)
+    shared = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)
+    shared[:] = values
+    return (name, block.name, values.dtype.str, len(values), uniques)
+
+
+def _unshare(entry):
+    """Copy an array out of a shared memory block.
+
+    Parameters
+    ----------
+    entry : tuple
+        The specification of the shared array, from :py:func:`_share()`.
+
+    Returns
+    -------
+    numpy.ndarray or pandas.api.extensions.ExtensionArray
+        A copy of the shared values.
+    """
+    _, name, dtype, length, uniques = entry
+    block = shared_memory.SharedMemory(name=name)
+    values = np.ndarray((length,), dtype=dtype, buffer=block.buf)
+    if uniques is None:
+        out = values.copy()
+    else:
+        out = pd.api.extensions.take(uniques, values, allow_fill=True)
+
+    # The view must be released before the block can be closed.
+    del values
+    block.close()
+    return out
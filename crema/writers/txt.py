@@ -5,6 +5,8 @@ from collections import defaultdict
 
 import pandas as pd
 
+from .. import metrics
+
 
 def to_txt(
     conf, output_dir=None, file_root=None, sep="\t", decoys=False, precision=6
@@ -62,12 +64,13 @@ def to_txt(
             results[level] += qval_list
 
     out_files = []
-    for level, qval_list in results.items():
-        out_file = str(file_base) + f".{level}.txt"
-        pd.concat(qval_list).to_csv(
-            out_file, sep=sep, index=False, float_format=f"%.{precision}f"
-        )
-        out_files.append(out_file)
+    with metrics.stage("write"):
+        for level, qval_list in results.items():
+            out_file = str(file_base) + f".{level}.txt"
+            pd.concat(qval_list).to_csv(
+                out_file, sep=sep, index=False, float_format=f"%.{precision}f"
+            )
+            out_files.append(out_file)
 
     return out_files
 
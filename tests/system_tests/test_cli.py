@@ -1,8 +1,12 @@
 """These tests verify that the crema CLI works as expected."""
 
+import json
+import pstats
 from pathlib import Path
 import subprocess
 
+import pandas as pd
+
 
 def test_cli_basic(basic_tide_txt, tmp_path):
     """Test that the basic cli works."""
@@ -33,3 +37,73 @@ def test_real(real_tide_txt, tmp_path):
     assert Path(tmp_path, "crema.peptides.txt").exists()
     assert Path(tmp_path, "crema.proteins.txt").exists()
     assert Path(tmp_path, "crema.log.txt").exists()
+
+
+def test_cli_metrics(real_tide_txt, tmp_path):
+    """Test that the stage metrics are saved."""
+    cmd = ["crema", "--output_dir", tmp_path, "--metrics"]
+    subprocess.run(cmd + list(real_tide_txt), check=True)
+    with Path(tmp_path, "crema.metrics.json").open() as metrics_file:
+        report = json.load(metrics_file)
+
+    stages = [s["stage"] for s in report["stages"]]
+    assert "read/parse" in stages
+    assert "read/pairing" in stages
+    assert "confidence/psms/competition" in stages
+    assert "confidence/peptides/q-values" in stages
+    assert "write" in stages
+    assert report["wall_time_seconds"] > 0
+
+    log = Path(tmp_path, "crema.log.txt").read_text()
+    assert "[read/parse]" in log
+    assert "[write]" in log
+
+
+def test_cli_profile(basic_tide_txt, tmp_path):
+    """Test that profiles are saved in both formats."""
+    for fmt, ext in [("pstats", "pstats"), ("speedscope", "speedscope.json")]:
+        cmd = ["crema", "-o", tmp_path, "-e", "0.5", "--profile", fmt]
+        subprocess.run(cmd + [basic_tide_txt], check=True)
+        assert Path(tmp_path, f"crema.profile.{ext}").exists()
+
+    stats = pstats.Stats(str(Path(tmp_path, "crema.profile.pstats")))
+    assert any(func[2] == "_tdc_qvalues" for func in stats.stats)
+
+    with Path(tmp_path, "crema.profile.speedscope.json").open() as prof:
+        report = json.load(prof)
+
+    names = {frame["name"] for frame in report["shared"]["frames"]}
+    assert "_tdc_qvalues" in names
+
+
+def test_cli_save(basic_tide_txt, tmp_path):
+    """Test that the discovery curve is saved and results can be
+    rethresholded."""
+    cmd = ["crema", "-o", tmp_path, "-e", "0.5", "--save", basic_tide_txt]
+    subprocess.run(cmd + ["--discovery_curve"], check=True)
+    curve = pd.read_csv(Path(tmp_path, "crema.discoveries.txt"), sep="\t")
+    assert list(curve.columns[:2]) == ["threshold", "psms"]
+    assert len(curve) == 100
+
+    saved = Path(tmp_path, "crema.confidence.pkl")
+    assert saved.exists()
+
+    out_dir = tmp_path / "rethreshold"
+    out_dir.mkdir()
+    cmd = ["crema", "rethreshold", saved, "-t", "q-value", "-o", out_dir]
+    subprocess.run(cmd + ["-f", "new", "--decoys"], check=True)
+    psms = pd.read_csv(Path(out_dir, "new.crema.psms.txt"), sep="\t")
+    assert "crema q-value" in psms.columns
+    assert Path(out_dir, "new.crema.decoy.psms.txt").exists()
+
+
+def test_cli_decoys(basic_tide_txt, tmp_path):
+    """Test that decoys are written both in memory and in sharded mode."""
+    sharded = ["--sharded", "-s", "combined p-value", "-d", "False"]
+    for name, mode in [("memory", []), ("sharded", sharded)]:
+        out_dir = tmp_path / name
+        out_dir.mkdir()
+        cmd = ["crema", "-o", out_dir, "-e", "0.5", "--decoys", *mode]
+        subprocess.run(cmd + [basic_tide_txt], check=True)
+        assert Path(out_dir, "crema.psms.txt").exists()
+        assert Path(out_dir, "crema.decoy.psms.txt").exists()
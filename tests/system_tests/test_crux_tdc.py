@@ -176,3 +176,36 @@ def test_tide_tdc_prot_combine(target_tide_txt, decoy_tide_txt, tmp_path):
         expected_decoy_proteins.values,
         conf.decoy_confidence_estimates["proteins"].values,
     )
+
+
+def test_tide_tdc_compact(real_tide_txt):
+    """Compact dtypes should not change which discoveries are accepted"""
+    confs = []
+    for compact in (False, True):
+        np.random.seed(0)
+        psms = read_tide(real_tide_txt)
+        if compact:
+            psms.to_compact()
+
+        confs.append(
+            psms.assign_confidence(score_column="combined p-value", desc=False)
+        )
+
+    full, compact = confs
+    assert (
+        compact.confidence_estimates["psms"]["combined p-value"].dtype
+        == np.float32
+    )
+    for level, full_df in full.confidence_estimates.items():
+        compact_df = compact.confidence_estimates[level]
+        assert len(full_df) == len(compact_df)
+        assert full_df["accept"].sum() == compact_df["accept"].sum()
+
+    spectra = ["file", "scan"]
+    full_psms = full.confidence_estimates["psms"]
+    compact_psms = compact.confidence_estimates["psms"]
+    accepted = [
+        set(map(tuple, df.loc[df["accept"], spectra].values))
+        for df in (full_psms, compact_psms)
+    ]
+    assert accepted[0] == accepted[1]
@@ -2,11 +2,20 @@
 These tests verify the confidence implementations function as expected
 """
 
+import logging
+
 import pytest
 import numpy as np
+import pandas as pd
 
+import crema
+from crema import confidence, utils
 from crema.confidence import TdcConfidence, MixmaxConfidence
+from crema.confidence import assign_confidence, load_confidence
+from crema.confidence import assign_confidence_per_score
+from crema.confidence import assign_confidence_ensemble
 from crema.dataset import PsmDataset
+from crema.parsers.tide import read_tide
 
 from .test_dataset import simple_df
 
@@ -65,3 +74,332 @@ def test_mixmax_confidence_desc(simple_psms: PsmDataset):
         conf, MixmaxConfidence
     ), f"Unexpected result type: {conf}"
     # TODO: assertions
+
+
+def test_assign_confidence_n_jobs(simple_psms: PsmDataset, simple_df):
+    """Test that datasets can be processed in parallel, in order"""
+    small_psms = PsmDataset(
+        psms=simple_df.iloc[2:, :],
+        target_column="target",
+        spectrum_columns=["scan", "spectrum precursor m/z"],
+        score_columns=["combined p-value", "x"],
+        peptide_column="sequence",
+        protein_column="protein id",
+        protein_delim=",",
+    )
+
+    dsets = [simple_psms, small_psms, simple_psms]
+    kwargs = dict(
+        score_column="x", pep_fdr_type="psm-only", threshold="q-value"
+    )
+    serial = assign_confidence(dsets, **kwargs)
+    parallel = assign_confidence(dsets, n_jobs=2, **kwargs)
+
+    assert len(parallel) == 3
+    for conf, expected, dset in zip(parallel, serial, dsets):
+        assert isinstance(conf, TdcConfidence)
+        assert conf.dataset is dset
+        pd.testing.assert_frame_equal(conf.data, dset.data)
+        for level, df in expected.confidence_estimates.items():
+            pd.testing.assert_series_equal(
+                conf.confidence_estimates[level]["crema q-value"],
+                df["crema q-value"],
+                check_index=False,
+            )
+
+    for n_jobs in [0, -1]:
+        with pytest.raises(ValueError):
+            assign_confidence(dsets, n_jobs=n_jobs, **kwargs)
+
+        with pytest.raises(ValueError):
+            assign_confidence_per_score(simple_psms, n_jobs=n_jobs)
+
+        with pytest.raises(ValueError):
+            assign_confidence_ensemble(simple_psms, n_jobs=n_jobs)
+
+
+def test_shared_memory(simple_df):
+    """Test that DataFrames keep their index and dtypes in shared memory"""
+    df = simple_df.iloc[::-1].assign(
+        count=pd.array([None] + [1] * (len(simple_df) - 1), dtype="Int64"),
+        label=pd.Categorical(["a"] * len(simple_df)),
+    )
+    for index in [df.index, df.index + 10, pd.RangeIndex(len(df))]:
+        df.index = index
+        spec, blocks = utils.to_shared_memory(df)
+        try:
+            pd.testing.assert_frame_equal(utils.from_shared_memory(spec), df)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    with pytest.raises(ValueError):
+        utils.to_shared_memory(df.assign(lists=[[1]] * len(df)))
+
+
+def test_assign_confidence_per_score(simple_psms: PsmDataset):
+    """Test that each score gets its own confidence estimates"""
+    kwargs = dict(pep_fdr_type="psm-only", threshold="q-value")
+    serial = assign_confidence_per_score(simple_psms, **kwargs)
+    parallel = assign_confidence_per_score(simple_psms, n_jobs=2, **kwargs)
+
+    assert list(serial) == ["combined p-value", "x"]
+    assert list(parallel) == list(serial)
+    for score, conf in parallel.items():
+        assert conf.dataset is simple_psms
+        expected = simple_psms.assign_confidence(score_column=score, **kwargs)
+        for level, df in expected.confidence_estimates.items():
+            pd.testing.assert_series_equal(
+                conf.confidence_estimates[level]["crema q-value"],
+                df["crema q-value"],
+                check_index=False,
+            )
+
+
+def test_worker_dataset_unchanged(real_tide_txt):
+    """Test that tasks do not add columns to a worker's cached dataset"""
+    psms = read_tide(real_tide_txt)
+    columns = list(psms.data.columns)
+    spec, blocks = utils.to_shared_memory(psms._data)
+    kwargs = dict(
+        score_column="combined p-value",
+        desc=False,
+        pep_fdr_type="peptide-only",
+    )
+    try:
+        confidence._init_worker([(spec, psms._column_roles())])
+        for seed in range(2):
+            confidence._assign_confidence_shared(0, kwargs, seed)
+            dset = confidence._WORKER_DATASETS[0]
+            assert list(dset._data.columns) == columns
+    finally:
+        confidence._init_worker([])
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    conf = psms.assign_confidence(**kwargs)
+    assert list(conf.data.columns) == columns
+
+
+def test_assign_confidence_ensemble(simple_psms: PsmDataset):
+    """Test that the ensemble is reproducible and summarizes every run"""
+    kwargs = dict(score_column="x", pep_fdr_type="psm-only", threshold=0.5)
+    serial = assign_confidence_ensemble(simple_psms, 4, seed=1, **kwargs)
+    parallel = assign_confidence_ensemble(
+        simple_psms, 4, seed=1, n_jobs=2, **kwargs
+    )
+
+    assert serial.seeds == parallel.seeds
+    counts = serial.discovery_counts()
+    assert list(counts["seed"]) == serial.seeds
+    pd.testing.assert_frame_equal(counts, parallel.discovery_counts())
+    for conf, count in zip(serial.confidences, counts["psms"]):
+        assert count == conf.confidence_estimates["psms"]["accept"].sum()
+
+    spread = serial.discovery_spread()
+    assert list(spread.columns) == ["min", "max", "mean", "std"]
+    assert spread.loc["psms", "max"] == counts["psms"].max()
+
+    freq = serial.acceptance_frequency("peptides")
+    assert list(freq.columns) == ["sequence", "accept frequency"]
+    assert freq["accept frequency"].between(0, 1, inclusive="right").all()
+    assert freq["sequence"].is_unique
+
+    with pytest.raises(ValueError):
+        serial.acceptance_frequency("foo")
+
+
+def test_rethreshold(real_tide_txt, tmp_path):
+    """Test that rethresholding matches assigning confidence again"""
+    psms = read_tide(real_tide_txt)
+    np.random.seed(0)
+    conf = psms.assign_confidence(score_column="combined p-value", desc=False)
+    np.random.seed(0)
+    expected = psms.assign_confidence(
+        score_column="combined p-value", desc=False, threshold=0.05
+    )
+    np.random.seed(0)
+    expected_qvals = psms.assign_confidence(
+        score_column="combined p-value", desc=False, threshold="q-value"
+    )
+
+    path = conf.save(tmp_path / "crema.confidence.pkl")
+    conf.rethreshold(0.05)
+    loaded = load_confidence(path)
+    assert loaded.dataset is None
+    assert loaded.threshold == 0.01
+    loaded.rethreshold(0.05)
+    for level, df in expected.confidence_estimates.items():
+        pd.testing.assert_frame_equal(conf.confidence_estimates[level], df)
+        pd.testing.assert_frame_equal(loaded.confidence_estimates[level], df)
+        pd.testing.assert_frame_equal(
+            loaded.decoy_confidence_estimates[level],
+            expected.decoy_confidence_estimates[level],
+        )
+
+    conf.rethreshold("q-value")
+    for level, df in expected_qvals.confidence_estimates.items():
+        pd.testing.assert_frame_equal(conf.confidence_estimates[level], df)
+
+    with pytest.raises(ValueError):
+        conf.rethreshold(2)
+
+    bad_file = tmp_path / "bad.pkl"
+    pd.to_pickle({"not": "crema"}, bad_file)
+    with pytest.raises(ValueError):
+        load_confidence(bad_file)
+
+
+def test_load_other_version(real_tide_txt, tmp_path, caplog, monkeypatch):
+    """Test that loading results from another crema version warns"""
+    psms = read_tide(real_tide_txt)
+    conf = psms.assign_confidence(score_column="combined p-value", desc=False)
+    path = conf.save(tmp_path / "crema.confidence.pkl")
+    load_confidence(path)
+    assert "was saved with crema" not in caplog.text
+
+    saved = pd.read_pickle(path)
+    saved["crema_version"] = "0.0.1"
+    pd.to_pickle(saved, path)
+    load_confidence(path)
+    assert "was saved with crema 0.0.1" in caplog.text
+
+    # Without package metadata, such as in a source checkout, the version is
+    # unknown and results are saved and loaded without a warning.
+    caplog.clear()
+    monkeypatch.delattr(crema, "__version__", raising=False)
+    path = conf.save(tmp_path / "unknown.pkl")
+    assert pd.read_pickle(path)["crema_version"] is None
+    load_confidence(path)
+    assert "was saved with crema" not in caplog.text
+
+
+def test_discovery_curve(real_tide_txt):
+    """Test that the discovery curve matches thresholding each level"""
+    psms = read_tide(real_tide_txt)
+    conf = psms.assign_confidence(
+        score_column="combined p-value", desc=False, threshold="q-value"
+    )
+
+    thresholds = [0.0, 0.005, 0.01, 0.05, 1.0]
+    curve = conf.discovery_curve(thresholds)
+    assert list(curve.columns) == ["threshold", *conf.confidence_estimates]
+    np.testing.assert_array_equal(curve["threshold"], thresholds)
+    for level, df in conf.confidence_estimates.items():
+        expected = [(df["crema q-value"] <= t).sum() for t in thresholds]
+        np.testing.assert_array_equal(curve[level], expected)
+
+    assert len(conf.discovery_curve()) == 100
+
+
+def test_skip_competition(real_tide_txt, caplog):
+    """Test that competition is skipped with one PSM per spectrum"""
+    from crema import metrics
+
+    psms = read_tide(real_tide_txt)
+    assert not psms.one_psm_per_spectrum
+
+    winners = psms.compete("combined p-value", desc=False)
+    psms = PsmDataset(winners, **psms._column_roles())
+    assert psms.one_psm_per_spectrum
+
+    with metrics.collect():
+        conf = psms.assign_confidence(
+            score_column="combined p-value", desc=False
+        )
+
+    skipped = [r["stage"] for r in metrics.records() if "skipped" in r]
+    assert "confidence/psms/competition" in skipped
+    assert "confidence/proteins/competition" in skipped
+
+    # The skip is reported without collecting metrics too.
+    caplog.clear()
+    with caplog.at_level(logging.INFO):
+        psms.assign_confidence(score_column="combined p-value", desc=False)
+
+    assert "Skipped confidence/psms/competition" in caplog.text
+
+    # Competing anyway gives the same PSMs.
+    psms._one_psm_per_spectrum = False
+    expected = psms.assign_confidence(
+        score_column="combined p-value", desc=False
+    )
+    pd.testing.assert_frame_equal(
+        conf.confidence_estimates["psms"],
+        expected.confidence_estimates["psms"],
+    )
+
+
+def test_metrics_collection(simple_psms):
+    """Test that stages are only recorded while collection is enabled"""
+    from crema import metrics
+
+    kwargs = dict(score_column="x", desc=True, pep_fdr_type="psm-only")
+    with metrics.collect():
+        simple_psms.assign_confidence(**kwargs)
+
+    recorded = metrics.records()
+    assert "confidence" in [r["stage"] for r in recorded]
+    assert not metrics.enabled()
+
+    simple_psms.assign_confidence(**kwargs)
+    assert metrics.records() == recorded
+
+
+def test_index(real_tide_txt, tmp_path):
+    """Test looking up results by spectrum, peptide and protein"""
+    from crema import ConfidenceIndex
+
+    psms = read_tide(real_tide_txt)
+    conf = psms.assign_confidence(
+        score_column="combined p-value", desc=False, threshold="q-value"
+    )
+    index = conf.index()
+    assert index.levels == tuple(conf.confidence_estimates)
+
+    key_cols = {"peptides": "sequence", "proteins": "protein id"}
+    key_cols["protein_groups"] = "protein group"
+    for level, key_col in key_cols.items():
+        df = conf.confidence_estimates[level]
+
+        res = index.lookup(level, df[key_col][::-1].tolist() + ["MISSING"])
+        np.testing.assert_array_equal(
+            res["crema q-value"][:-1], df["crema q-value"][::-1]
+        )
+        assert np.isnan(res["crema q-value"].iloc[-1])
+        assert not res["accept"].iloc[-1]
+
+    peptides = conf.confidence_estimates["peptides"]
+    res = index.peptides(peptides["sequence"], threshold=0.05)
+    np.testing.assert_array_equal(
+        res["accept"], peptides["crema q-value"] <= 0.05
+    )
+
+    spectra = conf.confidence_estimates["psms"].loc[:, ["file", "scan"]]
+    res = index.spectra(spectra.iloc[:10])
+    np.testing.assert_array_equal(
+        res["crema q-value"],
+        conf.confidence_estimates["psms"]["crema q-value"][:10],
+    )
+    assert index.spectra([tuple(spectra.iloc[0])]).shape == (1, 2)
+
+    # Build the index from the saved files, with an accept column.
+    conf.rethreshold(0.01)
+    out_files = conf.to_txt(output_dir=tmp_path)
+    saved = ConfidenceIndex.from_txt(out_files)
+    assert saved.levels == index.levels
+    expected = index.spectra(spectra)
+    pd.testing.assert_series_equal(
+        saved.spectra(spectra)["accept"], expected["accept"]
+    )
+    proteins = conf.confidence_estimates["proteins"]["protein id"]
+    pd.testing.assert_series_equal(
+        saved.proteins(proteins)["accept"], index.proteins(proteins)["accept"]
+    )
+    with pytest.raises(ValueError):
+        saved.proteins(proteins, threshold=0.05)
+
+    with pytest.raises(ValueError):
+        index.lookup("spectra", proteins)
@@ -17,6 +17,25 @@ def simple_df(basic_tide_df):
     return df.drop(columns="target/decoy")
 
 
+@pytest.fixture
+def psm_columns():
+    """The column roles of simple_df"""
+    return dict(
+        target_column="target",
+        spectrum_columns=["file", "scan"],
+        score_columns=["combined p-value", "x"],
+        peptide_column="sequence",
+        protein_column="protein id",
+        protein_delim=",",
+    )
+
+
+@pytest.fixture
+def simple_psms(simple_df, psm_columns):
+    """A simple PsmDataset"""
+    return PsmDataset(psms=simple_df, **psm_columns)
+
+
 def test_create_object(simple_df):
     """Ensures that a PsmDataset object can be initialized properly."""
     psms = PsmDataset(
@@ -95,3 +114,120 @@ def test_find_best_score(simple_df):
     assert score == "x"
     assert npass == 4
     assert desc
+
+
+def test_compact(simple_df, psm_columns):
+    """Test that compact datasets use smaller data types"""
+    psms = PsmDataset(psms=simple_df, compact=True, **psm_columns)
+
+    assert psms.compact
+    assert (psms.scores.dtypes == np.float32).all()
+    assert psms["scan"].dtype == np.int32
+    assert psms["file"].dtype == object
+    assert psms.targets.dtype == bool
+
+    conf = psms.assign_confidence(
+        score_column="x", pep_fdr_type="psm-only", threshold="q-value"
+    )
+    qvals = conf.confidence_estimates["psms"]["crema q-value"]
+    assert qvals.dtype == np.float32
+
+
+def test_compact_underflow(simple_df, psm_columns, caplog):
+    """Test that tiny p-values are not rounded to zero by compact mode"""
+    simple_df["combined p-value"] *= 1e-50
+    psms = PsmDataset(psms=simple_df, compact=True, **psm_columns)
+
+    assert psms["combined p-value"].dtype == np.float64
+    assert psms["x"].dtype == np.float32
+    assert "combined p-value" in caplog.text
+    np.testing.assert_array_equal(
+        psms["combined p-value"], simple_df["combined p-value"]
+    )
+
+
+def test_partition(target_tide_df, decoy_tide_df):
+    """Test partitioning and merging competition results"""
+    df = pd.concat([target_tide_df, decoy_tide_df])
+    df["target"] = df["target/decoy"] == "target"
+    psms = PsmDataset(
+        psms=df,
+        target_column="target",
+        spectrum_columns=["file", "scan"],
+        score_columns="combined p-value",
+        peptide_column="sequence",
+        protein_column="protein id",
+        protein_delim=",",
+        peptide_pairing={"APPLE": "APLPE", "BANANA": "ANANAB"},
+    )
+
+    parts = psms.partition(n_partitions=2)
+    assert sum(len(p.data) for p in parts) == len(df)
+    for part in parts:
+        assert part.score_columns == psms.score_columns
+        assert part.peptide_pairing is psms.peptide_pairing
+        assert not set(part["scan"]) & set().union(
+            *[set(p["scan"]) for p in parts if p is not part]
+        )
+
+    assert len(psms.partition(column="file")) == 1
+    with pytest.raises(ValueError):
+        psms.partition(column="sequence")
+
+    with pytest.raises(ValueError):
+        psms.partition()
+
+    for level in ["psms", "peptides"]:
+        results = [p.compete("combined p-value", False, level) for p in parts]
+        merged = psms.merge_competitions(
+            results, "combined p-value", False, level
+        )
+        expected = psms.compete("combined p-value", False, level)
+        pd.testing.assert_frame_equal(
+            merged.sort_values("scan"), expected.sort_values("scan")
+        )
+
+
+def test_partition_one_class(simple_df, psm_columns):
+    """Test partitions that hold only targets or only decoys"""
+    simple_df["file"] = np.where(simple_df["target"], "t.mzML", "d.mzML")
+    psms = PsmDataset(psms=simple_df, **psm_columns)
+
+    parts = psms.partition(column="file")
+    assert sorted(p.targets.all() for p in parts) == [False, True]
+    assert sorted(p.targets.any() for p in parts) == [False, True]
+    assert sum(len(p.data) for p in parts) == len(simple_df)
+
+    results = [p.compete("combined p-value", False) for p in parts]
+    merged = psms.merge_competitions(results, "combined p-value", False)
+    expected = psms.compete("combined p-value", False)
+    pd.testing.assert_frame_equal(
+        merged.sort_values(["file", "scan"]),
+        expected.sort_values(["file", "scan"]),
+    )
+
+
+def test_spectrum_keys(simple_df, psm_columns):
+    """Test that the spectrum keys identify and order the spectra"""
+    simple_df["file"] = np.where(simple_df["scan"] % 2, "b.mzML", "a.mzML")
+    psms = PsmDataset(psms=simple_df, **psm_columns)
+    keys = psms.spectrum_keys
+    assert keys.dtype == np.int64
+    assert keys is psms.spectrum_keys
+
+    spectra = psms.spectra.assign(key=keys)
+    assert spectra.groupby(["file", "scan"])["key"].nunique().eq(1).all()
+    assert spectra["key"].nunique() == len(spectra.drop_duplicates())
+    ordered = spectra.sort_values(["file", "scan"], kind="mergesort")
+    assert ordered["key"].is_monotonic_increasing
+
+
+def test_score_order(simple_psms):
+    """Test that the score order is cached"""
+    scores = simple_psms["x"].to_numpy()
+    order = simple_psms.score_order("x")
+    assert simple_psms.score_order("x") is order
+    assert (np.diff(scores[order]) >= 0).all()
+
+    simple_psms.to_compact()
+    assert simple_psms.score_order("x") is not order
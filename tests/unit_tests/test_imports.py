@@ -0,0 +1,43 @@
+"""
+These tests verify that importing crema does not load heavy dependencies.
+"""
+import sys
+import subprocess
+
+import pytest
+
+import crema
+from crema.parsers import get_reader
+
+
+HEAVY_MODULES = ["pandas", "numba", "lxml", "pyteomics", "crema.qvalues"]
+
+
+@pytest.mark.parametrize("module", ["crema", "crema.crema"])
+def test_lazy_imports(module):
+    """Importing crema or its CLI should not load parsers or numba"""
+    code = (
+        f"import sys, {module}\n"
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    assert proc.stdout.strip() == ""
+
+
+def test_exports():
+    """The public functions should be available from the top-level package"""
+    for name in crema.__all__:
+        assert getattr(crema, name) is not None
+
+    assert crema.read_tide is get_reader("tide")
+    assert set(crema.__all__) <= set(dir(crema))
+    with pytest.raises(AttributeError):
+        crema.read_nothing
+
+    with pytest.raises(ValueError):
+        get_reader("nothing")
@@ -2,10 +2,18 @@
 These are unit tests for functions within parsers.py:
 """
 
+import bz2
+import gzip
+import lzma
+import shutil
+
 import pytest
 import pandas as pd
 
 import crema
+from crema import utils
+from crema.pairing import PeptidePairing
+from crema.parsers.mztab import _parse_psms
 
 
 def test_read_tide(real_tide_txt):
@@ -45,6 +53,46 @@ def test_read_tide_peptide_pairing(mod_target_tide_txt, mod_decoy_tide_txt):
     assert expected_peptide_pairing == psms.peptide_pairing
 
 
+def test_read_tide_pairing_file(basic_tide_txt, tmp_path):
+    """Test that a pairing file is read and subset to the PSMs"""
+    pairing_file = tmp_path / "peptides.txt"
+    pd.DataFrame(
+        {
+            "target": ["BANANA", "GRAPE", "KIWI", "JAM", "FIG"],
+            "decoy(s)": ["ANANAB", "GARPE", "KWII", "JMA", None],
+            "mass": [1.0, 2.0, 3.0, 4.0, 5.0],
+        }
+    ).to_csv(pairing_file, sep="\t", index=False)
+
+    expected = {"BANANA": "ANANAB", "GRAPE": "GARPE", "JAM": "JMA"}
+    psms = crema.read_tide(basic_tide_txt, pairing_file_name=pairing_file)
+    assert psms.peptide_pairing == expected
+    assert psms.peptide_pairing.get("APPLE", "APPLE") == "APPLE"
+
+    binary_file = tmp_path / "peptides.npy"
+    PeptidePairing.from_file(pairing_file).save(binary_file)
+    psms = crema.read_tide(basic_tide_txt, pairing_file_name=binary_file)
+    assert psms.peptide_pairing == expected
+
+    conf = psms.assign_confidence(score_column="combined p-value", eval_fdr=1)
+    assert len(conf.confidence_estimates["peptides"]) > 0
+
+
+def test_read_comet_pairing_file(mod_comet_txt, tmp_path):
+    """Test that a pairing file is matched to Comet peptides without flanks"""
+    pairing_file = tmp_path / "peptides.txt"
+    pd.DataFrame(
+        {
+            "target": ["A[15.9949]PPLE", "BANANA", "KIWI"],
+            "decoy(s)": ["A[15.9949]LPPE", "BNANAA", "KWII"],
+        }
+    ).to_csv(pairing_file, sep="\t", index=False)
+
+    expected = {"A[15.9949]PPLE": "A[15.9949]LPPE", "BANANA": "BNANAA"}
+    psms = crema.read_comet(mod_comet_txt, pairing_file_name=pairing_file)
+    assert psms.peptide_pairing == expected
+
+
 def test_read_comet_peptide_pariring(mod_comet_txt):
     """Test that peptide paiing is correctly create when parsing comet file"""
     expected_peptide_pairing = {
@@ -140,8 +188,181 @@ def test_read_mztab(real_mztab):
         psms = crema.read_mztab(real_mztab)
 
 
+def test_parse_mztab_psms(tmp_path):
+    """Test that only the PSM section of an mzTab file is parsed"""
+    mztab_file = tmp_path / "test.mzTab"
+    lines = [
+        "MTD\tmzTab-version\t1.0.0",
+        "PRH\taccession\tdescription",
+        "PRT\tprotA\tnot a PSM",
+        "",
+        "PSH\tsequence\tPSM_ID\taccession\tsearch_engine_score[1]"
+        "\tmodifications\tspectra_ref"
+        "\topt_global_cv_MS:1002217_decoy_peptide\tretention_time",
+        "PSM\tPEPK\t1\tprotA\t10.5\tnull\tms_run[1]:index=1\t0\t1.0",
+        "PSM\tKPEP\t2\tdecoy_protA\tnull\t3-UNIMOD:35\tms_run[1]:index=1"
+        "\t1\t1.0",
+        "PSM\tLESS\t3\tprotB\t2.0\tnull\tms_run[1]:index=2\t0\tnull",
+        "COM\tthe end",
+    ]
+    mztab_file.write_text("\n".join(lines) + "\n")
+
+    df = _parse_psms(mztab_file, chunk_size=2)
+    assert df.shape == (3, 6)
+    assert "retention_time" not in df.columns
+    assert df["search_engine_score[1]"].isna().tolist() == [0, 1, 0]
+
+    psms = crema.read_mztab(mztab_file)
+    assert psms.peptides.tolist() == ["PEPK[]", "KPEP[3-UNIMOD:35]", "LESS[]"]
+    assert psms.targets.tolist() == [True, False, True]
+
+
 def test_read_pepxml(real_pepxml):
     try:
         psms = crema.read_pepxml(real_pepxml, "decoy_")
     except Exception as exc:
         assert False, f"'test_read_pepxml' raised an exception {exc}"
+
+
+def test_detect_format(
+    real_tide_txt,
+    mod_comet_txt,
+    basic_msgf_tsv,
+    basic_msamanda_csv,
+    real_mztab,
+    real_msfragger_pepxml,
+    tmp_path,
+):
+    """Test that formats are detected from the file headers"""
+    from crema.parsers.auto import detect_format
+
+    assert detect_format(real_tide_txt) == "tide"
+    assert detect_format(mod_comet_txt) == "comet"
+    assert detect_format(basic_msgf_tsv) == "msgf"
+    assert detect_format(basic_msamanda_csv) == "msamanda"
+    assert detect_format(real_mztab) == "mztab"
+    assert detect_format(real_msfragger_pepxml) == "msfragger"
+
+    with pytest.raises(ValueError):
+        detect_format([real_tide_txt[0], basic_msgf_tsv])
+
+    unknown = tmp_path / "unknown.txt"
+    unknown.write_text("a\tb\tc\n1\t2\t3\n")
+    with pytest.raises(ValueError):
+        detect_format(unknown)
+
+    psms = crema.read_auto(real_tide_txt)
+    expected = crema.read_tide(real_tide_txt)
+    pd.testing.assert_frame_equal(psms.data, expected.data)
+
+
+@pytest.mark.parametrize(
+    "suffix,opener",
+    [(".gz", gzip.open), (".bz2", bz2.open), (".xz", lzma.open)],
+)
+def test_read_compressed(
+    real_tide_txt, real_msfragger_pepxml, tmp_path, suffix, opener
+):
+    """Test that compressed files are read like uncompressed ones"""
+    from crema.parsers.auto import detect_format
+
+    compressed = []
+    for in_file in [*real_tide_txt, real_msfragger_pepxml]:
+        out_file = tmp_path / (in_file.name + suffix)
+        with in_file.open("rb") as in_ref, opener(out_file, "wb") as out_ref:
+            shutil.copyfileobj(in_ref, out_ref)
+
+        compressed.append(out_file)
+
+    assert detect_format(compressed[:2]) == "tide"
+    expected = crema.read_tide(real_tide_txt).data
+    pd.testing.assert_frame_equal(
+        crema.read_tide(compressed[:2]).data, expected
+    )
+
+    assert detect_format(compressed[2]) == "msfragger"
+    expected = crema.read_auto(real_msfragger_pepxml).data
+    pd.testing.assert_frame_equal(
+        crema.read_auto(compressed[2]).data, expected
+    )
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_read_engine(real_tide_txt, engine):
+    """Test that each CSV engine reads the same PSMs"""
+    if engine == "pyarrow":
+        pytest.importorskip("pyarrow")
+
+    psms = crema.read_tide(real_tide_txt, engine=engine)
+    expected = crema.read_tide(real_tide_txt)
+    pd.testing.assert_frame_equal(psms.data, expected.data)
+    assert psms.data["scan"].dtype == "int64"
+    assert (psms.scores.dtypes == "float64").all()
+
+    with pytest.raises(ValueError):
+        crema.read_tide(real_tide_txt, engine="python")
+
+
+@pytest.mark.parametrize("suffix,opener", [("", open), (".gz", gzip.open)])
+def test_read_engine_version_line(
+    basic_comet_df, basic_msamanda_csv, tmp_path, suffix, opener
+):
+    """Test that the pyarrow engine skips the version line of a file"""
+    pytest.importorskip("pyarrow")
+
+    comet_file = tmp_path / ("comet.txt" + suffix)
+    with opener(comet_file, "wt") as out_ref:
+        out_ref.write("CometVersion 2019.01 rev. 5\n")
+        basic_comet_df.to_csv(out_ref, sep="\t", index=False)
+
+    msamanda_file = tmp_path / ("amanda.csv" + suffix)
+    with basic_msamanda_csv.open("rb") as in_ref:
+        with opener(msamanda_file, "wb") as out_ref:
+            shutil.copyfileobj(in_ref, out_ref)
+
+    for reader, in_file in [
+        (crema.read_comet, comet_file),
+        (crema.read_msamanda, msamanda_file),
+    ]:
+        psms = reader(in_file, engine="pyarrow")
+        expected = reader(in_file)
+        pd.testing.assert_frame_equal(psms.data, expected.data)
+        assert len(psms.data) == 10
+
+
+def test_parse_files():
+    """Test that pipelined parsing keeps the file order and raises errors"""
+
+    def parse(name):
+        if name == "bad":
+            raise ValueError("bad file")
+
+        return pd.DataFrame({"file": [name] * 3})
+
+    def process(df):
+        df["upper"] = df["file"].str.upper()
+        return df
+
+    files = [str(i) for i in range(10)]
+    data = utils.parse_files(files, parse, process, buffer_size=1)
+    assert data["file"].unique().tolist() == files
+    assert (data["upper"] == data["file"]).all()
+
+    with pytest.raises(ValueError, match="bad file"):
+        utils.parse_files(["0", "bad", "1"], parse, process)
+
+
+def test_map_unique():
+    """Test that transforming unique values matches transforming every row"""
+    prots = pd.Series(
+        ["a(1)", "decoy_b", None, "a(1)", "c"], index=[4, 3, 2, 1, 0]
+    )
+    funcs = [
+        lambda x: x.str.replace("\\([^()]*\\)", "", regex=True),
+        lambda x: x.str.contains("decoy_"),
+        lambda x: x.str[1:],
+    ]
+    for func in funcs:
+        pd.testing.assert_series_equal(
+            utils.map_unique(prots, func), func(prots)
+        )
@@ -7,6 +7,7 @@ import logging
 import pytest
 import numpy as np
 
+from crema import qvalues
 from crema.qvalues import tdc, mixmax
 
 
@@ -64,6 +65,51 @@ def test_tdc_ascending(desc_scores):
         np.testing.assert_array_equal(qvals, true_qvals)
 
 
+def test_tdc_out(desc_scores):
+    """Test that q-values are written to a preallocated array"""
+    scores, target, true_qvals = desc_scores
+    perm = np.random.permutation(len(scores))
+    out = np.full(len(scores), -1.0)
+    qvals = tdc(scores[perm], target[perm], desc=True, out=out)
+    assert qvals is out
+    np.testing.assert_array_equal(out, true_qvals[perm])
+
+    with pytest.raises(ValueError):
+        tdc(scores, target, out=np.empty(len(scores) - 1))
+
+
+def test_tdc_order(desc_scores):
+    """Test that a precomputed sort order gives the same q-values"""
+    scores, target, true_qvals = desc_scores
+    perm = np.random.permutation(len(scores))
+    scores, target = scores[perm], target[perm]
+    order = np.argsort(scores)
+    for desc, sign in [(True, 1), (False, -1)]:
+        qvals = tdc(sign * scores, target, desc=desc, order=order[::sign])
+        np.testing.assert_array_equal(qvals, true_qvals[perm])
+
+    with pytest.raises(ValueError):
+        tdc(scores, target, order=order[1:])
+
+
+def test_tdc_nan():
+    """Test that NaN scores are ranked worst in either direction"""
+    scores = np.array([np.nan, 5, 4, 3, 2, 1])
+    target = np.array([False, True, True, True, True, True])
+    expected = np.array([0.4, 0.2, 0.2, 0.2, 0.2, 0.2])
+    np.testing.assert_array_equal(tdc(scores, target, desc=True), expected)
+    np.testing.assert_array_equal(tdc(-scores, target, desc=False), expected)
+
+    perm = np.random.permutation(len(scores))
+    qvals = tdc(scores[perm], target[perm], desc=True)
+    np.testing.assert_array_equal(qvals, expected[perm])
+
+    # NaN scores are tied with each other.
+    scores[1] = np.nan
+    qvals = tdc(scores, target, desc=True)
+    np.testing.assert_array_equal(qvals, [0.4] * 2 + [0.25] * 4)
+
+
 def test_tdc_non_bool():
     """If targets is not boolean, should get a value error"""
     scores = np.array([1, 2, 3, 4, 5])
@@ -224,3 +270,19 @@ def test_mixmax_empty():
         pi0, qvals = do_mixmax(scores, target.astype(dtype), desc=False)
         assert pi0 == 1.0
         assert all(q == 1.0 for q in qvals)
+
+
+# Ahead-of-time kernels -------------------------------------------------------
+def test_aot_matches_jit(desc_scores):
+    """The ahead-of-time kernels should agree with the JIT kernels"""
+    aot = pytest.importorskip("crema._qvalues_aot")
+    scores, target, true_qvals = desc_scores
+    scores = scores.astype(np.float64)
+    target = target.astype(bool)
+
+    qvals = np.empty(len(scores))
+    aot.tdc_qvalues(scores, target, np.argsort(scores), True, qvals)
+    np.testing.assert_array_equal(qvals, true_qvals)
+
+    pvals = np.linspace(0, 1, 11)
+    assert aot.estimate_pi0(pvals) == qvalues.estimate_pi0(pvals)
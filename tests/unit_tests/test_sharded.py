@@ -0,0 +1,77 @@
+"""
+These tests verify that sharded confidence estimates match the in-memory ones
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from crema import read_tide
+from crema.sharded import assign_confidence_sharded
+
+
+@pytest.fixture
+def tide_shards(target_tide_df, decoy_tide_df, tmp_path):
+    """Split the target and decoy PSMs into two shards by scan"""
+    shards = []
+    for idx, scans in enumerate([[1, 2, 3, 4, 5], [6, 7, 8, 9, 10]]):
+        shard = []
+        for name, df in [("target", target_tide_df), ("decoy", decoy_tide_df)]:
+            out_file = tmp_path / f"{name}_{idx}.txt"
+            df.loc[df["scan"].isin(scans), :].to_csv(
+                out_file, sep="\t", index=False
+            )
+            shard.append(out_file)
+
+        shards.append(shard)
+
+    return shards
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_sharded_tdc(tide_shards, target_tide_txt, decoy_tide_txt, n_jobs):
+    """Test that sharded TDC gives the same results as TdcConfidence"""
+    out_dir = tide_shards[0][0].parent
+    out_files = assign_confidence_sharded(
+        tide_shards,
+        score_column="combined p-value",
+        desc=False,
+        threshold="q-value",
+        output_dir=out_dir,
+        decoys=True,
+        n_jobs=n_jobs,
+        chunk_size=2,
+    )
+    assert len(out_files) == 4
+
+    psms = read_tide([target_tide_txt, decoy_tide_txt])
+    conf = psms.assign_confidence(
+        score_column="combined p-value", desc=False, threshold="q-value"
+    )
+    for level in ["psms", "peptides"]:
+        expected = conf.confidence_estimates[level]
+        sharded = pd.read_csv(out_dir / f"crema.{level}.txt", sep="\t")
+        assert list(sharded.columns) == list(expected.columns)
+        np.testing.assert_array_equal(sharded.values, expected.values)
+
+        expected = conf.decoy_confidence_estimates[level]
+        sharded = pd.read_csv(out_dir / f"crema.decoy.{level}.txt", sep="\t")
+        np.testing.assert_array_equal(sharded.values, expected.values)
+
+
+def test_sharded_accept(tide_shards, tmp_path):
+    """Test the accept column and that 'desc' is required"""
+    out_files = assign_confidence_sharded(
+        tide_shards,
+        score_column="combined p-value",
+        desc=False,
+        threshold=0.21,
+        output_dir=tmp_path,
+        file_root="sharded",
+    )
+    psms = pd.read_csv(out_files[0], sep="\t")
+    assert out_files[0].endswith("sharded.crema.psms.txt")
+    assert psms["accept"].sum() == 5
+
+    with pytest.raises(ValueError):
+        assign_confidence_sharded(tide_shards, "combined p-value", desc=None)